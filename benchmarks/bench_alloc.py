@@ -0,0 +1,164 @@
+"""
+Measures per-request allocations of the backend request pipeline.
+
+Requests are pushed through HttpAdapter.handle_client over an in-memory
+socket, once allocating fresh Request/Response objects per request (pools
+disabled) and once recycling them through the pools. Run from the
+repository root::
+
+    python -m benchmarks.bench_alloc --requests 2000
+"""
+
+import argparse
+import contextlib
+import datetime
+import io
+import tracemalloc
+
+from daemon import httpadapter
+from daemon.dictionary import CaseInsensitiveDict
+from daemon.httpadapter import HttpAdapter
+from daemon.request import Request
+from daemon.response import Response
+
+RAW_REQUESTS = {
+    "json": (
+        "POST /hello HTTP/1.1\r\nHost: localhost\r\nContent-Type: application/json"
+        '\r\nCookie: session_id=abc\r\nContent-Length: 17\r\n\r\n{"name": "peer1"}'
+    ),
+    "static": "GET /login.html HTTP/1.1\r\nHost: localhost\r\n\r\n",
+}
+
+
+class MemoryConn:
+    """Just enough of a socket for HttpAdapter.handle_client."""
+
+    def __init__(self, data):
+        self.data = data
+        self.sent = 0
+
+    def recv(self, size):
+        data, self.data = self.data, b""
+        return data
+
+    def sendall(self, data):
+        self.sent += len(data)
+
+    def sendmsg(self, buffers):
+        sent = sum(len(buf) for buf in buffers)
+        self.sent += sent
+        return sent
+
+    def close(self):
+        pass
+
+
+def hello(headers, body):
+    return {"status": "ok", "greeting": "hello"}
+
+
+ROUTES = {("POST", "/hello"): hello}
+
+
+def serve(raw):
+    conn = MemoryConn(raw)
+    adapter = HttpAdapter("127.0.0.1", 8080, conn, ("127.0.0.1", 50000), ROUTES)
+    adapter.handle_client(conn, ("127.0.0.1", 50000), ROUTES)
+
+
+def measure(raw, count, pooled):
+    """Returns the average peak bytes allocated while serving one request."""
+    size = 64 if pooled else 0
+    for pool in (httpadapter.REQUEST_POOL, httpadapter.RESPONSE_POOL):
+        pool.size = size
+        del pool._free[:]
+    serve(raw)  # warm up caches and, when pooled, the free lists
+
+    total = 0
+    tracemalloc.start()
+    for _ in range(count):
+        tracemalloc.reset_peak()
+        base = tracemalloc.get_traced_memory()[0]
+        serve(raw)
+        total += tracemalloc.get_traced_memory()[1] - base
+    tracemalloc.stop()
+    return total / count
+
+
+class DictLayout:
+    """Stand-in for the pre-slots object layout: attributes in __dict__."""
+
+
+def instance_bytes(factory, count=1000):
+    tracemalloc.start()
+    objs = [factory() for _ in range(count)]
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del objs
+    return current / count
+
+
+def dict_request():
+    obj = DictLayout()
+    obj.__dict__.update(
+        method=None,
+        url=None,
+        headers=None,
+        path=None,
+        body=None,
+        hook=None,
+        cookies=CaseInsensitiveDict(),
+        routes={},
+        query_params={},
+    )
+    return obj
+
+
+def dict_response():
+    obj = DictLayout()
+    obj.__dict__.update(
+        _content=b"",
+        _content_consumed=False,
+        _next=None,
+        status_code=200,
+        headers={},
+        url=None,
+        encoding="utf-8",
+        history=[],
+        reason="OK",
+        cookies=CaseInsensitiveDict(),
+        elapsed=datetime.timedelta(0),
+        request=None,
+    )
+    return obj
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--requests", type=int, default=2000)
+    args = parser.parse_args()
+
+    print("bytes per instance (allocated at construction)")
+    for name, legacy, slotted in (
+        ("Request", dict_request, Request),
+        ("Response", dict_response, Response),
+    ):
+        print(
+            f"  {name:<9} dict layout {instance_bytes(legacy):>6.0f}"
+            f"   slotted {instance_bytes(slotted):>6.0f}"
+        )
+    print()
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        rows = [
+            (name, label, measure(raw.encode(), args.requests, pooled))
+            for name, raw in RAW_REQUESTS.items()
+            for label, pooled in (("fresh", False), ("pooled", True))
+        ]
+    print(f"{'path':<8} {'objects':<8} {'peak bytes/request':>19}")
+    for name, label, peak in rows:
+        print(f"{name:<8} {label:<8} {peak:>19,.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+"""
+Compares P2P message encodings: encode and decode cost and bytes on the wire.
+
+Run from the repository root::
+
+    python -m benchmarks.bench_codec --rounds 20000
+"""
+
+import argparse
+import json
+import time
+
+import p2p_codec
+from p2p_codec import Envelope
+
+SIZES = (32, 256, 4096)
+WORDS = "the quick brown fox jumps over a lazy dog while peers gossip about it "
+
+
+def make_text(size):
+    return (WORDS * (size // len(WORDS) + 1))[:size]
+
+
+def legacy_http(text):
+    # What p2p_handler_http posted before envelopes.
+    return json.dumps({"message": text, "sender": "baodang"}).encode()
+
+
+def legacy_http_decode(data):
+    return json.loads(data)["message"]
+
+
+def timed(func, arg, rounds):
+    start = time.perf_counter()
+    for _ in range(rounds):
+        result = func(arg)
+    return (time.perf_counter() - start) / rounds * 1e6, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--rounds", type=int, default=20000)
+    args = parser.parse_args()
+
+    variants = [
+        ("legacy json", legacy_http, legacy_http_decode),
+        ("raw utf-8", str.encode, bytes.decode),
+    ]
+    for name, codec in (("json", p2p_codec.JSON), ("binary", p2p_codec.BINARY)):
+        for threshold in (None, p2p_codec.COMPRESS_THRESHOLD):
+            label = name + ("+zlib" if threshold is not None else "")
+            variants.append(
+                (
+                    label,
+                    lambda text, c=codec, t=threshold: p2p_codec.encode(
+                        Envelope("baodang", "global", text, timestamp=0.0), c, t
+                    ),
+                    p2p_codec.decode,
+                )
+            )
+
+    print(f"{'payload':>8} {'codec':<12} {'bytes':>7} {'enc us':>8} {'dec us':>8}")
+    for size in SIZES:
+        text = make_text(size)
+        for label, enc, dec in variants:
+            enc_us, data = timed(enc, text, args.rounds)
+            dec_us, _ = timed(dec, data, args.rounds)
+            print(f"{size:>8} {label:<12} {len(data):>7} {enc_us:>8.2f} {dec_us:>8.2f}")
+        print()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+"""
+Simulates channel broadcast across hundreds of in-process peers and
+compares full-mesh fan-out with tree dissemination.
+
+Run from the repository root::
+
+    python -m benchmarks.bench_tree_broadcast --peers 500 --fanout 4 --dead 0.05
+"""
+
+import argparse
+import random
+from collections import Counter, deque
+
+from p2p_gossip import TreeBroadcaster
+
+
+class SimNetwork:
+    """Delivers envelopes between simulated peers hop by hop."""
+
+    def __init__(self, size, fanout, dead):
+        self.peers = {}
+        self.dead = dead
+        self.sends = Counter()
+        self.received = Counter()
+        self.hops = {}
+        self.pending = deque()
+        for port in range(size):
+            self.peers[port] = TreeBroadcaster(self._deliver_from(port), fanout)
+
+    def _deliver_from(self, sender):
+        def deliver(ip, port, envelope):
+            self.sends[sender] += 1
+            if port in self.dead:
+                raise ConnectionError("peer down")
+            self.pending.append((port, envelope, self.hops.get(sender, 0) + 1))
+
+        return deliver
+
+    def run(self):
+        while self.pending:
+            port, envelope, hop = self.pending.popleft()
+            self.received[port] += 1
+            relay = self.peers[port].receive(envelope)
+            if relay is None:
+                continue
+            self.hops[port] = hop
+            self.peers[port].forward(envelope, relay)
+
+
+def simulate_tree(size, fanout, dead):
+    net = SimNetwork(size, fanout, dead)
+    targets = [("user%d" % p, "127.0.0.1", p) for p in range(1, size)]
+    net.peers[0].start("user0", "global", "hello", targets)
+    net.run()
+    alive = size - 1 - len(dead)
+    return {
+        "covered": len(net.hops),
+        "alive": alive,
+        "duplicates": sum(net.received.values()) - len(net.received),
+        "sender_sends": net.sends[0],
+        "max_sends": max(net.sends.values()),
+        "max_hops": max(net.hops.values(), default=0),
+    }
+
+
+def simulate_mesh(size, dead):
+    alive = size - 1 - len(dead)
+    return {
+        "covered": alive,
+        "alive": alive,
+        "duplicates": 0,
+        "sender_sends": size - 1,
+        "max_sends": size - 1,
+        "max_hops": 1,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--peers", type=int, default=500)
+    parser.add_argument("--fanout", type=int, default=4)
+    parser.add_argument("--dead", type=float, default=0.0, help="fraction offline")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    random.seed(args.seed)
+    dead = set(random.sample(range(1, args.peers), int(args.dead * (args.peers - 1))))
+
+    print(f"{args.peers} peers, fanout {args.fanout}, {len(dead)} offline")
+    print(
+        f"{'mode':<6} {'covered':>12} {'dups':>6} {'sender':>8} "
+        f"{'max/peer':>9} {'hops':>5}"
+    )
+    for mode, result in (
+        ("mesh", simulate_mesh(args.peers, dead)),
+        ("tree", simulate_tree(args.peers, args.fanout, dead)),
+    ):
+        print(
+            f"{mode:<6} {result['covered']:>6}/{result['alive']:<5} "
+            f"{result['duplicates']:>6} {result['sender_sends']:>8} "
+            f"{result['max_sends']:>9} {result['max_hops']:>5}"
+        )
+
+
+if __name__ == "__main__":
+    main()
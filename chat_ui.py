@@ -2,9 +2,17 @@ import sys
 import threading
 import tkinter as tk
 from tkinter import simpledialog, messagebox, scrolledtext
-from queue import Queue
+from queue import Queue, Empty
 from p2p_handler_http import P2PHandler
 
+# Lines kept in the chat view; older ones are trimmed.
+MAX_SCROLLBACK_LINES = 2000
+# Messages rendered per UI tick, so a flood cannot freeze the window.
+MAX_DRAIN = 500
+# The queue is polled faster while busy and backs off while idle (ms).
+POLL_MIN = 50
+POLL_MAX = 500
+
 
 class P2PChatClient:
     def __init__(self, root):
@@ -13,6 +21,7 @@ class P2PChatClient:
         self.root.geometry("600x500")
 
         self.message_queue = Queue()
+        self.poll_interval = POLL_MIN
 
         self.logic = P2PHandler(self.message_queue, api_url="http://192.168.1.204:8080")
 
@@ -23,7 +32,7 @@ class P2PChatClient:
         if self.logic.my_username:
             self.display_message(f"[System] Welcome, {self.logic.my_username}!")
             # self.logic.start_listener()
-            self.root.after(100, self.check_message_queue)
+            self.root.after(self.poll_interval, self.check_message_queue)
         else:
             self.root.destroy()
             sys.exit(0)
@@ -70,10 +79,20 @@ class P2PChatClient:
         self.send_btn.pack(side=tk.LEFT, padx=5)
 
     def display_message(self, message):
+        self.display_messages([message])
+
+    def display_messages(self, messages):
+        # Only follow new output if the user has not scrolled up.
+        at_bottom = self.chat_display.yview()[1] >= 1.0
         self.chat_display.config(state="normal")
-        self.chat_display.insert(tk.END, message + "\n\n")
+        self.chat_display.insert(tk.END, "\n\n".join(messages) + "\n\n")
+        lines = int(self.chat_display.index("end-1c").split(".")[0])
+        if lines > MAX_SCROLLBACK_LINES:
+            excess = lines - MAX_SCROLLBACK_LINES
+            self.chat_display.delete("1.0", f"{excess + 1}.0")
         self.chat_display.config(state="disabled")
-        self.chat_display.see(tk.END)
+        if at_bottom:
+            self.chat_display.see(tk.END)
 
     def ui_send_broadcast(self, event=None):
         message = self.msg_entry.get()
@@ -142,14 +161,19 @@ class P2PChatClient:
         self.root.wait_window(dialog)
 
     def check_message_queue(self):
-        while not self.message_queue.empty():
+        batch = []
+        while len(batch) < MAX_DRAIN:
             try:
-                message = self.message_queue.get_nowait()
-                self.display_message(message)
-            except Exception:
-                pass
+                batch.append(self.message_queue.get_nowait())
+            except Empty:
+                break
 
-        self.root.after(100, self.check_message_queue)
+        if batch:
+            self.display_messages(batch)
+            self.poll_interval = POLL_MIN
+        else:
+            self.poll_interval = min(POLL_MAX, self.poll_interval * 2)
+        self.root.after(self.poll_interval, self.check_message_queue)
 
     def run_login_flow(self):
         dialog = tk.Toplevel(self.root)
@@ -17,4 +17,9 @@ from .response import Response
 from .request import Request
 from .backend import create_backend
 from .httpadapter import HttpAdapter
-from .dictionary import CaseInsensitiveDict
\ No newline at end of file
+from .dictionary import CaseInsensitiveDict
+from .static import StaticFiles
+from .mime import MimeTable
+from .manifest import AssetManifest
+from .middleware import Pipeline, RouteTable, default_routes
+from .context import RequestContext
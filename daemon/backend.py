@@ -46,10 +46,14 @@ import argparse
 
 from .response import *
 from .httpadapter import HttpAdapter
+from .manifest import AssetManifest
+from .middleware import RouteTable, default_routes
+from .mime import DEFAULT_MIME_TABLE
+from .static import StaticFiles
 from .dictionary import CaseInsensitiveDict
 
 
-def handle_client(ip, port, conn, addr, routes):
+def handle_client(ip, port, conn, addr, routes, static=None, mime_table=None):
     """
     Initializes an HttpAdapter instance and delegates the client handling logic to it.
 
@@ -58,14 +62,16 @@ def handle_client(ip, port, conn, addr, routes):
     :param conn (socket.socket): Client connection socket.
     :param addr (tuple): client address (IP, port).
     :param routes (dict): Dictionary of route handlers.
+    :param static (StaticFiles): optional shared store for static files.
+    :param mime_table (MimeTable): optional table replacing the default one.
     """
-    daemon = HttpAdapter(ip, port, conn, addr, routes)
+    daemon = HttpAdapter(ip, port, conn, addr, routes, static, mime_table)
 
     # Handle client
     daemon.handle_client(conn, addr, routes)
 
 
-def run_backend(ip, port, routes):
+def run_backend(ip, port, routes, static=None, mime_table=None):
     """
     Starts the backend server, binds to the specified IP and port, and listens for incoming
     connections. Each connection is handled in a separate thread. The backend accepts incoming
@@ -75,6 +81,8 @@ def run_backend(ip, port, routes):
     :param ip (str): IP address to bind the server.
     :param port (int): Port number to listen on.
     :param routes (dict): Dictionary of route handlers.
+    :param static (StaticFiles): optional shared store for static files.
+    :param mime_table (MimeTable): optional table replacing the default one.
     """
     server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
 
@@ -93,7 +101,8 @@ def run_backend(ip, port, routes):
             #        provided handle_client routine
             #
             client_thread = threading.Thread(
-                target=handle_client, args=(ip, port, conn, addr, routes)
+                target=handle_client,
+                args=(ip, port, conn, addr, routes, static, mime_table),
             )
             client_thread.daemon = True
             client_thread.start()
@@ -101,13 +110,33 @@ def run_backend(ip, port, routes):
         print("Socket error: {}".format(e))
 
 
-def create_backend(ip, port, routes={}):
+def create_backend(ip, port, routes={}, static=None, mime_table=None, prewarm=False):
     """
     Entry point for creating and running the backend server.
 
     :param ip (str): IP address to bind the server.
     :param port (int): Port number to listen on.
     :param routes (dict, optional): Dictionary of route handlers. Defaults to empty dict.
+        A plain dict is compiled with :func:`default_routes`, a compiled
+        :class:`RouteTable` is used as is.
+    :param static (StaticFiles, optional): store serving static files from shared
+        memory maps. Defaults to None, which reads files per request.
+    :param mime_table (MimeTable, optional): extension table for static files.
+        Defaults to None, which uses :data:`DEFAULT_MIME_TABLE`.
+    :param prewarm (bool, optional): scan www/, static/ and apps/ into an asset
+        manifest, precompress compressible files and preload small ones into
+        the static store, creating one if needed. Defaults to False.
     """
 
-    run_backend(ip, port, routes)
+    if prewarm:
+        if static is None:
+            static = StaticFiles()
+        static.manifest = AssetManifest.scan(
+            mime_table or DEFAULT_MIME_TABLE, base_dir=BASE_DIR
+        )
+        static.manifest.prewarm(static)
+
+    if not isinstance(routes, RouteTable):
+        routes = default_routes(routes)
+
+    run_backend(ip, port, routes, static, mime_table)
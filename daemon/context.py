@@ -0,0 +1,100 @@
+#
+# Copyright (C) 2025 pdnguyen of HCMC University of Technology VNU-HCM.
+# All rights reserved.
+# This file is part of the CO3093/CO3094 course.
+#
+# WeApRous release
+#
+# The authors hereby grant to Licensee personal permission to use
+# and modify the Licensed Source Code for the sole purpose of studying
+# while attending the course
+#
+
+"""
+daemon.context
+~~~~~~~~~~~~~~~~~
+
+This module provides a :class:`RequestContext <RequestContext>`, the
+request-scoped view handed to route handlers that declare a ``ctx``
+parameter.
+
+Every derived value is computed on first access and memoized, so a body is
+decoded at most once per request, and not at all by handlers that never
+look at it.
+
+Usage Example:
+--------------
+>>> @app.route("/channels/join", methods=["POST"])
+>>> def join(headers, body, ctx):
+>>>     return {"channel": ctx.json.get("channel_name"), "user": ctx.session}
+"""
+
+import json
+import urllib.parse
+
+_MISSING = object()
+
+
+class RequestContext:
+    """
+    Lazily parsed view of one request.
+
+    :attrs request (Request): the request being served.
+    :attrs response (Response): the response being built.
+    """
+
+    __slots__ = ("request", "response", "_json", "_form")
+
+    def __init__(self, request, response):
+        self.request = request
+        self.response = response
+        self._json = _MISSING
+        self._form = _MISSING
+
+    @property
+    def headers(self):
+        return self.request.headers
+
+    @property
+    def body(self):
+        return self.request.body
+
+    @property
+    def json(self):
+        """
+        The body decoded as JSON, or an empty dict for an empty body.
+
+        :raises ValueError: if the body is not valid JSON.
+        """
+        if self._json is _MISSING:
+            body = self.request.body
+            self._json = json.loads(body) if body else {}
+        return self._json
+
+    @property
+    def form(self):
+        """
+        The body decoded as ``application/x-www-form-urlencoded``, keeping
+        the first value of each field.
+
+        :rtype dict: field -> value.
+        """
+        if self._form is _MISSING:
+            fields = urllib.parse.parse_qs(self.request.body or "")
+            self._form = {key: values[0] for key, values in fields.items()}
+        return self._form
+
+    @property
+    def cookies(self):
+        """Request cookies, parsed on first access by the request."""
+        return self.request.cookies
+
+    @property
+    def query(self):
+        """Query parameters, parsed on first access by the request."""
+        return self.request.query_params
+
+    @property
+    def session(self):
+        """User the session middleware resolved, or None."""
+        return self.request.user
@@ -10,43 +10,161 @@
 # while attending the course
 #
 
+"""
+daemon.dictionary
+~~~~~~~~~~~~~~~~~
+
+This module provides :class:`CaseInsensitiveDict`, the header multimap used
+by :class:`Request <Request>` and :class:`Response <Response>`.
+"""
+
+import sys
 from collections.abc import MutableMapping
 
-class CaseInsensitiveDict(MutableMapping):
-    """The :class:`CaseInsensitiveDict<MutableMapping>` object, which 
-    contains a custom behavior of MutuableMapping.
+#: Header names whose lowercase form is interned up front.
+COMMON_HEADERS = (
+    "Accept",
+    "Accept-Encoding",
+    "Accept-Language",
+    "Access-Control-Allow-Credentials",
+    "Access-Control-Allow-Headers",
+    "Access-Control-Allow-Methods",
+    "Access-Control-Allow-Origin",
+    "Cache-Control",
+    "Connection",
+    "Content-Encoding",
+    "Content-Length",
+    "Content-Type",
+    "Cookie",
+    "Date",
+    "ETag",
+    "Host",
+    "If-None-Match",
+    "Last-Event-ID",
+    "Origin",
+    "Pragma",
+    "Set-Cookie",
+    "User-Agent",
+    "X-Forwarded-For",
+)
+
+#: Bound on the name cache, so arbitrary client headers cannot grow it.
+MAX_CACHED_NAMES = 1024
+
+_lower_names = {}
 
-    Usage::
 
-      >>> import tools
-      >>> word = CaseInsensitiveDict(status_code='404', msg="Not found")
-      >>> code = word['status_code']
-      >>> code 
-      404
+def _lower(name):
+    """Returns the interned lowercase form of a header name."""
+    try:
+        return _lower_names[name]
+    except KeyError:
+        lower = sys.intern(name.lower())
+        if len(_lower_names) < MAX_CACHED_NAMES:
+            _lower_names[name] = lower
+        return lower
+
+
+for _name in COMMON_HEADERS:
+    _lower(_name)
+    _lower(_name.lower())
+
+
+class CaseInsensitiveDict(MutableMapping):
+    """The :class:`CaseInsensitiveDict<MutableMapping>` object, a header
+    multimap with case-insensitive O(1) lookup.
 
-      >>> msg = word['msg']
-      >>> s.send(r)
-      Not found
+    Names keep the case they were first stored with, which is what
+    :meth:`multi_items` yields for serialization. Item access sees the
+    first value of a name; :meth:`add` stores further values (e.g. several
+    ``Set-Cookie`` headers) and :meth:`getall` returns all of them.
 
-      >>> print(word)
-      {'status_code': '404', 'msg': 'Not found'}
+    Usage::
 
+      >>> headers = CaseInsensitiveDict({"Content-Type": "text/html"})
+      >>> headers["content-type"]
+      'text/html'
+      >>> headers.add("Set-Cookie", "a=1")
+      >>> headers.add("Set-Cookie", "b=2")
+      >>> headers.getall("set-cookie")
+      ['a=1', 'b=2']
+      >>> list(headers.multi_items())
+      [('Content-Type', 'text/html'), ('Set-Cookie', 'a=1'), ('Set-Cookie', 'b=2')]
     """
 
+    __slots__ = ("_store", "_extra")
+
     def __init__(self, *args, **kwargs):
-        self.store = {k.lower(): v for k, v in dict(*args, **kwargs).items()}
+        #: lowercase name -> (original name, first value)
+        self._store = {}
+        #: lowercase name -> further values added with :meth:`add`
+        self._extra = {}
+        self.update(*args, **kwargs)
 
     def __getitem__(self, key):
-        return self.store[key.lower()]
+        return self._store[_lower(key)][1]
 
     def __setitem__(self, key, value):
-        self.store[key.lower()] = value
+        lower = _lower(key)
+        self._store[lower] = (key, value)
+        self._extra.pop(lower, None)
 
     def __delitem__(self, key):
-        del self.store[key.lower()]
+        lower = _lower(key)
+        del self._store[lower]
+        self._extra.pop(lower, None)
+
+    def __contains__(self, key):
+        return _lower(key) in self._store
 
     def __iter__(self):
-        return iter(self.store)
+        return (name for name, _ in self._store.values())
 
     def __len__(self):
-        return len(self.store)
\ No newline at end of file
+        return len(self._store)
+
+    def __repr__(self):
+        return repr(dict(self.items()))
+
+    def get(self, key, default=None):
+        entry = self._store.get(_lower(key))
+        return default if entry is None else entry[1]
+
+    def add(self, key, value):
+        """Appends a value, keeping any already stored under ``key``."""
+        lower = _lower(key)
+        if lower in self._store:
+            self._extra.setdefault(lower, []).append(value)
+        else:
+            self._store[lower] = (key, value)
+
+    def getall(self, key):
+        """Returns every value stored under ``key``, oldest first."""
+        lower = _lower(key)
+        entry = self._store.get(lower)
+        if entry is None:
+            return []
+        return [entry[1], *self._extra.get(lower, ())]
+
+    def multi_items(self):
+        """Yields (name, value) for every stored value, in insertion order."""
+        extra = self._extra
+        for lower, (name, value) in self._store.items():
+            yield name, value
+            if lower in extra:
+                for more in extra[lower]:
+                    yield name, more
+
+    def lower_items(self):
+        """Yields (lowercase name, first value) pairs."""
+        return ((lower, entry[1]) for lower, entry in self._store.items())
+
+    def clear(self):
+        self._store.clear()
+        self._extra.clear()
+
+    def copy(self):
+        other = CaseInsensitiveDict()
+        other._store = dict(self._store)
+        other._extra = {k: list(v) for k, v in self._extra.items()}
+        return other
@@ -0,0 +1,139 @@
+#
+# Copyright (C) 2025 pdnguyen of HCMC University of Technology VNU-HCM.
+# All rights reserved.
+# This file is part of the CO3093/CO3094 course.
+#
+# WeApRous release
+#
+# The authors hereby grant to Licensee personal permission to use
+# and modify the Licensed Source Code for the sole purpose of studying
+# while attending the course
+#
+
+"""
+daemon.eventloop
+~~~~~~~~~~~~~~~~~
+
+This module runs one shared asyncio event loop in a background thread.
+
+Route handlers that return an awaitable or an async generator are finished
+on this loop instead of on their connection thread. A request that waits
+for an event (long-poll, Server-Sent Events) is then just a parked
+coroutine and a non-blocking socket, so thousands of them cost no threads.
+
+Blocking work is handed from the loop to one bounded thread pool with
+:func:`run_blocking`, so slow synchronous handlers queue for a worker
+instead of each holding its own connection thread.
+
+Usage Example:
+--------------
+>>> loop = get_loop()
+>>> future = submit(some_coroutine())
+>>> result = await run_blocking(database.get_channels)
+"""
+
+import asyncio
+import functools
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from .utils import MAX_IOV, advance_buffers
+
+#: Worker threads shared by all blocking route handlers.
+HANDLER_WORKERS = min(32, (os.cpu_count() or 1) * 4)
+
+_loop = None
+_executor = None
+_lock = threading.Lock()
+
+
+def _run(loop):
+    asyncio.set_event_loop(loop)
+    loop.run_forever()
+
+
+def get_loop():
+    """
+    Returns the shared event loop, starting its thread on first use.
+
+    :rtype asyncio.AbstractEventLoop: the running loop.
+    """
+    global _loop
+    with _lock:
+        if _loop is None:
+            _loop = asyncio.new_event_loop()
+            threading.Thread(
+                target=_run, args=(_loop,), name="weaprous-loop", daemon=True
+            ).start()
+        return _loop
+
+
+def submit(coro):
+    """
+    Schedules a coroutine on the shared loop from any thread.
+
+    :params coro: the coroutine to run.
+
+    :rtype concurrent.futures.Future: completes with the coroutine's result.
+    """
+    return asyncio.run_coroutine_threadsafe(coro, get_loop())
+
+
+def get_executor():
+    """
+    Returns the shared pool blocking handlers run on, creating it on first use.
+
+    :rtype concurrent.futures.ThreadPoolExecutor: the pool.
+    """
+    global _executor
+    with _lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=HANDLER_WORKERS, thread_name_prefix="weaprous-handler"
+            )
+        return _executor
+
+
+async def run_blocking(func, *args, **kwargs):
+    """
+    Runs a blocking callable on the shared pool and waits for its result
+    without blocking the loop.
+
+    :params func: the callable.
+
+    :rtype: whatever ``func`` returns.
+    """
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(
+        get_executor(), functools.partial(func, *args, **kwargs)
+    )
+
+
+async def sock_send_buffers(sock, buffers):
+    """
+    Writes a list of buffers to a non-blocking socket with ``sendmsg``,
+    waiting for writability on partial writes. The asyncio counterpart of
+    :func:`daemon.utils.send_buffers`.
+
+    :params sock (socket): the non-blocking socket.
+    :params buffers (list): bytes-like objects in wire order.
+    """
+    loop = asyncio.get_running_loop()
+    if not hasattr(sock, "sendmsg"):
+        for buf in buffers:
+            await loop.sock_sendall(sock, buf)
+        return
+    views = [memoryview(buf) for buf in buffers if len(buf)]
+    while views:
+        try:
+            sent = sock.sendmsg(views[:MAX_IOV])
+        except (BlockingIOError, InterruptedError):
+            writable = loop.create_future()
+            loop.add_writer(sock.fileno(), writable.set_result, None)
+            try:
+                await writable
+            finally:
+                loop.remove_writer(sock.fileno())
+            continue
+        views = advance_buffers(views, sent)
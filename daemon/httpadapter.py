@@ -21,11 +21,18 @@ Request and Response objects to handle client-server communication.
 """
 
 import json
+import asyncio
+import inspect
+from .eventloop import sock_send_buffers, submit
 from .request import Request
 from .response import Response
 from .dictionary import CaseInsensitiveDict
+from .middleware import Pipeline
+from .utils import ObjectPool, send_buffers
 
-protected_paths = ["/index.html", "/"]
+#: Request/Response objects are recycled across connections.
+REQUEST_POOL = ObjectPool(Request)
+RESPONSE_POOL = ObjectPool(Response)
 
 
 class HttpAdapter:
@@ -48,7 +55,7 @@ class HttpAdapter:
         response (Response): Response object for building and sending replies.
     """
 
-    __attrs__ = [
+    __slots__ = (
         "ip",
         "port",
         "conn",
@@ -56,9 +63,11 @@ class HttpAdapter:
         "routes",
         "request",
         "response",
-    ]
+    )
 
-    def __init__(self, ip, port, conn, connaddr, routes):
+    def __init__(
+        self, ip, port, conn, connaddr, routes, static=None, mime_table=None
+    ):
         """
         Initialize a new HttpAdapter instance.
 
@@ -67,6 +76,8 @@ class HttpAdapter:
         :param conn (socket): Active socket connection.
         :param connaddr (tuple): Address of the connected client.
         :param routes (dict): Mapping of route paths to handler functions.
+        :param static (StaticFiles): optional shared store for static files.
+        :param mime_table (MimeTable): optional table replacing the default one.
         """
 
         #: IP address.
@@ -79,10 +90,22 @@ class HttpAdapter:
         self.connaddr = connaddr
         #: Routes
         self.routes = routes
-        #: Request
-        self.request = Request()
+        #: Request, taken from the pool and returned by :meth:`release`.
+        self.request = REQUEST_POOL.acquire()
         #: Response
-        self.response = Response()
+        self.response = RESPONSE_POOL.acquire()
+        self.response.static = static
+        if mime_table is not None:
+            self.response.mime_table = mime_table
+
+    def release(self):
+        """
+        Returns the request and response objects to their pools once the
+        connection is done with them.
+        """
+        REQUEST_POOL.release(self.request)
+        RESPONSE_POOL.release(self.response)
+        self.request = self.response = None
 
     def handle_client(self, conn, addr, routes):
         """
@@ -119,27 +142,15 @@ class HttpAdapter:
                 conn.close()
                 return
 
-            # support cors
-            origin = req.headers.get("origin")
-            if origin:
-                resp.headers["Access-Control-Allow-Origin"] = origin
-                resp.headers["Access-Control-Allow-Credentials"] = "true"
-                resp.headers["Access-Control-Allow-Methods"] = "GET, POST, OPTIONS"
-                resp.headers["Access-Control-Allow-Headers"] = "Content-Type"
-            # end of support cors
-
-            response_bytes = b""
-            if req.path in protected_paths:
-                # Task 1
-                if req.cookies.get("auth") != "true":
-                    # if not req.cookies.get("session_id"):
-                    print(f"[HttpAdapter] Access denied for {addr[0]}. No auth cookie.")
-                    response_bytes = resp.build_unauthorized(
-                        req, login_page="/login.html"
-                    )
-                    conn.sendall(response_bytes)
-                    conn.close()
-                    return
+            pipeline = req.hook if isinstance(req.hook, Pipeline) else None
+            if req.hook is None:
+                pipeline = getattr(routes, "fallback", None)
+            if pipeline is not None:
+                # Compiled app routes run their middleware on the loop,
+                # which owns the connection from here on.
+                submit(self.finish_async(conn, req, resp, pipeline(req, resp)))
+                conn = None
+                return
 
             if req.hook:
                 print(
@@ -149,44 +160,101 @@ class HttpAdapter:
                 )
                 app_resp = req.hook(headers=req.headers, body=req.body)
 
-                if req.path == "/login" and req.method == "POST":
-                    if (
-                        isinstance(app_resp, dict)
-                        and app_resp.get("login") == "success"
-                    ):
-                        print("[HttpAdapter] Login successful, setting cookie.")
-                        # task 1
-                        resp.status_code = 200
-                        resp.set_cookie("auth", "true", options="Path=/; HttpOnly")
-                        session_id = app_resp.get("session_id")
-                        if session_id:
-                            print(
-                                f"[HttpAdapter] Setting session_id cookie: {session_id}"
-                            )
-                            resp.set_cookie(
-                                "session_id", session_id, options="Path=/; HttpOnly"
-                            )
-                        resp_bytes = resp.build_json_response(req, app_resp)
-                    else:
-                        print("[HttpAdapter] Login failed.")
-                        resp.status_code = 401
-                        resp_bytes = resp.build_json_response(req, app_resp)
-                else:
-                    if app_resp.get("status", "") == "failed":
-                        resp.status_code = 404
-                    else:
-                        resp.status_code = 200
-                    resp_bytes = resp.build_json_response(req, app_resp)
+                if inspect.isasyncgen(app_resp) or inspect.isawaitable(app_resp):
+                    submit(self.finish_async(conn, req, resp, app_resp))
+                    conn = None
+                    return
+                buffers = self.build_hook_response(req, resp, app_resp)
             else:
                 print(f"[HttpAdapter] No hook found. Serving static file: {req.path}")
-                resp_bytes = resp.build_response(req)
+                buffers = resp.build_response(req)
 
-            conn.sendall(resp_bytes)
+            send_buffers(conn, buffers)
         except Exception as e:
             print(f"[HttpAdapter] Unexpected error: {e}")
             raise
+        finally:
+            if conn is not None:
+                conn.close()
+                self.release()
+
+    def build_hook_response(self, req, resp, app_resp):
+        """
+        Serializes the value returned by a route handler.
+
+        A ``{"status": "failed"}`` result is answered with 404 unless a
+        middleware already chose another status.
+
+        :param req (Request): The routed request.
+        :param resp (Response): The response being built.
+        :param app_resp (dict): The handler's result.
+
+        :rtype list: the complete HTTP response as buffers.
+        """
+        if (
+            resp.status_code == 200
+            and isinstance(app_resp, dict)
+            and app_resp.get("status", "") == "failed"
+        ):
+            resp.status_code = 404
+        return resp.build_json_response(req, app_resp)
+
+    async def finish_async(self, conn, req, resp, result):
+        """
+        Completes a request on the shared event loop.
+
+        ``result`` is what the handler or pipeline produced, or an awaitable
+        of it: a list of buffers is sent as is, an async generator is
+        streamed as events and anything else is sent as JSON. A handler
+        that waits (e.g. a long-poll) holds no thread while it is parked.
+
+        :param conn (socket): The client socket connection.
+        :param req (Request): The routed request.
+        :param resp (Response): The response being built.
+        :param result: The handler's result or pending result.
+        """
+        try:
+            if inspect.isawaitable(result):
+                result = await result
+            conn.setblocking(False)
+            if inspect.isasyncgen(result):
+                await self.stream_events(conn, req, resp, result)
+            elif isinstance(result, list):
+                await sock_send_buffers(conn, result)
+            else:
+                await sock_send_buffers(
+                    conn, self.build_hook_response(req, resp, result)
+                )
+        except Exception as e:
+            print(f"[HttpAdapter] Async handler failed for {req.path}: {e}")
         finally:
             conn.close()
+            self.release()
+
+    async def stream_events(self, conn, req, resp, events):
+        """
+        Streams the items of an async generator as Server-Sent Events.
+
+        Each ``bytes`` item is written as is, ``None`` becomes a keep-alive
+        comment and anything else is sent as one data event. The stream
+        ends when the generator finishes or the client goes away.
+
+        :param conn (socket): The non-blocking client socket.
+        :param req (Request): The routed request.
+        :param resp (Response): The response being built.
+        :param events: The handler's async generator.
+        """
+        loop = asyncio.get_running_loop()
+        try:
+            await loop.sock_sendall(conn, resp.build_stream_header(req))
+            async for item in events:
+                if not isinstance(item, bytes):
+                    item = resp.format_event(item)
+                await loop.sock_sendall(conn, item)
+        except OSError:
+            print(f"[HttpAdapter] Event stream client {self.connaddr[0]} went away.")
+        finally:
+            await events.aclose()
 
     @property
     def extract_cookies(self, headers):
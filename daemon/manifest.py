@@ -0,0 +1,217 @@
+#
+# Copyright (C) 2025 pdnguyen of HCMC University of Technology VNU-HCM.
+# All rights reserved.
+# This file is part of the CO3093/CO3094 course.
+#
+# WeApRous release
+#
+# The authors hereby grant to Licensee personal permission to use
+# and modify the Licensed Source Code for the sole purpose of studying
+# while attending the course
+#
+
+"""
+daemon.manifest
+~~~~~~~~~~~~~~~~~
+
+This module provides an :class:`AssetManifest <AssetManifest>` built by
+scanning the static asset directories once at startup.
+
+For every servable file the manifest records its size, SHA-256 digest and
+MIME type, and a content-hashed URL such as ``/css/styles.3f2a1b9c07de.css``
+that can be cached forever, since its content never changes. Compressible
+files are gzipped once here instead of per request. The manifest itself is
+served as JSON at :data:`MANIFEST_PATH` for clients and caches.
+
+Usage Example:
+--------------
+>>> manifest = AssetManifest.scan(DEFAULT_MIME_TABLE)
+>>> manifest.prewarm(StaticFiles())
+>>> manifest.resolve("/css/styles.3f2a1b9c07de.css")
+(<Asset /css/styles.css>, True)
+"""
+
+import gzip
+import hashlib
+import os
+
+#: Directories scanned, relative to the base directory.
+DEFAULT_ROOTS = ("www/", "static/", "apps/")
+
+#: URL the manifest is served at.
+MANIFEST_PATH = "/asset-manifest.json"
+
+#: Files up to this size are loaded into the static store at startup.
+PRELOAD_LIMIT = 64 * 1024
+
+#: Smaller files are not worth a Content-Encoding round.
+MIN_GZIP_SIZE = 256
+
+#: Hex digits of the digest embedded in hashed URLs.
+URL_HASH_LENGTH = 12
+
+#: Policy for hashed URLs, whose content can never change.
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+
+
+class Asset:
+    """
+    One scanned static file.
+
+    :attrs path (str): file path on disk.
+    :attrs url (str): canonical request path, e.g. ``/css/styles.css``.
+    :attrs hashed_url (str): content-hashed request path.
+    :attrs size (int): file size in bytes.
+    :attrs digest (str): SHA-256 of the content, hex encoded.
+    :attrs content_type (str): value of the Content-Type header.
+    :attrs etag (str): validator of the file as scanned.
+    :attrs gzip (bytes): precompressed content, or None.
+    :attrs gzip_etag (str): validator of the precompressed content.
+    """
+
+    __slots__ = (
+        "path",
+        "url",
+        "hashed_url",
+        "size",
+        "digest",
+        "content_type",
+        "etag",
+        "gzip",
+        "gzip_etag",
+    )
+
+    def __init__(self, path, url, st, content, mime):
+        self.path = path
+        self.url = url
+        self.size = st.st_size
+        self.digest = hashlib.sha256(content).hexdigest()
+        if mime.content_type == "text/html":
+            # Pages are entry points requested by name and may be access
+            # controlled by path, so they keep their URL.
+            self.hashed_url = url
+        else:
+            stem, ext = os.path.splitext(url)
+            self.hashed_url = "{}.{}{}".format(stem, self.digest[:URL_HASH_LENGTH], ext)
+        self.content_type = mime.content_type
+        # Same format as Response.get_etag, so a match means the file on
+        # disk is still the one that was scanned.
+        self.etag = '"{:x}-{:x}"'.format(st.st_size, int(st.st_mtime))
+
+        self.gzip = self.gzip_etag = None
+        if mime.compressible and self.size >= MIN_GZIP_SIZE:
+            compressed = gzip.compress(content, compresslevel=9, mtime=0)
+            if len(compressed) < self.size:
+                self.gzip = compressed
+                self.gzip_etag = self.etag[:-1] + '-gz"'
+
+    def __repr__(self):
+        return "<Asset {}>".format(self.url)
+
+    def to_dict(self):
+        return {
+            "url": self.hashed_url,
+            "size": self.size,
+            "sha256": self.digest,
+            "type": self.content_type,
+            "gzip_size": len(self.gzip) if self.gzip is not None else None,
+        }
+
+
+class AssetManifest:
+    """
+    Scanned static assets keyed by canonical and hashed URL.
+
+    The manifest is a snapshot: files changed after the scan are still
+    served, but without the hashed-URL cache policy or the precompressed
+    body, whose validators no longer match.
+    """
+
+    def __init__(self, assets=()):
+        self.assets = {}
+        self._hashed = {}
+        for asset in assets:
+            self.assets[asset.url] = asset
+            if asset.hashed_url != asset.url:
+                self._hashed[asset.hashed_url] = asset
+
+    def __len__(self):
+        return len(self.assets)
+
+    @classmethod
+    def scan(cls, mime_table, roots=DEFAULT_ROOTS, base_dir=""):
+        """
+        Builds a manifest from the files under ``roots``.
+
+        Only files whose extension the table serves from that same root
+        are included, so every entry is reachable by its URL.
+
+        :params mime_table (MimeTable): resolves extensions.
+        :params roots (tuple): directories to scan.
+        :params base_dir (str): prefix of the directories.
+
+        :rtype AssetManifest: the manifest.
+        """
+        assets = []
+        for root in roots:
+            top = os.path.join(base_dir, root)
+            for dirpath, _, filenames in os.walk(top):
+                for name in sorted(filenames):
+                    mime = mime_table.lookup(name)
+                    if mime is None or mime.base_dir != root:
+                        continue
+                    path = os.path.join(dirpath, name)
+                    url = "/" + os.path.relpath(path, top).replace(os.sep, "/")
+                    try:
+                        st = os.stat(path)
+                        with open(path, "rb") as f:
+                            content = f.read()
+                    except OSError as e:
+                        print("[Manifest] skipping {}: {}".format(path, e))
+                        continue
+                    assets.append(Asset(path, url, st, content, mime))
+        manifest = cls(assets)
+        print(
+            "[Manifest] {} assets, {} precompressed".format(
+                len(manifest),
+                sum(asset.gzip is not None for asset in assets),
+            )
+        )
+        return manifest
+
+    def resolve(self, path):
+        """
+        Looks up a request path.
+
+        :params path (str): canonical or hashed request path.
+
+        :rtype tuple: (Asset or None, True if ``path`` is a hashed URL).
+        """
+        asset = self._hashed.get(path)
+        if asset is not None:
+            return asset, True
+        return self.assets.get(path), False
+
+    def prewarm(self, store, limit=PRELOAD_LIMIT):
+        """
+        Loads every asset up to ``limit`` bytes into ``store``.
+
+        :params store (StaticFiles): the shared static store.
+        :params limit (int): size cap in bytes.
+        """
+        loaded = 0
+        for asset in self.assets.values():
+            if asset.size <= limit and store.get(asset.path) is not None:
+                loaded += 1
+        print("[Manifest] preloaded {} assets".format(loaded))
+
+    def to_dict(self):
+        """
+        Returns the JSON form served at :data:`MANIFEST_PATH`.
+
+        :rtype dict: canonical URL -> hashed URL, size, digest and type.
+        """
+        return {
+            "assets": {url: asset.to_dict() for url, asset in self.assets.items()},
+            "immutable": IMMUTABLE_CACHE_CONTROL,
+        }
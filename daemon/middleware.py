@@ -0,0 +1,219 @@
+#
+# Copyright (C) 2025 pdnguyen of HCMC University of Technology VNU-HCM.
+# All rights reserved.
+# This file is part of the CO3093/CO3094 course.
+#
+# WeApRous release
+#
+# The authors hereby grant to Licensee personal permission to use
+# and modify the Licensed Source Code for the sole purpose of studying
+# while attending the course
+#
+
+"""
+daemon.middleware
+~~~~~~~~~~~~~~~~~
+
+This module provides the middleware pipeline of WeApRous apps, the
+stock middleware for CORS, login-protected pages, login cookies and
+session lookup, and :func:`default_routes` for plain route dicts.
+
+A middleware is an ``async def`` taking ``(request, response, call_next)``.
+It may change the request or response, then either returns
+``await call_next(request, response)`` (optionally post-processing the
+result) or short-circuits by returning a result of its own. A result is a
+dict (sent as JSON), a list of buffers (an already built response) or an
+async generator (an event stream).
+
+:class:`Pipeline <Pipeline>` links a route's middleware and its handler
+once, at startup, into nested partials, so serving a request is a single
+call with no per-request chain assembly.
+
+Usage Example:
+--------------
+>>> app.use(cors)
+>>> app.use(require_login(["/index.html"]))
+>>> @app.route("/me", middleware=[resolve_session(lookup)])
+>>> def me(headers, body, user=None):
+>>>     return {"username": user}
+"""
+
+import functools
+import inspect
+
+from .context import RequestContext
+from .eventloop import run_blocking
+
+#: Pages a plain route dict keeps behind the login cookie.
+DEFAULT_PROTECTED_PATHS = ("/", "/index.html")
+
+
+class Pipeline:
+    """
+    A route handler and its middleware compiled into one async callable.
+
+    The handler is called with ``headers`` and ``body``, plus ``user`` and
+    a :class:`RequestContext <RequestContext>` as ``ctx`` if its signature
+    asks for them. A handler of None serves a static file.
+
+    :attrs handler (function): the route handler, or None for static files.
+    :attrs middleware (tuple): the middleware, outermost first.
+    """
+
+    __slots__ = ("handler", "middleware", "_call")
+
+    def __init__(self, handler, middleware=()):
+        self.handler = handler
+        self.middleware = tuple(middleware)
+        call = self._terminal(handler)
+        for mw in reversed(self.middleware):
+            call = functools.partial(mw, call_next=call)
+        self._call = call
+
+    def __call__(self, request, response):
+        """Runs the chain; returns a coroutine resolving to the result."""
+        return self._call(request, response)
+
+    def __repr__(self):
+        name = getattr(self.handler, "__name__", "static")
+        return "<Pipeline {} +{} middleware>".format(name, len(self.middleware))
+
+    @staticmethod
+    def _terminal(handler):
+        if handler is None:
+
+            async def serve_static(request, response):
+                return await run_blocking(response.build_response, request)
+
+            return serve_static
+
+        params = inspect.signature(handler).parameters
+        wants_user = "user" in params
+        wants_ctx = "ctx" in params
+
+        async def call_handler(request, response):
+            extra = {}
+            if wants_user:
+                extra["user"] = request.user
+            if wants_ctx:
+                extra["ctx"] = RequestContext(request, response)
+            result = handler(headers=request.headers, body=request.body, **extra)
+            if inspect.isawaitable(result):
+                result = await result
+            return result
+
+        return call_handler
+
+
+class RouteTable(dict):
+    """
+    Compiled routes: (method, path) -> :class:`Pipeline <Pipeline>`.
+
+    :attrs fallback (Pipeline): chain for requests no route matches.
+    """
+
+    def __init__(self, routes=(), fallback=None):
+        super().__init__(routes)
+        self.fallback = fallback
+
+
+async def cors(request, response, call_next):
+    """Echoes the request Origin in the CORS response headers."""
+    response.cors_origin = request.headers.get("origin")
+    return await call_next(request, response)
+
+
+def require_login(paths, login_page="/login.html", cookie="auth"):
+    """
+    Builds a middleware answering 401 for ``paths`` unless the ``cookie``
+    login flag is set. Pages it lets through are marked private, so shared
+    caches never store them.
+
+    :param paths (iterable): protected request paths.
+    :param login_page (str): page linked from the 401 response.
+    :param cookie (str): cookie that must be ``"true"``.
+
+    :rtype: function - the middleware.
+    """
+    paths = frozenset(paths)
+
+    async def login_required(request, response, call_next):
+        if request.path in paths:
+            if request.cookies.get(cookie) != "true":
+                print(
+                    "[Middleware] Access denied to {}. No {} cookie.".format(
+                        request.path, cookie
+                    )
+                )
+                return response.build_unauthorized(request, login_page=login_page)
+            response.headers["Cache-Control"] = "private, no-cache"
+        return await call_next(request, response)
+
+    return login_required
+
+
+async def login_cookies(request, response, call_next):
+    """
+    Sets the ``auth`` and ``session_id`` cookies when the handler reports
+    ``{"login": "success"}`` and answers 401 otherwise.
+    """
+    result = await call_next(request, response)
+    if isinstance(result, dict) and result.get("login") == "success":
+        print("[Middleware] Login successful, setting cookie.")
+        response.set_cookie("auth", "true", options="Path=/; HttpOnly")
+        session_id = result.get("session_id")
+        if session_id:
+            response.set_cookie("session_id", session_id, options="Path=/; HttpOnly")
+    else:
+        print("[Middleware] Login failed.")
+        response.status_code = 401
+    return result
+
+
+def resolve_session(lookup, cookie="session_id"):
+    """
+    Builds a middleware that resolves the session cookie to a user once
+    per request and stores it on ``request.user`` for the handler.
+
+    :param lookup (function): session id -> user or None; may block.
+    :param cookie (str): cookie holding the session id.
+
+    :rtype: function - the middleware.
+    """
+
+    async def session(request, response, call_next):
+        session_id = request.cookies.get(cookie)
+        if session_id:
+            request.user = await run_blocking(lookup, session_id)
+        return await call_next(request, response)
+
+    return session
+
+
+def default_routes(routes):
+    """
+    Compiles a plain ``(method, path) -> handler`` dict with the stock
+    middleware: CORS on every request, the login cookie required for
+    :data:`DEFAULT_PROTECTED_PATHS` and :func:`login_cookies` on
+    ``POST /login``. Plain functions are run on the shared handler pool.
+
+    :param routes (dict): the route handlers.
+
+    :rtype: RouteTable - the compiled routes.
+    """
+    base = (cors, require_login(DEFAULT_PROTECTED_PATHS))
+    table = RouteTable(fallback=Pipeline(None, base))
+    for key, hook in routes.items():
+        if not (inspect.iscoroutinefunction(hook) or inspect.isasyncgenfunction(hook)):
+            hook = _offload(hook)
+        extra = (login_cookies,) if key == ("POST", "/login") else ()
+        table[key] = Pipeline(hook, base + extra)
+    return table
+
+
+def _offload(func):
+    @functools.wraps(func)
+    async def hook(headers, body, **kwargs):
+        return await run_blocking(func, headers=headers, body=body, **kwargs)
+
+    return hook
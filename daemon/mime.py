@@ -0,0 +1,171 @@
+#
+# Copyright (C) 2025 pdnguyen of HCMC University of Technology VNU-HCM.
+# All rights reserved.
+# This file is part of the CO3093/CO3094 course.
+#
+# WeApRous release
+#
+# The authors hereby grant to Licensee personal permission to use
+# and modify the Licensed Source Code for the sole purpose of studying
+# while attending the course
+#
+
+"""
+daemon.mime
+~~~~~~~~~~~~~~~~~
+
+This module provides a :class:`MimeTable <MimeTable>` that maps file
+extensions to everything needed to serve a static file: its Content-Type,
+the directory it is served from, whether it is worth compressing and the
+Cache-Control policy to advertise.
+
+The table is built once at startup, so resolving a request path is one
+dict lookup. Applications can extend or override it and hand their own
+table to the backend.
+
+Usage Example:
+--------------
+>>> table = MimeTable()
+>>> table.add(".md", "text/markdown", base_dir="static/")
+>>> table.lookup("/notes/readme.md").content_type
+'text/markdown'
+"""
+
+import os
+
+#: Cache lifetime advertised for static files, so shared caches such as
+#: the reverse proxy can serve them without hitting the backend.
+STATIC_MAX_AGE = 300
+
+DEFAULT_CACHE_CONTROL = "public, max-age={}".format(STATIC_MAX_AGE)
+
+#: Media types that shrink well under gzip besides text/*.
+COMPRESSIBLE_TYPES = frozenset(
+    (
+        "application/json",
+        "application/javascript",
+        "application/xml",
+        "image/svg+xml",
+        "image/x-icon",
+    )
+)
+
+#: extension -> (content type, base directory)
+DEFAULT_TYPES = {
+    ".html": ("text/html", "www/"),
+    ".htm": ("text/html", "www/"),
+    ".css": ("text/css", "static/"),
+    ".js": ("text/javascript", "static/"),
+    ".txt": ("text/plain", "static/"),
+    ".csv": ("text/csv", "static/"),
+    ".xml": ("text/xml", "static/"),
+    ".png": ("image/png", "static/"),
+    ".jpg": ("image/jpeg", "static/"),
+    ".jpeg": ("image/jpeg", "static/"),
+    ".gif": ("image/gif", "static/"),
+    ".webp": ("image/webp", "static/"),
+    ".svg": ("image/svg+xml", "static/"),
+    ".ico": ("image/x-icon", "static/"),
+    ".mp4": ("video/mp4", "static/"),
+    ".mpeg": ("video/mpeg", "static/"),
+    ".webm": ("video/webm", "static/"),
+    ".woff": ("font/woff", "static/"),
+    ".woff2": ("font/woff2", "static/"),
+    ".pdf": ("application/pdf", "apps/"),
+    ".zip": ("application/zip", "apps/"),
+}
+
+
+class MimeType:
+    """
+    How files with one extension are served.
+
+    :attrs content_type (str): value of the Content-Type header.
+    :attrs base_dir (str): directory the files are served from.
+    :attrs compressible (bool): whether gzip is worth applying.
+    :attrs cache_control (str): Cache-Control policy for the files.
+    """
+
+    __slots__ = ("content_type", "base_dir", "compressible", "cache_control")
+
+    def __init__(self, content_type, base_dir, compressible, cache_control):
+        self.content_type = content_type
+        self.base_dir = base_dir
+        self.compressible = compressible
+        self.cache_control = cache_control
+
+    def __repr__(self):
+        return "<MimeType {} from {}>".format(self.content_type, self.base_dir)
+
+
+class MimeTable:
+    """
+    Extension to :class:`MimeType <MimeType>` lookup table.
+
+    :attrs cache_control (str): policy used by entries added without one.
+    """
+
+    def __init__(self, types=DEFAULT_TYPES, cache_control=DEFAULT_CACHE_CONTROL):
+        """
+        Builds the table.
+
+        :params types (dict): extension -> (content type, base directory).
+        :params cache_control (str): default Cache-Control policy.
+        """
+        self.cache_control = cache_control
+        self._types = {}
+        for ext, (content_type, base_dir) in types.items():
+            self.add(ext, content_type, base_dir)
+
+    def add(
+        self,
+        ext,
+        content_type,
+        base_dir="static/",
+        compressible=None,
+        cache_control=None,
+    ):
+        """
+        Adds or replaces the entry for ``ext``.
+
+        :params ext (str): extension including the dot, e.g. ``".css"``.
+        :params content_type (str): value of the Content-Type header.
+        :params base_dir (str): directory the files are served from.
+        :params compressible (bool): defaults to True for text and other
+            known compressible types.
+        :params cache_control (str): defaults to the table's policy.
+        """
+        if compressible is None:
+            compressible = (
+                content_type.startswith("text/") or content_type in COMPRESSIBLE_TYPES
+            )
+        self._types[ext.lower()] = MimeType(
+            content_type, base_dir, compressible, cache_control or self.cache_control
+        )
+
+    def remove(self, ext):
+        """Stops serving files with extension ``ext``."""
+        self._types.pop(ext.lower(), None)
+
+    def lookup(self, path):
+        """
+        Resolves a request path or file name.
+
+        :params path (str): e.g. ``"/css/styles.css"``.
+
+        :rtype MimeType: the entry, or None for unknown extensions.
+        """
+        return self._types.get(os.path.splitext(path)[1].lower())
+
+    def items(self):
+        return self._types.items()
+
+    def __contains__(self, ext):
+        return ext.lower() in self._types
+
+    def __len__(self):
+        return len(self._types)
+
+
+#: Table used when the application does not configure its own.
+DEFAULT_MIME_TABLE = MimeTable()
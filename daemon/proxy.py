@@ -28,11 +28,19 @@ Requirement:
 
 """
 
+import os
+import signal
 import socket
 import threading
+import time
+import itertools
+import bisect
+import hashlib
 from .response import *
 from .httpadapter import HttpAdapter
 from .dictionary import CaseInsensitiveDict
+from .proxyconf import HostConfig
+from .proxycache import ProxyCache
 
 #: A dictionary mapping hostnames to backend IP and port tuples.
 #: Used to determine routing targets for incoming requests.
@@ -42,7 +50,27 @@ PROXY_PASS = {
     "app2.local": ("192.168.56.103", 9002),
 }
 
-round_robin_index_table = {}
+#: Upstream used when a hostname has no usable proxy_pass mapping.
+DEFAULT_UPSTREAM = ("127.0.0.1", 9000)
+
+#: Seconds allowed for an upstream health probe while warming a table.
+PROBE_TIMEOUT = 0.5
+
+#: Seconds between re-probes of upstreams that failed their last probe.
+PROBE_INTERVAL = 30.0
+
+#: Upper bound on the request header block read before routing.
+MAX_HEADER_BYTES = 65536
+
+#: Number of points each upstream owns on a consistent-hash ring.
+VIRTUAL_NODES = 160
+
+#: Policies that pin a request key onto a consistent-hash ring, mapped to
+#: the key used when ``dist_policy`` does not name one.
+HASH_POLICIES = {
+    "consistent-hash": "ip",
+    "sticky": "cookie:session_id",
+}
 
 
 def forward_request(host, port, request):
@@ -81,51 +109,634 @@ def forward_request(host, port, request):
         ).encode("utf-8")
 
 
-def resolve_routing_policy(hostname, routes):
+def parse_upstream(upstream):
     """
-    Handles an routing policy to return the matching proxy_pass.
-    It determines the target backend to forward the request to.
+    Parses a ``proxy_pass`` target into a ``(host, port)`` tuple.
 
-    :params host (str): IP address of the request target server.
-    :params port (int): port number of the request target server.
-    :params routes (dict): dictionary mapping hostnames and location.
+    :params upstream (str or tuple): "host:port" string or an already parsed tuple.
+
+    :rtype tuple: (host, port) with an integer port.
+
+    :raises ValueError: If the port is missing or not a valid integer.
+    """
+
+    if isinstance(upstream, tuple):
+        host, port = upstream
+    else:
+        host, _, port = upstream.rpartition(":")
+    return host, int(port)
+
+
+def _ring_hash(value):
+    """Returns a process-independent 64-bit hash used for ring placement."""
+    return int.from_bytes(hashlib.md5(value.encode("utf-8")).digest()[:8], "big")
+
+
+class HashRing:
     """
+    The :class:`HashRing <HashRing>` object, a consistent-hash ring with
+    virtual nodes.
+
+    Each upstream is placed on the ring ``vnodes`` times, and a key is owned
+    by the first point clockwise from its hash. Adding or removing one of N
+    upstreams therefore only remaps about 1/N of the keys.
+
+    Usage::
 
-    proxy_map, policy = routes.get(hostname, ("127.0.0.1:9000", "round-robin"))
+      >>> ring = HashRing([("127.0.0.1", 9000), ("127.0.0.1", 9001)])
+      >>> ring.get("OtY59NZHvXoM6uymlIF64UssEutJmAGi")
+      ('127.0.0.1', 9001)
+    """
+
+    def __init__(self, upstreams=(), vnodes=VIRTUAL_NODES):
+        self.vnodes = vnodes
+        #: Sorted (points, owners) pair, swapped as a whole so readers
+        #: never see a half-rebuilt ring.
+        self._ring = ([], [])
+        self._upstreams = set()
+        self._lock = threading.Lock()
+        for upstream in upstreams:
+            self.add(upstream)
+
+    def _rebuild(self, ring):
+        ring.sort()
+        self._ring = ([point for point, _ in ring], [owner for _, owner in ring])
+
+    def add(self, upstream):
+        """Places ``upstream`` on the ring."""
+        with self._lock:
+            if upstream in self._upstreams:
+                return
+            self._upstreams.add(upstream)
+            ring = list(zip(*self._ring))
+            host, port = upstream
+            for i in range(self.vnodes):
+                ring.append((_ring_hash("{}:{}#{}".format(host, port, i)), upstream))
+            self._rebuild(ring)
+
+    def remove(self, upstream):
+        """Removes ``upstream`` and all of its virtual nodes from the ring."""
+        with self._lock:
+            if upstream not in self._upstreams:
+                return
+            self._upstreams.discard(upstream)
+            self._rebuild([(p, o) for p, o in zip(*self._ring) if o != upstream])
+
+    def get(self, key):
+        """
+        Returns the upstream owning ``key``.
+
+        :params key (str): routing key, e.g. a session id or client IP.
+
+        :rtype tuple: (host, port), or None if the ring is empty.
+        """
+
+        points, owners = self._ring
+        if not points:
+            return None
+        idx = bisect.bisect(points, _ring_hash(key))
+        if idx == len(points):
+            idx = 0
+        return owners[idx]
+
+
+def extract_hash_key(spec, request, client_ip):
+    """
+    Extracts the routing key named by ``spec`` from a raw HTTP request.
+
+    :params spec (str): "ip", "cookie:<name>" or "header:<name>".
+    :params request (str): raw HTTP request text.
+    :params client_ip (str): address of the connecting client.
+
+    :rtype str: the key value, falling back to the client IP when the
+                named cookie or header is absent.
+    """
 
-    proxy_host = ""
-    proxy_port = "9000"
-    if isinstance(proxy_map, list):
-        if len(proxy_map) == 0:
-            print("[Proxy] Emtpy resolved routing of hostname {}".format(hostname))
-            print("Empty proxy_map result")
+    kind, _, name = spec.partition(":")
+    if kind in ("cookie", "header") and request:
+        wanted = "cookie" if kind == "cookie" else name.lower()
+        head = request.split("\r\n\r\n", 1)[0]
+        for line in head.split("\r\n")[1:]:
+            field, sep, value = line.partition(":")
+            if not sep or field.strip().lower() != wanted:
+                continue
+            value = value.strip()
+            if kind == "header":
+                return value
+            for pair in value.split(";"):
+                cookie_name, sep, cookie_value = pair.strip().partition("=")
+                if sep and cookie_name == name:
+                    return cookie_value
+    return client_ip or ""
+
+
+class UpstreamGroup:
+    """
+    The :class:`UpstreamGroup <UpstreamGroup>` object, which holds the
+    balancer state of one virtual host.
+
+    Upstreams are parsed once when the routing table is built, so the
+    per-request path only selects a precomputed ``(host, port)`` tuple.
+    The round-robin cursor is an :func:`itertools.count`, whose ``next()``
+    is atomic under the GIL, so concurrent proxy threads never race on a
+    read-increment-write of a shared index.
+
+    The ``consistent-hash`` and ``sticky`` policies pin a request key
+    (client IP, a cookie or a header) to one upstream through a
+    :class:`HashRing <HashRing>`, so a user keeps hitting the same backend
+    process.
+
+    :attrs upstreams (tuple): parsed (host, port) tuples.
+    :attrs available (tuple): upstreams that passed the last health probe.
+    :attrs policy (str): distribution policy, e.g. "round-robin".
+    :attrs hash_key (str): key spec for hash policies, e.g. "cookie:session_id".
+    :attrs set_headers (tuple): (name, value) pairs from proxy_set_header.
+    """
+
+    __attrs__ = [
+        "upstreams",
+        "available",
+        "policy",
+        "hash_key",
+        "ring",
+        "set_headers",
+    ]
+
+    def __init__(self, upstreams, policy="round-robin", set_headers=()):
+        """
+        Initializes a new :class:`UpstreamGroup <UpstreamGroup>` object.
+
+        :params upstreams (list): proxy_pass targets as "host:port" strings or tuples.
+        :params policy (str): distribution policy, optionally followed by its
+                              key, e.g. "consistent-hash header:X-User".
+        :params set_headers (list): (name, value) headers rewritten on forwarded
+                                    requests; values may use $host and $remote_addr.
+        """
+
+        parsed = []
+        for upstream in upstreams:
+            try:
+                parsed.append(parse_upstream(upstream))
+            except ValueError:
+                print("[Proxy] Skipping invalid upstream {}".format(upstream))
+        #: Parsed upstream (host, port) tuples.
+        self.upstreams = tuple(parsed)
+        #: Healthy upstreams, every upstream until the first probe.
+        self.available = self.upstreams
+        name, _, key = (policy or "round-robin").partition(" ")
+        #: Distribution policy.
+        self.policy = name
+        #: Routing key spec for hash policies.
+        self.hash_key = key.strip() or HASH_POLICIES.get(name)
+        #: Consistent-hash ring, only built for hash policies.
+        self.ring = HashRing(self.upstreams) if name in HASH_POLICIES else None
+        #: Headers set on forwarded requests.
+        self.set_headers = tuple(set_headers)
+        #: Atomic round-robin cursor.
+        self._counter = itertools.count()
+
+    def select(self, request=None, client_ip=None):
+        """
+        Selects the upstream for the next request.
+
+        :params request (str): raw HTTP request, used by hash policies.
+        :params client_ip (str): address of the connecting client.
+
+        :rtype tuple: (host, port) of the selected upstream.
+        """
+
+        upstreams = self.available
+        if not upstreams:
             # TODO: implement the error handling for non mapped host
             #       the policy is design by team, but it can be
             #       basic default host in your self-defined system
             # Use a dummy host to raise an invalid connection
-            proxy_host = "127.0.0.1"
-            proxy_port = "9000"
-        elif len(proxy_map) == 1:
-            proxy_host, proxy_port = proxy_map[0].split(":", 2)
-        elif policy == "round-robin":
-            if hostname not in round_robin_index_table:
-                round_robin_index_table[hostname] = 0
-            idx = round_robin_index_table[hostname]
-            proxy_host, proxy_port = proxy_map[idx].split(":", 2)
-            idx = (idx + 1) % len(proxy_map)
-            round_robin_index_table[hostname] = idx
-        else:
-            # Out-of-handle mapped host
-            proxy_host = "127.0.0.1"
-            proxy_port = "9000"
-    else:
-        print("[Proxy] resolve route of hostname {} is a singulair to".format(hostname))
-        proxy_host, proxy_port = proxy_map.split(":", 2)
+            return DEFAULT_UPSTREAM
+        if len(upstreams) == 1:
+            return upstreams[0]
+        if self.policy == "round-robin":
+            return upstreams[next(self._counter) % len(upstreams)]
+        if self.ring is not None:
+            return self.ring.get(extract_hash_key(self.hash_key, request, client_ip))
+        # Out-of-handle policy
+        return DEFAULT_UPSTREAM
+
+    def probe(self, timeout=PROBE_TIMEOUT):
+        """
+        Health-checks every upstream with a TCP connect and narrows the
+        selectable set to the reachable ones. When none answer, every
+        upstream stays selectable so requests still fail loudly upstream.
+
+        :params timeout (float): connect timeout per upstream in seconds.
+
+        :rtype tuple: the upstreams now considered available.
+        """
+
+        healthy = []
+        for upstream in self.upstreams:
+            try:
+                socket.create_connection(upstream, timeout=timeout).close()
+                healthy.append(upstream)
+            except OSError:
+                print("[Proxy] Upstream {}:{} is unreachable".format(*upstream))
+        healthy = tuple(healthy) or self.upstreams
+        if self.ring is not None:
+            for upstream in self.upstreams:
+                if upstream in healthy:
+                    self.ring.add(upstream)
+                else:
+                    self.ring.remove(upstream)
+        self.available = healthy
+        return healthy
+
+
+class PrefixTable:
+    """
+    The :class:`PrefixTable <PrefixTable>` object, a character trie for
+    longest-prefix matching of request paths against ``location`` prefixes.
+
+    A lookup walks the path once, so matching costs O(len(path)) however
+    many locations a host defines.
 
-    return proxy_host, proxy_port
+    Usage::
 
+      >>> table = PrefixTable()
+      >>> table.insert("/", "root")
+      >>> table.insert("/static/", "assets")
+      >>> table.match("/static/css/styles.css")
+      'assets'
+    """
+
+    def __init__(self):
+        self._root = {}
+
+    def insert(self, prefix, value):
+        node = self._root
+        for char in prefix:
+            node = node.setdefault(char, {})
+        node[None] = value
+
+    def match(self, path, default=None):
+        """Returns the value of the longest prefix of ``path``, or ``default``."""
+        node = self._root
+        found = node.get(None, default)
+        for char in path:
+            node = node.get(char)
+            if node is None:
+                break
+            if None in node:
+                found = node[None]
+        return found
+
+
+class RoutingTable:
+    """
+    The :class:`RoutingTable <RoutingTable>` object, an immutable and
+    versioned snapshot of the virtual hosts of one config generation.
 
-def handle_client(ip, port, conn, addr, routes):
+    A connection resolves its backend against the snapshot it was accepted
+    with, so a reload never changes the routing of in-flight requests.
+
+    :attrs version (int): generation number, incremented on each reload.
+    :attrs groups (dict): hostname mapped to its default
+                          :class:`UpstreamGroup <UpstreamGroup>`.
+    :attrs locations (dict): hostname mapped to a :class:`PrefixTable <PrefixTable>`
+                             of location upstream groups.
+    """
+
+    __attrs__ = [
+        "version",
+        "groups",
+        "locations",
+        "location_groups",
+    ]
+
+    def __init__(self, groups, version=1, locations=None):
+        #: Generation number.
+        self.version = version
+        #: Hostname to balancer mapping.
+        self.groups = groups
+        #: Hostname to location prefix table mapping.
+        self.locations = locations or {}
+        #: (hostname, prefix, group) for every location, in config order.
+        self.location_groups = []
+
+    def get(self, hostname, default=None):
+        return self.groups.get(hostname, default)
+
+    def add_location(self, hostname, prefix, group):
+        """Routes paths under ``prefix`` on ``hostname`` to ``group``."""
+        table = self.locations.get(hostname)
+        if table is None:
+            table = self.locations[hostname] = PrefixTable()
+        table.insert(prefix, group)
+        self.location_groups.append((hostname, prefix, group))
+
+    def match(self, hostname, path=None):
+        """
+        Returns the upstream group serving ``path`` on ``hostname``: the
+        longest matching location, else the host's default group.
+        """
+
+        group = self.groups.get(hostname)
+        table = self.locations.get(hostname)
+        if table is not None and path:
+            return table.match(path, group)
+        return group
+
+    def all_groups(self):
+        """Iterates every upstream group, host defaults and locations alike."""
+        for group in self.groups.values():
+            yield group
+        for _, _, group in self.location_groups:
+            yield group
+
+    def warm(self, timeout=PROBE_TIMEOUT):
+        """Probes every upstream group so health state is ready before use."""
+        for group in self.all_groups():
+            group.probe(timeout)
+
+    def recover(self, timeout=PROBE_TIMEOUT):
+        """Re-probes only the groups that currently exclude an upstream."""
+        for group in self.all_groups():
+            if group.available != group.upstreams:
+                group.probe(timeout)
+
+
+def _add_locations(table, hostname, locations):
+    for location in locations:
+        group = UpstreamGroup(
+            location.upstreams, location.policy, location.set_headers
+        )
+        table.add_location(hostname, location.prefix, group)
+        _add_locations(table, hostname, location.locations)
+
+
+def build_routing_table(routes, version=1):
+    """
+    Compiles the routes parsed from the config file into balancer objects.
+
+    :params routes (dict): hostname mapped to a :class:`HostConfig <HostConfig>`,
+                           or to a legacy (proxy_map, policy) tuple where
+                           proxy_map is a "host:port" string or a list of them.
+    :params version (int): generation number of the resulting table.
+
+    :rtype RoutingTable: the compiled :class:`RoutingTable <RoutingTable>`.
+    """
+
+    table = RoutingTable({}, version)
+    for hostname, route in routes.items():
+        if isinstance(route, HostConfig):
+            table.groups[hostname] = UpstreamGroup(
+                route.upstreams, route.policy, route.set_headers
+            )
+            _add_locations(table, hostname, route.locations)
+            continue
+        proxy_map, policy = route
+        if not isinstance(proxy_map, list):
+            proxy_map = [proxy_map]
+        if not proxy_map:
+            print("[Proxy] Empty resolved routing of hostname {}".format(hostname))
+        table.groups[hostname] = UpstreamGroup(proxy_map, policy)
+    return table
+
+
+class RouteManager:
+    """
+    The :class:`RouteManager <RouteManager>` object, which owns the live
+    :class:`RoutingTable <RoutingTable>` and hot-reloads it from the
+    config file.
+
+    A reload re-parses the file in the background, validates it, warms the
+    health state of the new upstream groups and only then swaps
+    :attr:`current`. The swap is a single reference assignment, so the
+    accept loop always hands out either the old or the new table.
+
+    Usage::
+
+      >>> manager = RouteManager(table, "config/proxy.conf", parse_virtual_hosts)
+      >>> manager.watch(interval=2.0)
+      >>> manager.install_signal_handler()
+    """
+
+    def __init__(self, table, config_file=None, loader=None):
+        """
+        :params table (RoutingTable): initial routing table.
+        :params config_file (str): path of the config file to watch.
+        :params loader (callable): parses ``config_file`` into a routes dict.
+        """
+
+        #: Live routing table.
+        self.current = table
+        self.config_file = config_file
+        self.loader = loader
+        self._mtime = self._stat()
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+
+    def _stat(self):
+        try:
+            return os.stat(self.config_file).st_mtime
+        except (OSError, TypeError):
+            return None
+
+    def validate(self, routes):
+        """
+        Checks a freshly parsed routes dict before it goes live.
+
+        :raises ValueError: If no host is defined or a host has no valid upstream.
+        """
+
+        if not routes:
+            raise ValueError("no host block defined")
+        table = build_routing_table(routes, self.current.version + 1)
+        for hostname, group in table.groups.items():
+            if not group.upstreams and hostname not in table.locations:
+                raise ValueError("host {} has no valid proxy_pass".format(hostname))
+        for hostname, prefix, group in table.location_groups:
+            if not group.upstreams:
+                raise ValueError(
+                    "location {} of host {} has no valid proxy_pass".format(
+                        prefix, hostname
+                    )
+                )
+        return table
+
+    def reload(self):
+        """
+        Re-parses the config file and atomically swaps in the new table.
+        On any parse or validation error the current table is kept.
+
+        :rtype bool: True if a new table went live.
+        """
+
+        if not self.loader:
+            return False
+        with self._lock:
+            self._mtime = self._stat()
+            try:
+                table = self.validate(self.loader(self.config_file))
+            except Exception as e:
+                print("[Proxy] Config reload rejected: {}".format(e))
+                return False
+            table.warm()
+            self.current = table
+            print("[Proxy] Routing table v{} is live".format(table.version))
+            return True
+
+    def _watch_loop(self, interval, probe_interval):
+        last_probe = time.monotonic()
+        while not self._stop.wait(interval):
+            now = time.monotonic()
+            mtime = self._stat()
+            if mtime is not None and mtime != self._mtime:
+                self.reload()
+                last_probe = now
+            elif probe_interval > 0 and now - last_probe >= probe_interval:
+                self.current.recover()
+                last_probe = now
+
+    def watch(self, interval=2.0, probe_interval=PROBE_INTERVAL):
+        """
+        Starts a daemon thread that reloads the config when its mtime changes.
+        Healthy upstreams are only probed while a new table warms up; the
+        ones excluded by a failed probe are retried every ``probe_interval``.
+
+        :params interval (float): config file polling period in seconds.
+        :params probe_interval (float): seconds between re-probes of
+                                        unreachable upstreams, 0 to disable.
+        """
+
+        watcher = threading.Thread(
+            target=self._watch_loop, args=(interval, probe_interval)
+        )
+        watcher.daemon = True
+        watcher.start()
+
+    def install_signal_handler(self):
+        """
+        Reloads the config on SIGHUP, where the platform supports it.
+        Signal handlers can only be set from the main thread, so this is a
+        no-op when the proxy is started from a worker thread.
+        """
+        if not hasattr(signal, "SIGHUP"):
+            return
+        if threading.current_thread() is not threading.main_thread():
+            return
+
+        def on_sighup(signum, frame):
+            threading.Thread(target=self.reload, daemon=True).start()
+
+        signal.signal(signal.SIGHUP, on_sighup)
+
+    def stop(self):
+        """Stops the config watcher thread."""
+        self._stop.set()
+
+
+def resolve_routing_policy(
+    hostname, routes, request=None, client_ip=None, path=None
+):
+    """
+    Handles an routing policy to return the matching proxy_pass.
+    It determines the target backend to forward the request to.
+
+    :params hostname (str): Host header of the incoming request.
+    :params routes (RoutingTable): routing table snapshot.
+    :params request (str): raw HTTP request, used by hash policies.
+    :params client_ip (str): address of the connecting client.
+    :params path (str): request path, matched against location prefixes.
+
+    :rtype tuple: (host, port) of the target backend.
+    """
+
+    group = routes.match(hostname, path)
+    if group is None:
+        return DEFAULT_UPSTREAM
+    return group.select(request, client_ip)
+
+
+def apply_set_headers(request, set_headers, variables):
+    """
+    Rewrites request headers as configured by ``proxy_set_header``.
+    An existing header with the same name is replaced, otherwise the
+    header is added. ``$name`` variables in values are substituted.
+
+    :params request (str): raw HTTP request.
+    :params set_headers (tuple): (name, value) pairs.
+    :params variables (dict): variable name (without "$") to value.
+
+    :rtype str: the rewritten request.
+    """
+
+    if not set_headers:
+        return request
+    head, sep, body = request.partition("\r\n\r\n")
+    lines = head.split("\r\n")
+    for name, value in set_headers:
+        for var, var_value in variables.items():
+            value = value.replace("$" + var, var_value)
+        lowered = name.lower()
+        lines = [lines[0]] + [
+            line
+            for line in lines[1:]
+            if line.partition(":")[0].strip().lower() != lowered
+        ]
+        lines.append("{}: {}".format(name, value))
+    return "\r\n".join(lines) + sep + body
+
+
+def read_request(conn):
+    """
+    Reads one full HTTP request from the client socket.
+
+    The whole header block is read before routing, so hash policies always
+    see the cookies and headers they key on, followed by ``Content-Length``
+    bytes of body.
+
+    :params conn (socket.socket): client connection socket.
+
+    :rtype str: the raw request, possibly truncated at ``MAX_HEADER_BYTES``
+                of headers if the client never terminates them.
+    """
+
+    data = b""
+    while b"\r\n\r\n" not in data and len(data) < MAX_HEADER_BYTES:
+        chunk = conn.recv(4096)
+        if not chunk:
+            break
+        data += chunk
+
+    head, sep, body = data.partition(b"\r\n\r\n")
+    length = 0
+    for line in head.split(b"\r\n")[1:]:
+        field, _, value = line.partition(b":")
+        if field.strip().lower() == b"content-length":
+            try:
+                length = int(value.strip())
+            except ValueError:
+                length = 0
+    while sep and len(body) < length:
+        chunk = conn.recv(min(65536, length - len(body)))
+        if not chunk:
+            break
+        body += chunk
+
+    return (head + sep + body).decode()
+
+
+def parse_request_headers(request):
+    """Returns the lowercased header fields of a raw HTTP request."""
+    headers = {}
+    head = request.split("\r\n\r\n", 1)[0]
+    for line in head.split("\r\n")[1:]:
+        name, sep, value = line.partition(":")
+        if sep:
+            headers[name.strip().lower()] = value.strip()
+    return headers
+
+
+def handle_client(ip, port, conn, addr, routes, cache=None):
     """
     Handles an individual client connection by parsing the request,
     determining the target backend, and forwarding the request.
@@ -141,10 +752,11 @@ def handle_client(ip, port, conn, addr, routes):
     :params port (int): port number of the proxy server.
     :params conn (socket.socket): client connection socket.
     :params addr (tuple): client address (IP, port).
-    :params routes (dict): dictionary mapping hostnames and location.
+    :params routes (RoutingTable): routing table snapshot for this connection.
+    :params cache (ProxyCache): shared response cache, or None to disable caching.
     """
 
-    request = conn.recv(1024).decode()
+    request = read_request(conn)
 
     # add client ip to the request
     try:
@@ -162,41 +774,57 @@ def handle_client(ip, port, conn, addr, routes):
     print(request_fwd)
 
     # Extract hostname
+    hostname = ""
     for line in request.splitlines():
         if line.lower().startswith("host:"):
             hostname = line.split(":", 1)[1].strip()
 
     print("[Proxy] {} at Host: {}".format(addr, hostname))
 
-    # Resolve the matching destination in routes and need conver port
-    # to integer value
-    resolved_host, resolved_port = resolve_routing_policy(hostname, routes)
-    try:
-        resolved_port = int(resolved_port)
-    except ValueError:
-        print("Not a valid integer")
+    # Extract the request path for location matching
+    request_line = request.split("\r\n", 1)[0].split()
+    method = request_line[0] if request_line else ""
+    uri = request_line[1] if len(request_line) > 1 else "/"
+    path = uri.split("?", 1)[0]
+
+    # Resolve the matching destination in the precompiled routing table
+    group = routes.match(hostname, path)
+    if group is not None:
+        request_fwd = apply_set_headers(
+            request_fwd,
+            group.set_headers,
+            {"host": hostname, "remote_addr": addr[0], "request_uri": uri},
+        )
 
-    if resolved_host:
+    def fetch_upstream(extra_headers):
+        # The backend is only selected on a cache miss, so hits do not
+        # advance the balancer.
+        if group is None:
+            resolved_host, resolved_port = DEFAULT_UPSTREAM
+        else:
+            resolved_host, resolved_port = group.select(request, addr[0])
         print(
             "[Proxy] Host name {} is forwarded to {}:{}".format(
                 hostname, resolved_host, resolved_port
             )
         )
-        response = forward_request(resolved_host, resolved_port, request_fwd)
+        return forward_request(
+            resolved_host,
+            resolved_port,
+            apply_set_headers(request_fwd, tuple(extra_headers.items()), {}),
+        )
+
+    if cache is not None:
+        response = cache.fetch(
+            method, hostname, uri, parse_request_headers(request), fetch_upstream
+        )
     else:
-        response = (
-            "HTTP/1.1 404 Not Found\r\n"
-            "Content-Type: text/plain\r\n"
-            "Content-Length: 13\r\n"
-            "Connection: close\r\n"
-            "\r\n"
-            "404 Not Found"
-        ).encode("utf-8")
+        response = fetch_upstream({})
     conn.sendall(response)
     conn.close()
 
 
-def run_proxy(ip, port, routes):
+def run_proxy(ip, port, routes, cache=None):
     """
     Starts the proxy server and listens for incoming connections.
 
@@ -207,7 +835,10 @@ def run_proxy(ip, port, routes):
 
     :params ip (str): IP address to bind the proxy server.
     :params port (int): port number to listen on.
-    :params routes (dict): dictionary mapping hostnames and location.
+    :params routes (RouteManager): owner of the live routing table; each
+                                   connection is pinned to the table that
+                                   is current when it is accepted.
+    :params cache (ProxyCache): shared response cache, or None.
 
     """
 
@@ -225,7 +856,8 @@ def run_proxy(ip, port, routes):
             #        provided handle_client routine
             #
             client_thread = threading.Thread(
-                target=handle_client, args=(ip, port, conn, addr, routes)
+                target=handle_client,
+                args=(ip, port, conn, addr, routes.current, cache),
             )
             client_thread.daemon = True
             client_thread.start()
@@ -233,13 +865,37 @@ def run_proxy(ip, port, routes):
         print("Socket error: {}".format(e))
 
 
-def create_proxy(ip, port, routes):
+def create_proxy(
+    ip,
+    port,
+    routes,
+    config_file=None,
+    loader=None,
+    reload_interval=2.0,
+    cache_size=0,
+    cache_dir=None,
+):
     """
     Entry point for launching the proxy server.
 
+    When ``config_file`` and ``loader`` are given, the routing table is
+    hot-reloaded on SIGHUP and, if ``reload_interval`` is positive, whenever
+    the file changes on disk.
+
     :params ip (str): IP address to bind the proxy server.
     :params port (int): port number to listen on.
     :params routes (dict): dictionary mapping hostnames and location.
+    :params config_file (str): config file to reload routes from.
+    :params loader (callable): parses ``config_file`` into a routes dict.
+    :params reload_interval (float): seconds between config file checks.
+    :params cache_size (int): bytes of in-memory response cache, 0 to disable.
+    :params cache_dir (str): directory of the on-disk cache tier, or None.
     """
 
-    run_proxy(ip, port, routes)
+    manager = RouteManager(build_routing_table(routes), config_file, loader)
+    if config_file and loader:
+        manager.install_signal_handler()
+        if reload_interval > 0:
+            manager.watch(reload_interval)
+    cache = ProxyCache(cache_size, cache_dir) if cache_size > 0 else None
+    run_proxy(ip, port, manager, cache)
@@ -0,0 +1,470 @@
+#
+# Copyright (C) 2025 pdnguyen of HCMC University of Technology VNU-HCM.
+# All rights reserved.
+# This file is part of the CO3093/CO3094 course.
+#
+# WeApRous release
+#
+# The authors hereby grant to Licensee personal permission to use
+# and modify the Licensed Source Code for the sole purpose of studying
+# while attending the course
+#
+
+"""
+daemon.proxycache
+~~~~~~~~~~~~~~~~~
+
+This module implements the shared response cache of the reverse proxy.
+
+Upstream responses to ``GET`` requests are stored according to their
+``Cache-Control``, ``Expires``, ``ETag`` and ``Vary`` headers in an
+in-memory LRU bounded by bytes, with an optional on-disk tier behind it.
+Concurrent misses on the same key are coalesced into one upstream fetch
+whose response is shared only if it is storable, and entries inside their ``stale-while-revalidate`` window are served
+immediately while a background thread refreshes them.
+
+Usage Example:
+--------------
+>>> cache = ProxyCache(max_bytes=64 * 1024 * 1024)
+>>> raw = cache.fetch("GET", "app1.local", "/login.html", headers, fetch_upstream)
+"""
+
+import os
+import json
+import time
+import hashlib
+import threading
+import email.utils
+from collections import OrderedDict
+
+#: Status codes whose responses may be stored.
+CACHEABLE_STATUS = (200, 203, 204, 300, 301, 404, 410)
+
+#: Negative responses (404, 410) are kept at most this long, whatever
+#: lifetime the upstream advertises.
+NEGATIVE_MAX_TTL = 60
+
+#: Default capacity of the in-memory tier.
+DEFAULT_MAX_BYTES = 64 * 1024 * 1024
+
+
+def parse_response(raw):
+    """
+    Splits a raw HTTP response into its parts.
+
+    :params raw (bytes): complete HTTP response.
+
+    :rtype tuple: (status code, {lowercased name: value}, body), or
+                  (0, {}, raw) if the response cannot be parsed.
+    """
+
+    head, sep, body = raw.partition(b"\r\n\r\n")
+    if not sep:
+        return 0, {}, raw
+    lines = head.decode("latin-1").split("\r\n")
+    try:
+        status = int(lines[0].split()[1])
+    except (IndexError, ValueError):
+        return 0, {}, raw
+    headers = {}
+    for line in lines[1:]:
+        name, _, value = line.partition(":")
+        name = name.strip().lower()
+        if name in headers:
+            headers[name] += ", " + value.strip()
+        else:
+            headers[name] = value.strip()
+    return status, headers, body
+
+
+def parse_cache_control(value):
+    """
+    Parses a Cache-Control header into a directive dictionary.
+
+    :params value (str): header value, e.g. "public, max-age=300".
+
+    :rtype dict: directive name mapped to its value (None when bare).
+    """
+
+    directives = {}
+    for part in (value or "").split(","):
+        name, sep, arg = part.strip().partition("=")
+        if name:
+            directives[name.lower()] = arg.strip('"') if sep else None
+    return directives
+
+
+def _seconds(directives, name):
+    try:
+        return max(0, int(directives[name]))
+    except (KeyError, TypeError, ValueError):
+        return None
+
+
+def freshness(headers, now=None):
+    """
+    Computes how long an upstream response may be served from a shared cache.
+
+    :params headers (dict): lowercased response headers.
+    :params now (float): current time, defaults to :func:`time.time`.
+
+    :rtype tuple: (ttl, stale_while_revalidate) in seconds, or None if the
+                  response must not be stored.
+    """
+
+    now = time.time() if now is None else now
+    directives = parse_cache_control(headers.get("cache-control"))
+    if "no-store" in directives or "private" in directives:
+        return None
+    if "set-cookie" in headers or headers.get("vary", "").strip() == "*":
+        return None
+    swr = _seconds(directives, "stale-while-revalidate") or 0
+    if "no-cache" in directives:
+        # Storable, but must be revalidated before every use.
+        return (0, 0) if "etag" in headers else None
+    ttl = _seconds(directives, "s-maxage")
+    if ttl is None:
+        ttl = _seconds(directives, "max-age")
+    if ttl is None and "expires" in headers:
+        try:
+            expires = email.utils.parsedate_to_datetime(headers["expires"])
+            ttl = max(0, int(expires.timestamp() - now))
+        except (TypeError, ValueError):
+            ttl = 0
+    if ttl is None:
+        return None
+    return ttl, swr
+
+
+class CacheEntry:
+    """
+    The :class:`CacheEntry <CacheEntry>` object, one stored upstream response.
+
+    :attrs raw (bytes): complete HTTP response as received from upstream.
+    :attrs stored_at (float): time the response was stored or revalidated.
+    :attrs ttl (int): freshness lifetime in seconds.
+    :attrs swr (int): stale-while-revalidate window in seconds.
+    :attrs etag (str): validator sent back as If-None-Match.
+    """
+
+    __slots__ = ("raw", "stored_at", "ttl", "swr", "etag")
+
+    def __init__(self, raw, stored_at, ttl, swr, etag=None):
+        self.raw = raw
+        self.stored_at = stored_at
+        self.ttl = ttl
+        self.swr = swr
+        self.etag = etag
+
+    @property
+    def size(self):
+        return len(self.raw)
+
+    def age(self, now):
+        return max(0, now - self.stored_at)
+
+    def is_fresh(self, now):
+        return self.age(now) < self.ttl
+
+    def is_servable_stale(self, now):
+        return self.age(now) < self.ttl + self.swr
+
+
+class MemoryTier:
+    """An LRU of :class:`CacheEntry <CacheEntry>` objects bounded by total bytes."""
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self.size = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+            return entry
+
+    def put(self, key, entry):
+        # One object may not monopolize the tier.
+        if entry.size > self.max_bytes // 8:
+            return False
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self.size -= old.size
+            self._entries[key] = entry
+            self.size += entry.size
+            while self.size > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self.size -= evicted.size
+        return True
+
+    def delete(self, key):
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self.size -= old.size
+
+
+class DiskTier:
+    """
+    A directory of cached responses, one file per key: a JSON metadata
+    line followed by the raw response.
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, key):
+        digest = hashlib.sha1(repr(key).encode("utf-8")).hexdigest()
+        return os.path.join(self.directory, digest)
+
+    def get(self, key):
+        try:
+            with open(self._path(key), "rb") as f:
+                meta = json.loads(f.readline())
+                raw = f.read()
+        except (OSError, ValueError):
+            return None
+        return CacheEntry(
+            raw, meta["stored_at"], meta["ttl"], meta["swr"], meta["etag"]
+        )
+
+    def put(self, key, entry):
+        path = self._path(key)
+        tmp = "{}.{}.tmp".format(path, threading.get_ident())
+        meta = {
+            "stored_at": entry.stored_at,
+            "ttl": entry.ttl,
+            "swr": entry.swr,
+            "etag": entry.etag,
+        }
+        try:
+            with open(tmp, "wb") as f:
+                f.write(json.dumps(meta).encode("utf-8") + b"\n")
+                f.write(entry.raw)
+            os.replace(tmp, path)
+        except OSError as e:
+            print("[ProxyCache] Disk write failed: {}".format(e))
+
+    def delete(self, key):
+        try:
+            os.remove(self._path(key))
+        except OSError:
+            pass
+
+
+class _Flight:
+    """A pending upstream fetch that concurrent misses wait on."""
+
+    __slots__ = ("done", "result", "shareable")
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        #: True if the result may be stored, and so handed to other clients.
+        self.shareable = False
+
+
+def add_header(raw, name, value):
+    """Inserts a header right after the status line of a raw response."""
+    status_line, sep, rest = raw.partition(b"\r\n")
+    header = "{}: {}\r\n".format(name, value).encode("latin-1")
+    return status_line + sep + header + rest
+
+
+class ProxyCache:
+    """
+    The :class:`ProxyCache <ProxyCache>` object, a shared HTTP cache for
+    the reverse proxy.
+
+    :attrs memory (MemoryTier): in-memory LRU tier.
+    :attrs disk (DiskTier): optional on-disk tier, None when disabled.
+    :attrs hits (int): requests answered from the cache.
+    :attrs misses (int): requests that went upstream.
+    """
+
+    def __init__(self, max_bytes=DEFAULT_MAX_BYTES, disk_dir=None):
+        """
+        :params max_bytes (int): capacity of the in-memory tier.
+        :params disk_dir (str): directory of the on-disk tier, or None.
+        """
+
+        self.memory = MemoryTier(max_bytes)
+        self.disk = DiskTier(disk_dir) if disk_dir else None
+        self.hits = 0
+        self.misses = 0
+        #: primary key (host, uri) mapped to the Vary header names last seen.
+        self._vary = {}
+        self._flights = {}
+        self._lock = threading.Lock()
+
+    def _key(self, hostname, uri, headers):
+        primary = (hostname, uri)
+        names = self._vary.get(primary, ())
+        return primary + tuple(headers.get(name, "") for name in names)
+
+    def _lookup(self, key):
+        entry = self.memory.get(key)
+        if entry is None and self.disk is not None:
+            entry = self.disk.get(key)
+            if entry is not None:
+                self.memory.put(key, entry)
+        return entry
+
+    def _store(self, key, entry):
+        if not self.memory.put(key, entry) and self.disk is None:
+            return
+        if self.disk is not None:
+            self.disk.put(key, entry)
+
+    def _evict(self, key):
+        self.memory.delete(key)
+        if self.disk is not None:
+            self.disk.delete(key)
+
+    def fetch(self, method, hostname, uri, headers, fetch_upstream):
+        """
+        Answers a request from the cache or from upstream.
+
+        :params method (str): request method; only GET is cached.
+        :params hostname (str): Host header of the request.
+        :params uri (str): request target including the query string.
+        :params headers (dict): lowercased request headers.
+        :params fetch_upstream (callable): ``fetch_upstream(extra_headers)``
+                                           returns the raw upstream response.
+
+        :rtype bytes: raw HTTP response for the client.
+        """
+
+        request_cc = parse_cache_control(headers.get("cache-control"))
+        # Requests carrying credentials may get a personalized response;
+        # they are neither answered from nor coalesced with shared entries.
+        if (
+            method != "GET"
+            or "authorization" in headers
+            or "cookie" in headers
+            or "no-store" in request_cc
+        ):
+            return fetch_upstream({})
+
+        key = self._key(hostname, uri, headers)
+        now = time.time()
+        entry = self._lookup(key)
+        if entry is not None and "no-cache" not in request_cc:
+            if entry.is_fresh(now):
+                return self._serve(entry, headers, now, "HIT")
+            if entry.is_servable_stale(now):
+                self._revalidate_async(key, hostname, uri, headers, fetch_upstream)
+                return self._serve(entry, headers, now, "STALE")
+
+        return self._fetch_coalesced(
+            key, hostname, uri, headers, entry, fetch_upstream
+        )
+
+    def _serve(self, entry, headers, now, state):
+        self.hits += 1
+        if entry.etag and headers.get("if-none-match") == entry.etag:
+            return (
+                "HTTP/1.1 304 Not Modified\r\n"
+                "ETag: {}\r\n"
+                "Connection: close\r\n"
+                "\r\n".format(entry.etag)
+            ).encode("latin-1")
+        raw = add_header(entry.raw, "Age", int(entry.age(now)))
+        return add_header(raw, "X-Cache", state)
+
+    def _fetch_coalesced(self, key, hostname, uri, headers, entry, fetch_upstream):
+        with self._lock:
+            flight = self._flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._flights[key] = _Flight()
+        if not leader:
+            flight.done.wait()
+            # Reuse the leader's response only if it could be stored, and
+            # unless it revealed a Vary header that puts this request in a
+            # different variant.
+            same_variant = self._key(hostname, uri, headers) == key
+            if flight.result is not None and flight.shareable and same_variant:
+                self.hits += 1
+                return add_header(flight.result, "X-Cache", "COALESCED")
+            return fetch_upstream({})
+
+        try:
+            raw, flight.shareable = self._refresh(
+                key, hostname, uri, headers, entry, fetch_upstream
+            )
+            flight.result = raw
+        finally:
+            with self._lock:
+                self._flights.pop(key, None)
+            flight.done.set()
+        self.misses += 1
+        return add_header(raw, "X-Cache", "MISS")
+
+    def _refresh(self, key, hostname, uri, headers, entry, fetch_upstream):
+        """
+        Fetches from upstream, revalidating ``entry`` when it has an ETag.
+
+        :rtype tuple: (raw response, True if it was stored).
+        """
+        extra = {}
+        if entry is not None and entry.etag:
+            extra["If-None-Match"] = entry.etag
+        raw = fetch_upstream(extra)
+        now = time.time()
+        status, resp_headers, _ = parse_response(raw)
+
+        if status == 304 and entry is not None:
+            policy = freshness(resp_headers, now)
+            if policy is not None:
+                entry.ttl, entry.swr = policy
+            entry.stored_at = now
+            self._store(key, entry)
+            return entry.raw, True
+
+        if status not in CACHEABLE_STATUS:
+            return raw, False
+        policy = freshness(resp_headers, now)
+        if policy is None:
+            self._evict(key)
+            return raw, False
+
+        vary = tuple(
+            name.strip().lower()
+            for name in resp_headers.get("vary", "").split(",")
+            if name.strip()
+        )
+        primary = (hostname, uri)
+        if self._vary.get(primary, ()) != vary:
+            self._vary[primary] = vary
+            key = self._key(hostname, uri, headers)
+        ttl, swr = policy
+        if status in (404, 410):
+            ttl, swr = min(ttl, NEGATIVE_MAX_TTL), 0
+        self._store(key, CacheEntry(raw, now, ttl, swr, resp_headers.get("etag")))
+        return raw, True
+
+    def _revalidate_async(self, key, hostname, uri, headers, fetch_upstream):
+        with self._lock:
+            if key in self._flights:
+                return
+            flight = self._flights[key] = _Flight()
+
+        def worker():
+            try:
+                flight.result, flight.shareable = self._refresh(
+                    key, hostname, uri, headers, self._lookup(key), fetch_upstream
+                )
+            except Exception as e:
+                print("[ProxyCache] Background revalidation failed: {}".format(e))
+            finally:
+                with self._lock:
+                    self._flights.pop(key, None)
+                flight.done.set()
+
+        threading.Thread(target=worker, daemon=True).start()
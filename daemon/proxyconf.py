@@ -0,0 +1,308 @@
+#
+# Copyright (C) 2025 pdnguyen of HCMC University of Technology VNU-HCM.
+# All rights reserved.
+# This file is part of the CO3093/CO3094 course.
+#
+# WeApRous release
+#
+# The authors hereby grant to Licensee personal permission to use
+# and modify the Licensed Source Code for the sole purpose of studying
+# while attending the course
+#
+
+"""
+daemon.proxyconf
+~~~~~~~~~~~~~~~~~
+
+This module implements a tokenizing parser for the NGINX-like proxy
+configuration file (``config/proxy.conf``) and produces a typed config tree.
+
+Grammar::
+
+    config    := host*
+    host      := "host" STRING "{" statement* "}"
+    location  := "location" WORD "{" statement* "}"
+    statement := location | directive
+    directive := WORD argument* (";" | end of line)
+
+Directives may be terminated by a semicolon or by the end of the line, and
+``#`` starts a comment. Locations can be nested; a location without its own
+``proxy_pass`` inherits the upstreams and policy of its parent.
+
+Usage Example:
+--------------
+>>> hosts = parse_config('host "a" { location /static/ { proxy_pass http://x:1; } }')
+>>> hosts["a"].locations[0].upstreams
+['x:1']
+"""
+
+DEFAULT_POLICY = "round-robin"
+
+#: Directives understood inside host and location blocks.
+KNOWN_DIRECTIVES = ("proxy_pass", "proxy_set_header", "dist_policy")
+
+
+class ConfigError(ValueError):
+    """Raised when the config file cannot be tokenized or parsed."""
+
+    def __init__(self, message, line=None):
+        if line is not None:
+            message = "line {}: {}".format(line, message)
+        super().__init__(message)
+        self.line = line
+
+
+class Token:
+    """A lexical token: kind is one of WORD, STRING, LBRACE, RBRACE, SEMI."""
+
+    __slots__ = ("kind", "value", "line")
+
+    def __init__(self, kind, value, line):
+        self.kind = kind
+        self.value = value
+        self.line = line
+
+    def __repr__(self):
+        return "Token({}, {!r}, line={})".format(self.kind, self.value, self.line)
+
+
+def tokenize(text):
+    """
+    Splits config text into :class:`Token <Token>` objects.
+
+    :params text (str): raw config file content.
+
+    :rtype list: tokens in source order.
+
+    :raises ConfigError: On an unterminated string.
+    """
+
+    tokens = []
+    line = 1
+    i = 0
+    n = len(text)
+    punct = {"{": "LBRACE", "}": "RBRACE", ";": "SEMI"}
+    while i < n:
+        c = text[i]
+        if c == "\n":
+            line += 1
+            i += 1
+        elif c.isspace():
+            i += 1
+        elif c == "#":
+            while i < n and text[i] != "\n":
+                i += 1
+        elif c in punct:
+            tokens.append(Token(punct[c], c, line))
+            i += 1
+        elif c == '"':
+            start_line = line
+            i += 1
+            value = []
+            while i < n and text[i] != '"':
+                if text[i] == "\\" and i + 1 < n:
+                    i += 1
+                if text[i] == "\n":
+                    line += 1
+                value.append(text[i])
+                i += 1
+            if i >= n:
+                raise ConfigError("unterminated string", start_line)
+            tokens.append(Token("STRING", "".join(value), start_line))
+            i += 1
+        else:
+            start = i
+            while i < n and not text[i].isspace() and text[i] not in '{};"#':
+                i += 1
+            tokens.append(Token("WORD", text[start:i], line))
+    return tokens
+
+
+class LocationConfig:
+    """
+    The :class:`LocationConfig <LocationConfig>` object, a ``location``
+    block routing every path under ``prefix`` to its own upstream group.
+
+    :attrs prefix (str): path prefix, e.g. "/static/".
+    :attrs upstreams (list): "host:port" proxy_pass targets.
+    :attrs policy (str): dist_policy, including an optional routing key.
+    :attrs set_headers (list): (name, value) pairs from proxy_set_header.
+    :attrs locations (list): nested :class:`LocationConfig <LocationConfig>` blocks.
+    """
+
+    __attrs__ = [
+        "prefix",
+        "upstreams",
+        "policy",
+        "set_headers",
+        "locations",
+    ]
+
+    def __init__(self, prefix):
+        self.prefix = prefix
+        self.upstreams = []
+        self.policy = None
+        self.set_headers = []
+        self.locations = []
+
+    def __repr__(self):
+        return "<{} {} {} {}>".format(
+            type(self).__name__, self.prefix, self.upstreams, self.policy
+        )
+
+
+class HostConfig(LocationConfig):
+    """
+    The :class:`HostConfig <HostConfig>` object, a ``host`` block. It is the
+    root location ("/") of one virtual host.
+
+    :attrs name (str): virtual host name matched against the Host header.
+    """
+
+    def __init__(self, name):
+        super().__init__("/")
+        self.name = name
+
+    def __repr__(self):
+        return "<HostConfig {} {} {} locations={}>".format(
+            self.name, self.upstreams, self.policy, self.locations
+        )
+
+
+class Parser:
+    """Recursive-descent parser producing :class:`HostConfig <HostConfig>` trees."""
+
+    def __init__(self, tokens):
+        self.tokens = tokens
+        self.pos = 0
+
+    def peek(self):
+        if self.pos < len(self.tokens):
+            return self.tokens[self.pos]
+        return None
+
+    def next(self, kind=None):
+        tok = self.peek()
+        if tok is None:
+            last = self.tokens[-1].line if self.tokens else None
+            raise ConfigError("unexpected end of file", last)
+        if kind and tok.kind != kind:
+            raise ConfigError(
+                "expected {} but found {!r}".format(kind, tok.value), tok.line
+            )
+        self.pos += 1
+        return tok
+
+    def parse(self):
+        hosts = {}
+        while self.peek() is not None:
+            tok = self.next("WORD")
+            if tok.value != "host":
+                raise ConfigError("expected 'host' block", tok.line)
+            name = self.next()
+            if name.kind not in ("STRING", "WORD"):
+                raise ConfigError("expected host name", name.line)
+            host = HostConfig(name.value)
+            self.parse_block(host)
+            if host.name in hosts:
+                raise ConfigError("duplicate host {!r}".format(host.name), tok.line)
+            hosts[host.name] = host
+        return hosts
+
+    def parse_block(self, node):
+        self.next("LBRACE")
+        while True:
+            tok = self.next()
+            if tok.kind == "RBRACE":
+                return
+            if tok.kind == "SEMI":
+                continue
+            if tok.kind != "WORD":
+                raise ConfigError("unexpected {!r}".format(tok.value), tok.line)
+            if tok.value == "location":
+                prefix = self.next()
+                if prefix.kind not in ("STRING", "WORD"):
+                    raise ConfigError("expected location prefix", prefix.line)
+                location = LocationConfig(prefix.value)
+                self.parse_block(location)
+                node.locations.append(location)
+            else:
+                self.apply(node, tok, self.parse_arguments(tok))
+
+    def parse_arguments(self, directive):
+        # A directive ends at ';', at a brace, or at the end of its line.
+        args = []
+        while True:
+            tok = self.peek()
+            if tok is None or tok.kind in ("LBRACE", "RBRACE"):
+                return args
+            if tok.kind == "SEMI":
+                self.pos += 1
+                return args
+            if tok.line != directive.line:
+                return args
+            args.append(self.next().value)
+
+    def apply(self, node, tok, args):
+        name = tok.value
+        if name not in KNOWN_DIRECTIVES:
+            print(
+                "[Config] line {}: ignoring unknown directive {}".format(tok.line, name)
+            )
+            return
+        if not args:
+            raise ConfigError("{} needs an argument".format(name), tok.line)
+        if name == "proxy_pass":
+            target = args[0]
+            if target.startswith("http://"):
+                target = target[len("http://"):]
+            node.upstreams.append(target.rstrip("/"))
+        elif name == "dist_policy":
+            node.policy = " ".join(args)
+        elif name == "proxy_set_header":
+            if len(args) < 2:
+                raise ConfigError(
+                    "proxy_set_header needs a name and a value", tok.line
+                )
+            node.set_headers.append((args[0], " ".join(args[1:])))
+
+
+def _inherit(parent, locations):
+    for location in locations:
+        if not location.upstreams:
+            location.upstreams = list(parent.upstreams)
+            location.policy = location.policy or parent.policy
+        location.policy = location.policy or DEFAULT_POLICY
+        location.set_headers = parent.set_headers + location.set_headers
+        _inherit(location, location.locations)
+
+
+def parse_config(text):
+    """
+    Parses config text into a typed config tree.
+
+    :params text (str): raw config file content.
+
+    :rtype dict: host name mapped to :class:`HostConfig <HostConfig>`.
+
+    :raises ConfigError: On any lexical or syntax error.
+    """
+
+    hosts = Parser(tokenize(text)).parse()
+    for host in hosts.values():
+        host.policy = host.policy or DEFAULT_POLICY
+        _inherit(host, host.locations)
+    return hosts
+
+
+def load_config(config_file):
+    """
+    Reads and parses a config file.
+
+    :params config_file (str): path to the config file.
+
+    :rtype dict: host name mapped to :class:`HostConfig <HostConfig>`.
+    """
+
+    with open(config_file, "r") as f:
+        return parse_config(f.read())
@@ -40,38 +40,52 @@ class Request:
       <Request>
     """
 
-    __attrs__ = [
+    __slots__ = (
         "method",
         "url",
+        "version",
         "headers",
-        "body",
-        "reason",
-        "cookies",
+        "path",
+        "_cookies",
+        "_cookies_parsed",
         "body",
         "routes",
         "hook",
-    ]
+        "query_string",
+        "_query_params",
+        "user",
+    )
 
     def __init__(self):
+        # The cookies set used to create Cookie header
+        self._cookies = CaseInsensitiveDict()
+        self.reset()
+
+    def reset(self):
+        """Clears the request so the object can serve another one."""
         #: HTTP verb to send to the server.
         self.method = None
         #: HTTP URL to send the request to.
         self.url = None
+        #: HTTP version of the request line.
+        self.version = None
         #: dictionary of HTTP headers.
         self.headers = None
         #: HTTP path
         self.path = None
-        # The cookies set used to create Cookie header
-        self.cookies = CaseInsensitiveDict()
+        self._cookies.clear()
+        self._cookies_parsed = False
         #: request body to send to the server.
         self.body = None
         #: Routes
-        self.routes = {}
+        self.routes = None
         #: Hook point for routed mapped-path
         self.hook = None
-
-        self.body = None
-        self.query_params = {}
+        #: Raw query string of the URL, without the "?".
+        self.query_string = ""
+        self._query_params = None
+        #: User the session resolved to, set by session middleware.
+        self.user = None
 
     def extract_request_line(self, request):
         try:
@@ -80,11 +94,7 @@ class Request:
                 return None, None, None
             first_line = lines[0]
             method, path_full, version = first_line.split()
-            if "?" in path_full:
-                path, query_string = path_full.split("?", 1)
-                self.query_params = urllib.parse.parse_qs(query_string)
-            else:
-                path = path_full
+            path, _, self.query_string = path_full.partition("?")
 
             if path == "/":
                 path = "/index.html"
@@ -94,7 +104,7 @@ class Request:
         return method, path, version
 
     def prepare_headers_and_body(self, request):
-        headers = {}
+        headers = CaseInsensitiveDict()
         body = None
         try:
             parts = request.split("\r\n\r\n", 1)
@@ -105,7 +115,7 @@ class Request:
             for line in lines[1:]:
                 if ": " in line:
                     key, val = line.split(": ", 1)
-                    headers[key.lower()] = val
+                    headers.add(key, val)
         except Exception as e:
             print(f"[Request] Error parsing headers/body: {e}")
 
@@ -114,11 +124,11 @@ class Request:
     def prepare_headers(self, request):
         """Prepares the given HTTP headers."""
         lines = request.split("\r\n")
-        headers = {}
+        headers = CaseInsensitiveDict()
         for line in lines[1:]:
             if ": " in line:
                 key, val = line.split(": ", 1)
-                headers[key.lower()] = val
+                headers.add(key, val)
         return headers
 
     def prepare(self, request, routes=None):
@@ -139,7 +149,7 @@ class Request:
         # TODO manage the webapp hook in this mounting point
         #
 
-        if not routes == {}:
+        if routes:
             self.routes = routes
             self.hook = routes.get((self.method, self.path))
             #
@@ -148,21 +158,35 @@ class Request:
             #
 
         self.headers, self.body = self.prepare_headers_and_body(request)
-        cookies = self.headers.get("cookie", "")
-        #
-        #  TODO: implement the cookie function here
-        #        by parsing the header            #
-        if cookies:
-            try:
-                for cookie_pair in cookies.split(";"):
-                    cookie_pair = cookie_pair.strip()
-                    if "=" in cookie_pair:
-                        key, value = cookie_pair.split("=", 1)
-                        self.cookies[key.strip()] = value.strip()
-            except Exception as e:
-                print(f"[Request] Error parsing cookies: {e}")
         return
 
+    @property
+    def cookies(self):
+        """
+        Cookies of the Cookie header, parsed on first access.
+
+        :rtype CaseInsensitiveDict: cookie name -> value.
+        """
+        if not self._cookies_parsed:
+            self._cookies_parsed = True
+            cookies = self.headers.get("cookie", "") if self.headers else ""
+            for cookie_pair in cookies.split(";"):
+                key, sep, value = cookie_pair.partition("=")
+                if sep:
+                    self._cookies[key.strip()] = value.strip()
+        return self._cookies
+
+    @property
+    def query_params(self):
+        """
+        Query string parsed with ``urllib.parse.parse_qs`` on first access.
+
+        :rtype dict: name -> list of values.
+        """
+        if self._query_params is None:
+            self._query_params = urllib.parse.parse_qs(self.query_string)
+        return self._query_params
+
     def prepare_body(self, data, files, json=None):
         # self.prepare_content_length(self.body)
         # self.body = body
@@ -22,13 +22,101 @@ The current version supports MIME type detection, content loading and header for
 """
 
 import json
-import datetime
 import os
-import mimetypes
+import time
+import email.utils
+from functools import lru_cache
 from .dictionary import CaseInsensitiveDict
+from .manifest import IMMUTABLE_CACHE_CONTROL, MANIFEST_PATH
+from .mime import DEFAULT_MIME_TABLE, STATIC_MAX_AGE
 
 BASE_DIR = ""
 
+#: Comment line sent on idle event streams so proxies keep them open.
+SSE_KEEPALIVE = b": keep-alive\n\n"
+
+#: Reason phrases that always replace whatever reason was set.
+FIXED_REASONS = {
+    302: "Found",
+    304: "Not Modified",
+    401: "Unauthorized",
+    404: "Not Found",
+}
+
+#: Prebuilt header lines that never change between responses.
+CONNECTION_CLOSE = b"Connection: close\r\n"
+PRAGMA_NO_CACHE = b"Pragma: no-cache\r\n"
+CORS_TEMPLATE = (
+    b"Access-Control-Allow-Credentials: true\r\n"
+    b"Access-Control-Allow-Methods: GET, POST, OPTIONS\r\n"
+    b"Access-Control-Allow-Headers: Content-Type\r\n"
+)
+
+NOT_FOUND = [
+    b"HTTP/1.1 404 Not Found\r\n"
+    b"Accept-Ranges: bytes\r\n"
+    b"Content-Type: text/html\r\n"
+    b"Content-Length: 13\r\n"
+    b"Cache-Control: max-age=86000\r\n"
+    b"Connection: close\r\n"
+    b"\r\n"
+    b"404 Not Found"
+]
+
+_status_lines = {}
+_date_cache = (0, b"")
+
+
+def status_line(code, reason):
+    """Returns the encoded status line, built once per (code, reason)."""
+    line = _status_lines.get((code, reason))
+    if line is None:
+        line = _status_lines[(code, reason)] = "HTTP/1.1 {} {}\r\n".format(
+            code, reason
+        ).encode("utf-8")
+    return line
+
+
+def date_header():
+    """Returns the encoded Date header line, formatted at most once a second."""
+    global _date_cache
+    now = int(time.time())
+    if _date_cache[0] != now:
+        _date_cache = (
+            now,
+            b"Date: " + email.utils.formatdate(now, usegmt=True).encode() + b"\r\n",
+        )
+    return _date_cache[1]
+
+
+def safe_join(base_dir, path):
+    """
+    Joins a request path onto ``base_dir``, refusing paths that resolve
+    outside of it (``..`` segments, symlinks).
+
+    :params base_dir (str): directory files are served from.
+    :params path (str): request path, e.g. ``"/css/styles.css"``.
+
+    :rtype str: the file path, or None if it escapes ``base_dir``.
+    """
+    root = os.path.realpath(base_dir)
+    filepath = os.path.join(base_dir, path.lstrip("/"))
+    if os.path.commonpath((root, os.path.realpath(filepath))) != root:
+        return None
+    return filepath
+
+
+#: Per-client values that must not be kept in the header line cache.
+UNCACHED_HEADERS = ("Set-Cookie", "set-cookie")
+
+
+def encode_header_line(name, value):
+    return "{}: {}\r\n".format(name, value).encode("utf-8")
+
+
+#: Encodes one header line; repeated (name, value) pairs hit the cache.
+header_line = lru_cache(maxsize=512)(encode_header_line)
+
 
 class Response:
     """The :class:`Response <Response>` object, which contains a
@@ -43,13 +131,11 @@ class Response:
     It is used to construct and serve HTTP responses in a custom web server.
 
     :attrs status_code (int): HTTP status code (e.g., 200, 404).
-    :attrs headers (dict): dictionary of response headers.
+    :attrs headers (CaseInsensitiveDict): multimap of response headers.
     :attrs url (str): url of the response.
     :attrsencoding (str): encoding used for decoding response content.
-    :attrs history (list): list of previous Response objects (for redirects).
     :attrs reason (str): textual reason for the status code (e.g., "OK", "Not Found").
     :attrs cookies (CaseInsensitiveDict): response cookies.
-    :attrs elapsed (datetime.timedelta): time taken to complete the request.
     :attrs request (PreparedRequest): the original request object.
 
     Usage::
@@ -61,22 +147,21 @@ class Response:
       <Response>
     """
 
-    __attrs__ = [
+    __slots__ = (
         "_content",
         "_header",
         "status_code",
-        "method",
         "headers",
         "url",
-        "history",
         "encoding",
         "reason",
         "cookies",
-        "elapsed",
         "request",
-        "body",
-        "reason",
-    ]
+        "streaming",
+        "cors_origin",
+        "static",
+        "mime_table",
+    )
 
     def __init__(self, request=None):
         """
@@ -85,45 +170,59 @@ class Response:
         : params request : The originating request object.
         """
 
-        # self._content = False
+        #: Case-insensitive Dictionary of Response Headers.
+        #: For example, ``headers['content-type']`` will return the
+        #: value of a ``'Content-Type'`` response header.
+        self.headers = CaseInsensitiveDict()
+
+        #: A of Cookies the response headers.
+        self.cookies = CaseInsensitiveDict()
+
+        self.reset()
+        self.request = request
+
+    def reset(self):
+        """
+        Restores the initial state so the object can serve another request.
+        The header and cookie containers are cleared and kept.
+        """
+
         self._content = b""
-        self._content_consumed = False
-        self._next = None
+        self._header = b""
 
         #: Integer Code of responded HTTP Status, e.g. 404 or 200.
-        # self.status_code = None
         self.status_code = 200
 
-        #: Case-insensitive Dictionary of Response Headers.
-        #: For example, ``headers['content-type']`` will return the
-        #: value of a ``'Content-Type'`` response header.
-        self.headers = {}
+        self.headers.clear()
 
         #: URL location of Response.
         self.url = None
 
         #: Encoding to decode with when accessing response text.
-        # self.encoding = None
         self.encoding = "utf-8"
 
-        #: A list of :class:`Response <Response>` objects from
-        #: the history of the Request.
-        self.history = []
-
         #: Textual reason of responded HTTP Status, e.g. "Not Found" or "OK".
-        # self.reason = None
         self.reason = "OK"
 
-        #: A of Cookies the response headers.
-        self.cookies = CaseInsensitiveDict()
-
-        #: The amount of time elapsed between sending the request
-        self.elapsed = datetime.timedelta(0)
+        self.cookies.clear()
 
         #: The :class:`PreparedRequest <PreparedRequest>` object to which this
         #: is a response.
         self.request = None
 
+        #: True while the body is an open-ended event stream.
+        self.streaming = False
+
+        #: Origin echoed in CORS headers, or None for no CORS headers.
+        self.cors_origin = None
+
+        #: Shared :class:`StaticFiles <StaticFiles>` store static files are
+        #: served from, or None to read them from disk per request.
+        self.static = None
+
+        #: :class:`MimeTable <MimeTable>` resolving static file paths.
+        self.mime_table = DEFAULT_MIME_TABLE
+
     def get_mime_type(self, path):
         """
         Determines the MIME type of a file based on its path.
@@ -133,11 +232,8 @@ class Response:
         :rtype str: MIME type string (e.g., 'text/html', 'image/png').
         """
 
-        try:
-            mime_type, _ = mimetypes.guess_type(path)
-        except Exception:
-            return "application/octet-stream"
-        return mime_type or "application/octet-stream"
+        mime = self.mime_table.lookup(path)
+        return mime.content_type if mime else "application/octet-stream"
 
     def prepare_content_type(self, mime_type="text/html"):
         """
@@ -147,61 +243,14 @@ class Response:
         :params mime_type (str): MIME type of the requested resource.
 
         :rtype str: Base directory path for locating the resource.
-
-        :raises ValueError: If the MIME type is unsupported.
         """
 
-        base_dir = ""
-
-        # Processing mime_type based on main_type and sub_type
-        main_type, sub_type = mime_type.split("/", 1)
-        print(
-            "[Response] processing MIME main_type={} sub_type={}".format(
-                main_type, sub_type
-            )
-        )
-        if main_type == "text":
-            self.headers["Content-Type"] = "text/{}".format(sub_type)
-            if sub_type == "plain" or sub_type == "css":
-                base_dir = BASE_DIR + "static/"
-            elif sub_type == "html":
-                base_dir = BASE_DIR + "www/"
-            else:
-                # TODO: handle_text_other(sub_type)
-                base_dir = BASE_DIR + "static/"
-        elif main_type == "image":
-            base_dir = BASE_DIR + "static/"
-            self.headers["Content-Type"] = "image/{}".format(sub_type)
-        elif main_type == "application":
-            base_dir = BASE_DIR + "apps/"
-            self.headers["Content-Type"] = "application/{}".format(sub_type)
-        #
-        #  TODO: process other mime_type
-        #        application/xml
-        #        application/zip
-        #        ...
-        #        text/csv
-        #        text/xml
-        #        ...
-        #        video/mp4
-        #        video/mpeg
-        #        ...
-        #
-        elif main_type == "video":
-            base_dir = BASE_DIR + "static/"
-            self.headers["Content-Type"] = "video/{}".format(sub_type)
-        elif mime_type == "image/x-icon":
-            base_dir = BASE_DIR + "static/"
-            self.headers["Content-Type"] = "image/x-icon"
-        else:
-            # raise ValueError(
-            #     "Invalid MEME type: main_type={} sub_type={}".format(
-            #         main_type, sub_type
-            #     )
-            # )
-            self.headers["Content-Type"] = "application/octet-stream"
-            base_dir = BASE_DIR + "static/"
-        return base_dir
+        self.headers["Content-Type"] = mime_type
+        if mime_type == "text/html":
+            return BASE_DIR + "www/"
+        if mime_type.startswith("application/"):
+            return BASE_DIR + "apps/"
+        return BASE_DIR + "static/"
 
     def build_content(self, path, base_dir):
         """
@@ -210,12 +259,22 @@ class Response:
         :params path (str): relative path to the file.
         :params base_dir (str): base directory where the file is located.
 
-        :rtype tuple: (int, bytes) representing content length and content data.
+        :rtype tuple: (int, bytes) representing content length and content data;
+            the data is a memoryview when served from a mapped store.
         """
 
-        filepath = os.path.join(base_dir, path.lstrip("/"))
+        filepath = safe_join(base_dir, path)
+        if filepath is None:
+            print("[Response] refusing {} outside of {}".format(path, base_dir))
+            return 0, b""
 
         print("[Response] serving the object at location {}".format(filepath))
+        if self.static is not None:
+            entry = self.static.get(filepath)
+            if entry is None:
+                print("[Response] file not found at location {}".format(filepath))
+                return 0, b""
+            return entry.size, entry.content
         #
         #  TODO: implement the step of fetch the object file
         #        store in the return value of content
@@ -231,14 +290,33 @@ class Response:
             print("[Response] Error reading file {}: {}".format(filepath, e))
             return 0, b""
 
+    def get_etag(self, path, base_dir):
+        """
+        Computes a validator for a static file from its size and mtime.
+
+        :params path (str): relative path to the file.
+        :params base_dir (str): base directory where the file is located.
+
+        :rtype str: quoted ETag, or None if the file cannot be stat'ed.
+        """
+
+        filepath = safe_join(base_dir, path)
+        if filepath is None:
+            return None
+        if self.static is not None:
+            entry = self.static.get(filepath)
+            return entry.etag if entry is not None else None
+        try:
+            st = os.stat(filepath)
+        except OSError:
+            return None
+        return '"{:x}-{:x}"'.format(st.st_size, int(st.st_mtime))
+
     def set_cookie(self, key, value, options=""):
         cookie_val = f"{key}={value}"
         if options:
             cookie_val += f"; {options}"
-        if "Set-Cookie" not in self.headers:
-            self.headers["Set-Cookie"] = []
-        self.headers["Set-Cookie"].append(cookie_val)
-        # self.headers["Set-Cookie"] = cookie_val
+        self.headers.add("Set-Cookie", cookie_val)
 
     # Trong file daemon/response.py
 
@@ -247,58 +325,91 @@ class Response:
         Constructs the HTTP response headers based on the class:`Request <Request>
         and internal attributes.
         """
-        reqhdr = request.headers
-
-        # Set default status if not provided
-        if self.status_code == 200 and self.reason == "OK":
-            pass  # Use default
-        elif self.status_code == 404:
-            self.reason = "Not Found"
-        elif self.status_code == 401:
-            self.reason = "Unauthorized"
-        elif self.status_code == 302:
-            self.reason = "Found"
-
-        self.headers["Content-Length"] = "{}".format(len(self._content))
-        self.headers["Date"] = "{}".format(
-            datetime.datetime.utcnow().strftime("%a, %d %b %Y %H:%M:%S GMT")
-        )
+        if self.status_code in FIXED_REASONS:
+            self.reason = FIXED_REASONS[self.status_code]
+
+        parts = [status_line(self.status_code, self.reason)]
+        if self.cors_origin:
+            parts.append(header_line("Access-Control-Allow-Origin", self.cors_origin))
+            parts.append(CORS_TEMPLATE)
+
+        cache_control = self.headers.setdefault("Cache-Control", "no-cache")
+        for key, value in self.headers.multi_items():
+            if key in UNCACHED_HEADERS:
+                parts.append(encode_header_line(key, value))
+            else:
+                parts.append(header_line(key, value))
+        if "no-cache" in cache_control and "Pragma" not in self.headers:
+            parts.append(PRAGMA_NO_CACHE)
+
+        if not self.streaming:
+            parts.append(b"Content-Length: %d\r\n" % len(self._content))
+        parts.append(date_header())
+        parts.append(CONNECTION_CLOSE)
+        parts.append(b"\r\n")
+        return b"".join(parts)
+
+    def build_stream_header(self, request, content_type="text/event-stream"):
+        """
+        Constructs the header of a streamed response, which has no
+        Content-Length and ends when the connection is closed.
+
+        :params request (class:`Request <Request>`): incoming request object.
+        :params content_type (str): media type of the stream.
+
+        :rtype bytes: encoded status line and headers.
+        """
+        self.streaming = True
+        self.headers["Content-Type"] = content_type
         self.headers["Cache-Control"] = "no-cache"
-        self.headers["Pragma"] = "no-cache"
-        self.headers["Connection"] = "close"
+        # Ask buffering proxies to pass events through as they are written.
+        self.headers["X-Accel-Buffering"] = "no"
+        self._header = self.build_response_header(request)
+        return self._header
 
-        # Bắt đầu xây dựng chuỗi header
-        fmt_header = "HTTP/1.1 {} {}\r\n".format(self.status_code, self.reason)
+    @staticmethod
+    def format_event(data, event=None, event_id=None):
+        """
+        Encodes one Server-Sent Events message.
 
-        # Lặp qua TẤT CẢ các header trong self.headers
-        for key, value in self.headers.items():
-            if key == "Set-Cookie" and isinstance(value, list):
-                for cookie_string in value:
-                    fmt_header += "Set-Cookie: {}\r\n".format(cookie_string)
-            else:
-                fmt_header += "{}: {}\r\n".format(key, value)
-        # Thêm dòng trống cuối cùng
-        fmt_header += "\r\n"
+        :params data: event payload; anything but ``str`` is sent as JSON.
+        :params event (str): optional event name.
+        :params event_id (str): optional id, echoed back by the client in
+            ``Last-Event-ID`` when it reconnects.
 
-        return str(fmt_header).encode("utf-8")
+        :rtype bytes: the encoded event, or a keep-alive comment for None.
+        """
+        if data is None:
+            return SSE_KEEPALIVE
+        if not isinstance(data, str):
+            data = json.dumps(data)
+        lines = []
+        if event_id is not None:
+            lines.append("id: {}".format(event_id))
+        if event:
+            lines.append("event: {}".format(event))
+        lines.extend("data: {}".format(line) for line in data.split("\n"))
+        return ("\n".join(lines) + "\n\n").encode("utf-8")
+
+    def build_buffers(self):
+        """
+        Returns the response as a buffer list for vectored writes: the
+        header followed by the body, which is never copied to join them.
+
+        :rtype list: bytes-like buffers in wire order.
+        """
+        if self._content:
+            return [self._header, self._content]
+        return [self._header]
 
     def build_notfound(self):
         """
         Constructs a standard 404 Not Found HTTP response.
 
-        :rtype bytes: Encoded 404 response.
+        :rtype list: Encoded 404 response as a single buffer.
         """
 
-        return (
-            "HTTP/1.1 404 Not Found\r\n"
-            "Accept-Ranges: bytes\r\n"
-            "Content-Type: text/html\r\n"
-            "Content-Length: 13\r\n"
-            "Cache-Control: max-age=86000\r\n"
-            "Connection: close\r\n"
-            "\r\n"
-            "404 Not Found"
-        ).encode("utf-8")
+        return NOT_FOUND
 
     def build_unauthorized(self, request, login_page="/login"):
         self.status_code = 401
@@ -310,7 +421,7 @@ class Response:
         print(self.headers, "Header")
 
         self._header = self.build_response_header(request)
-        return self._header + self._content
+        return self.build_buffers()
 
     def build_json_response(self, request, data_dict):
         try:
@@ -327,7 +438,7 @@ class Response:
             self.headers["Content-Type"] = "application/json"
 
         self._header = self.build_response_header(request)
-        return self._header + self._content
+        return self.build_buffers()
 
     def build_response(self, request):
         """
@@ -335,38 +446,72 @@ class Response:
 
         :params request (class:`Request <Request>`): incoming request object.
 
-        :rtype bytes: complete HTTP response using prepared headers and content.
+        :rtype list: complete HTTP response as header and body buffers.
         """
 
         path = request.path
 
-        mime_type = self.get_mime_type(path)
+        manifest = self.static.manifest if self.static is not None else None
+        if manifest is not None and path == MANIFEST_PATH:
+            self.headers["Cache-Control"] = "no-cache"
+            return self.build_json_response(request, manifest.to_dict())
+
+        mime = self.mime_table.lookup(path)
+        if mime is None:
+            print("[Response] {} path {} has no MIME type".format(request.method, path))
+            return self.build_notfound()
         print(
             "[Response] {} path {} mime_type {}".format(
-                request.method, request.path, mime_type
+                request.method, path, mime.content_type
             )
         )
 
-        base_dir = ""
-
-        # If HTML, parse and serve embedded objects
-        if path.endswith(".html") or mime_type == "text/html":
-            base_dir = self.prepare_content_type(mime_type="text/html")
-        elif mime_type == "text/css":
-            base_dir = self.prepare_content_type(mime_type="text/css")
-        #
-        # TODO: add support objects
-        #
-        elif mime_type in ["image", "video", "application"]:
-            base_dir = self.prepare_content_type(mime_type=mime_type)
-        elif path.endswith("favicon.ico"):
-            base_dir = self.prepare_content_type(mime_type="image/x-icon")
-        else:
+        # "/static/css/a.css" and "/css/a.css" both map to static/css/a.css.
+        if path.startswith(mime.base_dir, 1):
+            path = path[len(mime.base_dir) :]
+        base_dir = BASE_DIR + mime.base_dir
+        if safe_join(base_dir, path) is None:
+            print(
+                "[Response] {} path {} escapes {}".format(
+                    request.method, path, base_dir
+                )
+            )
             return self.build_notfound()
-
-        c_len, self._content = self.build_content(path, base_dir)
+        self.headers["Content-Type"] = mime.content_type
+
+        asset, hashed = None, False
+        if manifest is not None:
+            asset, hashed = manifest.resolve(path)
+            if hashed:
+                path = asset.url
+
+        etag = self.get_etag(path, base_dir)
+        gzipped = None
+        if asset is not None and etag == asset.etag:
+            # Unchanged since the scan: the hashed URL and the
+            # precompressed body still describe this file.
+            if hashed:
+                self.headers.setdefault("Cache-Control", IMMUTABLE_CACHE_CONTROL)
+            if asset.gzip is not None:
+                self.headers["Vary"] = "Accept-Encoding"
+                if "gzip" in request.headers.get("accept-encoding", ""):
+                    self.headers["Content-Encoding"] = "gzip"
+                    gzipped, etag = asset.gzip, asset.gzip_etag
+        if etag:
+            self.headers["ETag"] = etag
+            self.headers.setdefault("Cache-Control", mime.cache_control)
+            if request.headers.get("if-none-match") == etag:
+                self.status_code = 304
+                self._content = b""
+                self._header = self.build_response_header(request)
+                return self.build_buffers()
+
+        if gzipped is not None:
+            c_len, self._content = len(gzipped), gzipped
+        else:
+            c_len, self._content = self.build_content(path, base_dir)
         if c_len == 0:
             return self.build_notfound()
         self._header = self.build_response_header(request)
 
-        return self._header + self._content
+        return self.build_buffers()
@@ -0,0 +1,140 @@
+#
+# Copyright (C) 2025 pdnguyen of HCMC University of Technology VNU-HCM.
+# All rights reserved.
+# This file is part of the CO3093/CO3094 course.
+#
+# WeApRous release
+#
+# The authors hereby grant to Licensee personal permission to use
+# and modify the Licensed Source Code for the sole purpose of studying
+# while attending the course
+#
+
+"""
+daemon.static
+~~~~~~~~~~~~~~~~~
+
+This module provides a :class:`StaticFiles <StaticFiles>` store that serves
+static file contents from shared, read-only memory maps.
+
+Each file is mapped once and the mapping is shared by every connection
+thread. Responses send a memoryview of the mapping, so concurrent downloads
+of the same file allocate no per-request copies and the pages are backed by
+the OS page cache. A mapping is replaced when the file's size or mtime
+changes.
+
+Usage Example:
+--------------
+>>> store = StaticFiles()
+>>> create_backend("127.0.0.1", 9000, routes={}, static=store)
+"""
+
+import mmap
+import os
+import threading
+
+
+class StaticEntry:
+    """
+    Contents and validators of one static file.
+
+    :attrs path (str): file path.
+    :attrs size (int): file size in bytes.
+    :attrs mtime_ns (int): modification time the contents were read at.
+    :attrs etag (str): quoted validator derived from size and mtime.
+    :attrs content (memoryview or bytes): the file contents.
+    """
+
+    __slots__ = ("path", "size", "mtime_ns", "etag", "content")
+
+    def __init__(self, path, st, content):
+        self.path = path
+        self.size = st.st_size
+        self.mtime_ns = st.st_mtime_ns
+        self.etag = '"{:x}-{:x}"'.format(st.st_size, int(st.st_mtime))
+        self.content = content
+
+    def matches(self, st):
+        return self.size == st.st_size and self.mtime_ns == st.st_mtime_ns
+
+
+class StaticFiles:
+    """
+    Thread-safe store of static file contents keyed by file path.
+
+    Files are memory-mapped on first use. A superseded mapping is not
+    closed explicitly: responses still sending from it keep it alive, and
+    it is unmapped once the last memoryview is released.
+
+    Files should be updated by writing a new file and renaming it over the
+    old one. Truncating a file in place while it is mapped makes readers of
+    the old mapping fault.
+
+    :attrs use_mmap (bool): map files instead of reading them into bytes.
+    :attrs manifest (AssetManifest): assets scanned at startup, or None.
+    """
+
+    def __init__(self, use_mmap=True):
+        """
+        Initializes an empty store.
+
+        :params use_mmap (bool): memory-map files (default) or read them.
+        """
+        self.use_mmap = use_mmap
+        self.manifest = None
+        self._entries = {}
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def _load(self, path, st):
+        if not st.st_size:
+            # Empty files cannot be mapped.
+            return StaticEntry(path, st, b"")
+        with open(path, "rb") as f:
+            if not self.use_mmap:
+                return StaticEntry(path, st, f.read())
+            mapping = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        return StaticEntry(path, st, memoryview(mapping))
+
+    def get(self, path):
+        """
+        Returns the current entry for ``path``, (re)loading it when the file
+        changed since it was last loaded.
+
+        :params path (str): file path.
+
+        :rtype StaticEntry: the entry, or None if the file cannot be read.
+        """
+        try:
+            st = os.stat(path)
+        except OSError:
+            self.discard(path)
+            return None
+
+        entry = self._entries.get(path)
+        if entry is not None and entry.matches(st):
+            return entry
+
+        with self._lock:
+            entry = self._entries.get(path)
+            if entry is not None and entry.matches(st):
+                return entry
+            try:
+                entry = self._load(path, st)
+            except (OSError, ValueError) as e:
+                print("[StaticFiles] cannot load {}: {}".format(path, e))
+                self._entries.pop(path, None)
+                return None
+            self._entries[path] = entry
+            return entry
+
+    def discard(self, path):
+        """
+        Drops the entry for ``path``, if any.
+
+        :params path (str): file path.
+        """
+        with self._lock:
+            self._entries.pop(path, None)
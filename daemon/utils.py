@@ -12,15 +12,20 @@
 
 # from urlparse import urlparse
 
+import threading
+
+#: Upper bound on buffers handed to one sendmsg call (POSIX IOV_MAX is 1024).
+MAX_IOV = 1024
+
 
 def extract_cookies(headers):
     cookies = {}
-    print(type(headers))
     for header, value in headers.items():
-        if header == "cookie":
+        if header.lower() == "cookie":
             for pair in value.split(";"):
-                key, value = pair.strip().split("=")
-                cookies[key] = value
+                key, sep, value = pair.partition("=")
+                if sep:
+                    cookies[key.strip()] = value.strip()
     return cookies
 
 
@@ -38,3 +43,69 @@ def extract_cookies(headers):
 #         auth = ("", "")
 #
 #     return auth
+
+
+class ObjectPool:
+    """
+    Bounded free list of reusable objects.
+
+    :meth:`acquire` hands out a pooled object or a new one from ``factory``.
+    :meth:`release` calls the object's ``reset()`` and keeps it, unless
+    ``size`` objects are already pooled.
+    """
+
+    __slots__ = ("factory", "size", "_free", "_lock")
+
+    def __init__(self, factory, size=64):
+        self.factory = factory
+        self.size = size
+        self._free = []
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        with self._lock:
+            if self._free:
+                return self._free.pop()
+        return self.factory()
+
+    def release(self, obj):
+        obj.reset()
+        with self._lock:
+            if len(self._free) < self.size:
+                self._free.append(obj)
+
+
+def advance_buffers(views, sent):
+    """
+    Drops the first ``sent`` bytes from a list of memoryviews.
+
+    :param views (list): memoryviews still to be written.
+    :param sent (int): bytes the last write accepted.
+    :rtype: list of the remaining memoryviews.
+    """
+    for i, view in enumerate(views):
+        if sent < len(view):
+            return [view[sent:]] + views[i + 1 :] if sent else views[i:]
+        sent -= len(view)
+    return []
+
+
+def send_buffers(conn, buffers):
+    """
+    Writes a list of buffers to a blocking socket with vectored I/O.
+
+    Uses ``socket.sendmsg`` so the buffers go out without first being
+    joined, resuming after partial writes. Sockets without ``sendmsg``
+    (e.g. on Windows) get one ``sendall`` per buffer instead.
+
+    :param conn (socket): the connected socket.
+    :param buffers (list): bytes-like objects in wire order.
+    """
+    sendmsg = getattr(conn, "sendmsg", None)
+    if sendmsg is None:
+        for buf in buffers:
+            conn.sendall(buf)
+        return
+    views = [memoryview(buf) for buf in buffers if len(buf)]
+    while views:
+        views = advance_buffers(views, sendmsg(views[:MAX_IOV]))
@@ -17,7 +17,12 @@ deamon.weaproute
 This module provides a WeApRous object to deploy RESTful url web app with routing
 """
 
+import functools
+import inspect
+
 from .backend import create_backend
+from .eventloop import run_blocking
+from .middleware import Pipeline, RouteTable
 
 
 class WeApRous:
@@ -41,6 +46,11 @@ class WeApRous:
       >>> def hello(headers, body):
       >>>     return {'message': 'Hello, world!'}
 
+      >>> @app.route('/slow', methods=['GET'])
+      >>> async def slow(headers, body):
+      >>>     await asyncio.sleep(1)
+      >>>     return {'message': 'done'}
+
       >>> app.run()
     """
 
@@ -51,8 +61,18 @@ class WeApRous:
         Sets up an empty route registry and prepares placeholders for IP and port.
         """
         self.routes = {}
+        #: Middleware applied to every request, outermost first.
+        self.middleware = []
+        #: (method, path) -> middleware of that route only.
+        self.route_middleware = {}
         self.ip = None
         self.port = None
+        #: Optional :class:`StaticFiles <StaticFiles>` store for static files.
+        self.static = None
+        #: Optional :class:`MimeTable <MimeTable>` for this app's static files.
+        self.mime_table = None
+        #: Build the asset manifest and warm the static store at startup.
+        self.prewarm = False
         return
 
     def prepare_address(self, ip, port):
@@ -65,19 +85,46 @@ class WeApRous:
         self.ip = ip
         self.port = port
 
-    def route(self, path, methods=["GET"]):
+    def use(self, middleware):
+        """
+        Adds a middleware that runs for every request, routed or static,
+        after the ones added before it. Usable as a decorator.
+
+        :param middleware (function): ``async def (request, response, call_next)``.
+
+        :rtype: function - the middleware.
+        """
+        self.middleware.append(middleware)
+        return middleware
+
+    def route(self, path, methods=["GET"], offload=True, middleware=()):
         """
         Decorator to register a route handler for a specific path and HTTP methods.
 
+        ``async def`` handlers and async generators run on the shared event
+        loop. Plain functions are run on the shared handler pool when
+        ``offload`` is set, so a handler blocked on I/O occupies a pool worker
+        rather than a connection thread. Pass ``offload=False`` for trivial
+        handlers that are cheaper to call inline.
+
         :param path (str): The URL path to route.
         :param methods (list): A list of HTTP methods (e.g., ['GET', 'POST']) to bind.
+        :param offload (bool): run a sync handler on the handler pool.
+        :param middleware (list): middleware for this route only, run after
+            the app-wide ones.
 
         :rtype: function - A decorator that registers the handler function.
         """
 
         def decorator(func):
+            hook = func
+            if offload and not (
+                inspect.iscoroutinefunction(func) or inspect.isasyncgenfunction(func)
+            ):
+                hook = self.offload(func)
             for method in methods:
-                self.routes[(method.upper(), path)] = func
+                self.routes[(method.upper(), path)] = hook
+                self.route_middleware[(method.upper(), path)] = list(middleware)
 
             # Optional attach route metadata to the function
             func._route_path = path
@@ -87,6 +134,38 @@ class WeApRous:
 
         return decorator
 
+    @staticmethod
+    def offload(func):
+        """
+        Wraps a blocking handler into a coroutine function that runs it on
+        the shared handler pool.
+
+        :param func (function): the sync handler.
+
+        :rtype: function - the ``async def`` wrapper.
+        """
+
+        @functools.wraps(func)
+        async def hook(headers, body, **kwargs):
+            return await run_blocking(func, headers=headers, body=body, **kwargs)
+
+        return hook
+
+    def compile(self):
+        """
+        Links every route's middleware and handler into one
+        :class:`Pipeline <Pipeline>`, plus a fallback for static files.
+
+        :rtype: RouteTable - the compiled routes.
+        """
+        return RouteTable(
+            (
+                (key, Pipeline(hook, self.middleware + self.route_middleware[key]))
+                for key, hook in self.routes.items()
+            ),
+            fallback=Pipeline(None, self.middleware),
+        )
+
     def run(self):
         """
         Start the backend server and begin handling requests.
@@ -103,4 +182,11 @@ class WeApRous:
             )
             return
 
-        create_backend(self.ip, self.port, self.routes)
+        create_backend(
+            self.ip,
+            self.port,
+            self.compile(),
+            self.static,
+            self.mime_table,
+            self.prewarm,
+        )
@@ -1,11 +1,28 @@
 import os
 import json
 import time
+import threading
+from functools import wraps
 
 DIR_PATH = os.path.dirname(os.path.abspath(__file__))
 JSON_PATH = os.path.join(DIR_PATH, "data.json")
 
+# Every access to data.json is a read/modify/write of the whole file, so
+# all of them run under one lock. Reentrant because some helpers call
+# others (register_channel -> quit_channel).
+_lock = threading.RLock()
 
+
+def _locked(func):
+    @wraps(func)
+    def wrapper(*args, **kwargs):
+        with _lock:
+            return func(*args, **kwargs)
+
+    return wrapper
+
+
+@_locked
 def read_json():
     try:
         with open(JSON_PATH, "r") as file:
@@ -15,6 +32,7 @@ def read_json():
         return {}
 
 
+@_locked
 def write_json(data):
     try:
         with open(JSON_PATH, "w") as file:
@@ -24,12 +42,14 @@ def write_json(data):
 
 
 # USER:
+@_locked
 def get_user_database(username):
     data = read_json()
     return data.get("users", {}).get(username)
 
 
 # Session:
+@_locked
 def create_session(session_id, username):
     data = read_json()
     if "session_store" not in data:
@@ -38,6 +58,7 @@ def create_session(session_id, username):
     write_json(data)
 
 
+@_locked
 def get_username_by_session(session_id):
     if not session_id:
         return None
@@ -46,6 +67,7 @@ def get_username_by_session(session_id):
 
 
 # Peer:
+@_locked
 def register_peer(username, ip, port):
     data = read_json()
     if "active_peer" not in data:
@@ -58,20 +80,34 @@ def register_peer(username, ip, port):
     write_json(data)
 
 
+@_locked
 def get_peers():
     data = read_json()
     return data.get("active_peer", {})
 
 
+@_locked
 def update_heartbeat(username):
     data = read_json()
     data["active_peer"][username]["last_seen"] = int(time.time())
     write_json(data)
 
 
+@_locked
+def update_heartbeats(last_seen):
+    """Stores many peers' last_seen timestamps with a single write."""
+    data = read_json()
+    peers = data.get("active_peer", {})
+    for username, seen in last_seen.items():
+        if username in peers:
+            peers[username]["last_seen"] = seen
+    write_json(data)
+
+
 # Channel
 
 
+@_locked
 def register_channel(username, channel_name):
     data = read_json()
     quit_channel(username)
@@ -82,16 +118,19 @@ def register_channel(username, channel_name):
     write_json(data)
 
 
+@_locked
 def get_channels():
     data = read_json()
     return data.get("channels", {})
 
 
+@_locked
 def get_channel(channel):
     data = read_json()
     return data.get("channels", {}).get(channel, {})
 
 
+@_locked
 def quit_channel(username):
     data = read_json()
     channels = data.get("channels")
@@ -101,6 +140,7 @@ def quit_channel(username):
     write_json(data)
 
 
+@_locked
 def join_channel(username, channel_name):
     data = read_json()
     if {"username": username} not in data["channels"][channel_name]:
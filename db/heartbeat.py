@@ -0,0 +1,95 @@
+import threading
+import time
+
+BASE_INTERVAL = 5
+MAX_INTERVAL = 60
+# Aggregate heartbeats per second the tracker aims to stay under.
+TARGET_RATE = 50
+FLUSH_INTERVAL = 2
+# A peer is stale after missing this many of its heartbeats.
+MISSED_BEATS = 2
+
+
+class HeartbeatBuffer:
+    """Coalesces peer heartbeats in memory and persists them in bulk.
+
+    ``touch`` only updates a dict. A background thread hands everything
+    touched since the last flush to ``flush_fn`` every ``flush_interval``
+    seconds, so the store is rewritten once per flush instead of once per
+    heartbeat.
+
+    The interval handed to peers grows with the number of active peers, so
+    the aggregate heartbeat rate stays near ``target_rate`` however many
+    peers there are. Each peer is judged stale against the interval it was
+    last told, which keeps slow heartbeaters from being pruned early.
+    """
+
+    def __init__(
+        self,
+        flush_fn,
+        flush_interval=FLUSH_INTERVAL,
+        base_interval=BASE_INTERVAL,
+        max_interval=MAX_INTERVAL,
+        target_rate=TARGET_RATE,
+    ):
+        self.flush_fn = flush_fn
+        self.flush_interval = flush_interval
+        self.base_interval = base_interval
+        self.max_interval = max_interval
+        self.target_rate = target_rate
+
+        self._last_seen = {}
+        self._dirty = {}
+        self._intervals = {}
+        self._active = 0
+        self._lock = threading.Lock()
+        self._stop_event = threading.Event()
+
+    def interval(self):
+        """Returns the heartbeat interval for the current load, in seconds."""
+        load = self._active / self.target_rate
+        return int(min(self.max_interval, max(self.base_interval, load)))
+
+    def set_active_count(self, count):
+        self._active = count
+
+    def touch(self, username, now=None):
+        """Records a heartbeat and returns the interval the peer should use."""
+        now = int(now or time.time())
+        interval = self.interval()
+        with self._lock:
+            self._last_seen[username] = now
+            self._dirty[username] = now
+            self._intervals[username] = interval
+        return interval
+
+    def last_seen(self, username, stored=0):
+        """Returns the newest of the buffered and the ``stored`` timestamp."""
+        return max(self._last_seen.get(username, 0), stored)
+
+    def is_alive(self, username, last_seen, now, min_timeout):
+        interval = self._intervals.get(username, self.base_interval)
+        return now - last_seen < max(min_timeout, MISSED_BEATS * interval)
+
+    def flush(self):
+        with self._lock:
+            dirty, self._dirty = self._dirty, {}
+        if dirty:
+            try:
+                self.flush_fn(dirty)
+            except Exception as e:
+                print(f"[Heartbeat] Flush of {len(dirty)} peer(s) failed: {e}")
+                with self._lock:
+                    for username, seen in dirty.items():
+                        self._dirty.setdefault(username, seen)
+
+    def _flush_loop(self):
+        while not self._stop_event.wait(self.flush_interval):
+            self.flush()
+        self.flush()
+
+    def start(self):
+        threading.Thread(target=self._flush_loop, daemon=True).start()
+
+    def stop(self):
+        self._stop_event.set()
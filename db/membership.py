@@ -0,0 +1,141 @@
+import asyncio
+import threading
+import uuid
+from collections import deque
+
+MAX_EVENTS = 4096
+
+
+class MembershipLog:
+    """Versioned view of which active peers are in each channel.
+
+    Every join or leave bumps a single monotonic revision and is kept in a
+    bounded event log. A client that remembers the revision it last saw
+    gets back only the changes to its channel since then. It falls back to
+    a full snapshot when those events were already trimmed, or when the
+    epoch differs because the tracker restarted.
+
+    Coroutines can :meth:`wait` for the next change to a channel. They are
+    woken from whichever thread records it, so a parked watcher costs a
+    future and no thread.
+    """
+
+    def __init__(self, max_events=MAX_EVENTS):
+        self.epoch = uuid.uuid4().hex[:12]
+        self.rev = 0
+        self._floor = 0
+        self._members = {}
+        self._events = deque()
+        self._channel_rev = {}
+        self._waiters = {}
+        self.max_events = max_events
+        self._lock = threading.Lock()
+
+    def _record(self, channel, username, info):
+        self.rev += 1
+        if len(self._events) >= self.max_events:
+            self._floor = self._events.popleft()[0]
+        self._events.append((self.rev, channel, username, info))
+        self._channel_rev[channel] = self.rev
+        for loop, future in self._waiters.pop(channel, ()):
+            loop.call_soon_threadsafe(_wake, future)
+
+    def seed(self, channels, peers):
+        """Loads the initial membership without recording events.
+
+        :param channels: channel name -> list of {"username": ...}.
+        :param peers: username -> peer record with "ip" and "port".
+        """
+        with self._lock:
+            for channel, users in channels.items():
+                members = self._members.setdefault(channel, {})
+                for user in users:
+                    peer = peers.get(user["username"])
+                    if peer:
+                        members[user["username"]] = {
+                            "ip": peer["ip"],
+                            "port": peer["port"],
+                        }
+
+    def join(self, channel, username, ip, port):
+        info = {"ip": ip, "port": port}
+        with self._lock:
+            members = self._members.setdefault(channel, {})
+            if members.get(username) == info:
+                return
+            members[username] = info
+            self._record(channel, username, info)
+
+    def leave_all(self, username):
+        with self._lock:
+            for channel, members in self._members.items():
+                if members.pop(username, None) is not None:
+                    self._record(channel, username, None)
+
+    def snapshot(self, channel):
+        with self._lock:
+            return self.rev, dict(self._members.get(channel, {}))
+
+    def changes(self, channel, since, epoch=None):
+        """Returns what changed in ``channel`` after revision ``since``.
+
+        :rtype dict: {"epoch", "rev", "full": True, "peers"} for a snapshot,
+            otherwise {"epoch", "rev", "full": False, "joined", "left"}.
+        """
+        with self._lock:
+            if epoch != self.epoch or not self._floor <= since <= self.rev:
+                return {
+                    "epoch": self.epoch,
+                    "rev": self.rev,
+                    "full": True,
+                    "peers": dict(self._members.get(channel, {})),
+                }
+
+            joined, left = {}, set()
+            # Walk back only over events newer than ``since``.
+            pending = []
+            for event in reversed(self._events):
+                if event[0] <= since:
+                    break
+                pending.append(event)
+            for _, event_channel, username, info in reversed(pending):
+                if event_channel != channel:
+                    continue
+                if info is None:
+                    joined.pop(username, None)
+                    left.add(username)
+                else:
+                    joined[username] = info
+                    left.discard(username)
+            return {
+                "epoch": self.epoch,
+                "rev": self.rev,
+                "full": False,
+                "joined": joined,
+                "left": sorted(left),
+            }
+
+    async def wait(self, channel, since, timeout):
+        """Waits until ``channel`` changes after revision ``since``.
+
+        :rtype bool: True on a change, False once ``timeout`` elapsed.
+        """
+        loop = asyncio.get_running_loop()
+        waiter = (loop, loop.create_future())
+        with self._lock:
+            if self._channel_rev.get(channel, 0) > since:
+                return True
+            self._waiters.setdefault(channel, set()).add(waiter)
+        try:
+            await asyncio.wait_for(waiter[1], timeout)
+            return True
+        except asyncio.TimeoutError:
+            return False
+        finally:
+            with self._lock:
+                self._waiters.get(channel, set()).discard(waiter)
+
+
+def _wake(future):
+    if not future.done():
+        future.set_result(None)
@@ -0,0 +1,152 @@
+import collections
+import queue
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+MAX_BATCH = 64
+MAX_DELAY = 0.01
+MAX_PENDING = 1024
+MAX_WORKERS = 32
+
+
+class PendingMessage:
+    __slots__ = ("message", "_done", "error")
+
+    def __init__(self, message):
+        self.message = message
+        self._done = threading.Event()
+        self.error = None
+
+    def finish(self, error=None):
+        self.error = error
+        self._done.set()
+
+    def wait(self, timeout=None):
+        """Blocks until the batch holding this message was flushed."""
+        if not self._done.wait(timeout):
+            raise TimeoutError("message still queued for delivery")
+        if self.error is not None:
+            raise self.error
+
+
+class PeerOutbox:
+    """Outbound queue of one peer. At most one batch per peer is in flight."""
+
+    __slots__ = ("ip", "port", "queue", "due", "busy")
+
+    def __init__(self, ip, port):
+        self.ip = ip
+        self.port = port
+        self.queue = collections.deque()
+        self.due = None
+        self.busy = False
+
+
+class OutboundBatcher:
+    """Coalesces messages queued for the same peer into one send.
+
+    A peer's queue is flushed once ``max_batch`` messages are waiting or
+    ``max_delay`` seconds after the first one arrived, whichever comes
+    first. Messages queued while the peer's previous batch is still being
+    sent join the next batch. Each queue holds at most ``max_pending``
+    messages, so a slow peer pushes back on its senders instead of growing
+    memory.
+
+    A single scheduler thread watches every queue and hands due batches to
+    a pool of ``max_workers`` flush threads, so the thread count does not
+    grow with the number of peers.
+    """
+
+    def __init__(
+        self,
+        flush,
+        max_batch=MAX_BATCH,
+        max_delay=MAX_DELAY,
+        max_pending=MAX_PENDING,
+        max_workers=MAX_WORKERS,
+    ):
+        self.flush = flush
+        self.max_batch = max_batch
+        self.max_delay = max_delay
+        self.max_pending = max_pending
+        self._outboxes = {}
+        self._lock = threading.Lock()
+        self._ready = threading.Condition(self._lock)
+        self._room = threading.Condition(self._lock)
+        self._stopped = False
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_workers, thread_name_prefix="p2p-flush"
+        )
+        self._scheduler = threading.Thread(target=self._schedule, daemon=True)
+        self._scheduler.start()
+
+    def enqueue(self, ip, port, message, timeout=None):
+        """Queues ``message`` for a peer and returns its :class:`PendingMessage`.
+
+        Blocks for up to ``timeout`` seconds while the peer's queue is full
+        and raises :class:`queue.Full` if it stays full.
+        """
+        pending = PendingMessage(message)
+        key = (ip, int(port))
+        with self._lock:
+            outbox = self._outboxes.get(key)
+            if outbox is None:
+                outbox = self._outboxes[key] = PeerOutbox(ip, int(port))
+            # A non-empty outbox is never dropped, so it stays registered
+            # while we wait for room.
+            if not self._room.wait_for(
+                lambda: len(outbox.queue) < self.max_pending, timeout
+            ):
+                raise queue.Full
+            outbox.queue.append(pending)
+            if outbox.due is None:
+                outbox.due = time.monotonic() + self.max_delay
+                self._ready.notify()
+            elif len(outbox.queue) >= self.max_batch:
+                self._ready.notify()
+        return pending
+
+    def _schedule(self):
+        with self._lock:
+            while not self._stopped:
+                now = time.monotonic()
+                wake = None
+                for key, outbox in list(self._outboxes.items()):
+                    if outbox.busy:
+                        continue
+                    if not outbox.queue:
+                        # Idle: forget it, enqueue recreates it on demand.
+                        del self._outboxes[key]
+                    elif len(outbox.queue) >= self.max_batch or outbox.due <= now:
+                        self._dispatch(outbox, now)
+                    elif wake is None or outbox.due < wake:
+                        wake = outbox.due
+                self._ready.wait(None if wake is None else wake - now)
+
+    def _dispatch(self, outbox, now):
+        size = min(len(outbox.queue), self.max_batch)
+        batch = [outbox.queue.popleft() for _ in range(size)]
+        # Leftovers have waited long enough; send them right after this batch.
+        outbox.due = now if outbox.queue else None
+        outbox.busy = True
+        self._room.notify_all()
+        self._executor.submit(self._send, outbox, batch)
+
+    def _send(self, outbox, batch):
+        try:
+            self.flush(outbox.ip, outbox.port, [p.message for p in batch])
+            error = None
+        except Exception as e:
+            error = e
+        for pending in batch:
+            pending.finish(error)
+        with self._lock:
+            outbox.busy = False
+            self._ready.notify()
+
+    def shutdown(self):
+        with self._lock:
+            self._stopped = True
+            self._ready.notify()
+        self._executor.shutdown(wait=False, cancel_futures=True)
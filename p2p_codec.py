@@ -0,0 +1,150 @@
+import json
+import struct
+import time
+import uuid
+import zlib
+
+from p2p_transport import MAX_FRAME_SIZE
+
+ENVELOPE_VERSION = 1
+# Encoded bodies at least this large are zlib-compressed.
+COMPRESS_THRESHOLD = 512
+COMPRESS_LEVEL = 6
+
+# First byte of every encoded envelope: codec id in the high nibble, flags
+# in the low nibble.
+FLAG_ZLIB = 0x01
+
+
+class Envelope:
+    """One P2P chat message plus the metadata it travels with."""
+
+    __slots__ = ("version", "sender", "channel", "message_id", "timestamp", "text")
+
+    def __init__(
+        self,
+        sender,
+        channel,
+        text,
+        message_id=None,
+        timestamp=None,
+        version=ENVELOPE_VERSION,
+    ):
+        self.version = version
+        self.sender = sender
+        self.channel = channel
+        self.text = text
+        self.message_id = message_id or uuid.uuid4().hex
+        self.timestamp = timestamp if timestamp is not None else time.time()
+
+    def __repr__(self):
+        return f"<Envelope {self.message_id} from {self.sender} @ {self.channel}>"
+
+
+class JsonCodec:
+    """Human-readable codec, handy when inspecting traffic."""
+
+    codec_id = 1
+
+    def to_dict(self, envelope):
+        return {
+            "v": envelope.version,
+            "id": envelope.message_id,
+            "ts": envelope.timestamp,
+            "from": envelope.sender,
+            "ch": envelope.channel,
+            "text": envelope.text,
+        }
+
+    def from_dict(self, data):
+        return Envelope(
+            data["from"], data["ch"], data["text"], data["id"], data["ts"], data["v"]
+        )
+
+    def encode_body(self, envelope):
+        return json.dumps(self.to_dict(envelope), separators=(",", ":")).encode()
+
+    def decode_body(self, body):
+        return self.from_dict(json.loads(body))
+
+
+class BinaryCodec:
+    """Compact fixed-layout codec.
+
+    Layout: version, 16-byte message id, float64 timestamp, sender and
+    channel lengths, then sender, channel and text as UTF-8.
+    """
+
+    codec_id = 2
+    header = struct.Struct("!B16sdHH")
+    max_field = 0xFFFF
+
+    def encode_body(self, envelope):
+        sender = envelope.sender.encode()
+        channel = envelope.channel.encode()
+        for name, value in (("sender", sender), ("channel", channel)):
+            if len(value) > self.max_field:
+                raise ValueError(
+                    f"{name} is {len(value)} bytes, at most {self.max_field} fit"
+                )
+        return b"".join(
+            (
+                self.header.pack(
+                    envelope.version,
+                    bytes.fromhex(envelope.message_id),
+                    envelope.timestamp,
+                    len(sender),
+                    len(channel),
+                ),
+                sender,
+                channel,
+                envelope.text.encode(),
+            )
+        )
+
+    def decode_body(self, body):
+        version, message_id, timestamp, sender_len, channel_len = (
+            self.header.unpack_from(body)
+        )
+        start = self.header.size
+        sender = body[start : start + sender_len].decode()
+        start += sender_len
+        channel = body[start : start + channel_len].decode()
+        start += channel_len
+        return Envelope(
+            sender, channel, body[start:].decode(), message_id.hex(), timestamp, version
+        )
+
+
+JSON = JsonCodec()
+BINARY = BinaryCodec()
+CODECS = {codec.codec_id: codec for codec in (JSON, BINARY)}
+
+
+def encode(envelope, codec=BINARY, compress_threshold=COMPRESS_THRESHOLD):
+    """Encodes ``envelope`` with ``codec``, compressing large bodies.
+
+    A ``compress_threshold`` of None disables compression.
+    """
+    body = codec.encode_body(envelope)
+    flags = 0
+    if compress_threshold is not None and len(body) >= compress_threshold:
+        compressed = zlib.compress(body, COMPRESS_LEVEL)
+        if len(compressed) < len(body):
+            body, flags = compressed, FLAG_ZLIB
+    return bytes((codec.codec_id << 4 | flags,)) + body
+
+
+def decode(data):
+    """Decodes bytes produced by :func:`encode` with any registered codec."""
+    codec = CODECS.get(data[0] >> 4)
+    if codec is None:
+        raise ValueError(f"unknown envelope codec {data[0] >> 4}")
+    body = data[1:]
+    if data[0] & FLAG_ZLIB:
+        # Bounded, so a small frame cannot inflate into gigabytes.
+        inflater = zlib.decompressobj()
+        body = inflater.decompress(body, MAX_FRAME_SIZE)
+        if inflater.unconsumed_tail:
+            raise ValueError(f"envelope inflates past {MAX_FRAME_SIZE} bytes")
+    return codec.decode_body(body)
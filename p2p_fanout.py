@@ -0,0 +1,129 @@
+import math
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait
+
+MAX_CONCURRENCY = 32
+PEER_TIMEOUT = 3
+
+
+class DeliveryResult:
+    __slots__ = ("peer", "ok", "error", "elapsed")
+
+    def __init__(self, peer, ok, error=None, elapsed=0.0):
+        self.peer = peer
+        self.ok = ok
+        self.error = error
+        self.elapsed = elapsed
+
+
+class DeliveryReport:
+    def __init__(self, results, elapsed):
+        self.results = results
+        self.elapsed = elapsed
+
+    @property
+    def delivered(self):
+        return [r for r in self.results if r.ok]
+
+    @property
+    def failed(self):
+        return [r for r in self.results if not r.ok]
+
+    def summary(self):
+        return (
+            f"[System] Delivered to {len(self.delivered)}/{len(self.results)} "
+            f"peer(s) in {self.elapsed:.2f}s."
+        )
+
+
+class FanOut:
+    """Sends one message to many peers on a bounded worker pool.
+
+    At most ``max_concurrency`` deliveries run at once, each bounded by the
+    send function's own ``timeout``, so a broadcast takes about as long as
+    its slowest peer instead of growing with the number of peers.
+    """
+
+    def __init__(self, max_concurrency=MAX_CONCURRENCY, timeout=PEER_TIMEOUT):
+        self.max_concurrency = max_concurrency
+        self.timeout = timeout
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_concurrency, thread_name_prefix="p2p-fanout"
+        )
+        self._lock = threading.Lock()
+
+    def _deliver(self, send, peer, target, message):
+        start = time.monotonic()
+        try:
+            send(target[0], target[1], message, timeout=self.timeout)
+            return DeliveryResult(peer, True, elapsed=time.monotonic() - start)
+        except Exception as e:
+            return DeliveryResult(peer, False, e, time.monotonic() - start)
+
+    def broadcast(self, targets, message, send):
+        """Delivers ``message`` to every target and waits for the outcome.
+
+        :param targets: dict of peer name -> (ip, port).
+        :param send: callable ``send(ip, port, message, timeout=...)`` that
+            raises on failure.
+        :return: a :class:`DeliveryReport` with one result per peer.
+        """
+        start = time.monotonic()
+        if not targets:
+            return DeliveryReport([], 0.0)
+
+        with self._lock:
+            futures = {
+                self._executor.submit(self._deliver, send, peer, target, message): peer
+                for peer, target in targets.items()
+            }
+
+        # Deliveries run in waves of max_concurrency, each bounded by timeout.
+        waves = math.ceil(len(futures) / self.max_concurrency)
+        done, not_done = wait(futures, timeout=waves * self.timeout + 1)
+
+        results = [f.result() for f in done]
+        for f in not_done:
+            results.append(
+                DeliveryResult(futures[f], False, TimeoutError("delivery timed out"))
+            )
+        return DeliveryReport(results, time.monotonic() - start)
+
+    def broadcast_queued(self, targets, message, enqueue):
+        """Queues ``message`` for every target, then waits for all of them.
+
+        Unlike :meth:`broadcast`, no worker is held per peer while its
+        message waits in a batch, so concurrent broadcasts to the same peer
+        can share one send.
+
+        :param targets: dict of peer name -> (ip, port).
+        :param enqueue: callable ``enqueue(ip, port, message, timeout=...)``
+            returning an object whose ``wait(timeout)`` raises on failure.
+        :return: a :class:`DeliveryReport` with one result per peer.
+        """
+        start = time.monotonic()
+        results = []
+        queued = {}
+        for peer, target in targets.items():
+            try:
+                queued[peer] = enqueue(
+                    target[0], target[1], message, timeout=self.timeout
+                )
+            except Exception as e:
+                results.append(DeliveryResult(peer, False, e, time.monotonic() - start))
+
+        # Same budget as broadcast: waves of max_concurrency sends.
+        waves = math.ceil(len(queued) / self.max_concurrency)
+        deadline = start + waves * self.timeout + 1
+        for peer, pending in queued.items():
+            try:
+                pending.wait(max(0.0, deadline - time.monotonic()))
+                elapsed = time.monotonic() - start
+                results.append(DeliveryResult(peer, True, elapsed=elapsed))
+            except Exception as e:
+                results.append(DeliveryResult(peer, False, e, time.monotonic() - start))
+        return DeliveryReport(results, time.monotonic() - start)
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
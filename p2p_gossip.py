@@ -0,0 +1,97 @@
+import threading
+import uuid
+from collections import OrderedDict
+
+TREE_FANOUT = 4
+# Channels with at least this many recipients use tree dissemination.
+TREE_THRESHOLD = 16
+SEEN_CACHE_SIZE = 4096
+
+
+def split_tree(targets, fanout):
+    """Splits recipients into up to ``fanout`` subtrees.
+
+    Each subtree is (head, rest): the head receives the message and becomes
+    responsible for relaying it to ``rest``.
+    """
+    groups = [targets[i::fanout] for i in range(min(fanout, len(targets)))]
+    return [(group[0], group[1:]) for group in groups]
+
+
+class SeenCache:
+    """Bounded LRU of message IDs, used to drop duplicate deliveries."""
+
+    def __init__(self, size=SEEN_CACHE_SIZE):
+        self.size = size
+        self._ids = OrderedDict()
+        self._lock = threading.Lock()
+
+    def add(self, message_id):
+        """Records ``message_id`` and returns False if it was already seen."""
+        with self._lock:
+            if message_id in self._ids:
+                self._ids.move_to_end(message_id)
+                return False
+            self._ids[message_id] = None
+            if len(self._ids) > self.size:
+                self._ids.popitem(last=False)
+            return True
+
+
+class TreeBroadcaster:
+    """Disseminates a channel message along a relay tree.
+
+    The sender transmits to at most ``fanout`` peers. Each message carries
+    the recipients its receiver is responsible for, and the receiver splits
+    that list the same way, so every peer sends at most ``fanout`` copies
+    and a channel of N peers is covered in about log_fanout(N) hops. When a
+    relay head cannot be reached, its parent takes over that subtree.
+    """
+
+    def __init__(self, deliver, fanout=TREE_FANOUT):
+        # deliver(ip, port, envelope) raises on failure.
+        self.deliver = deliver
+        self.fanout = fanout
+        self.seen = SeenCache()
+
+    def start(self, origin, channel, text, targets):
+        """Starts a broadcast to ``targets``, a list of (user, ip, port).
+
+        :return: (envelope, list of (user, error) for the recipients that
+            could not be reached, directly or through a relay)
+        """
+        envelope = {
+            "id": uuid.uuid4().hex,
+            "origin": origin,
+            "channel": channel,
+            "text": text,
+        }
+        self.seen.add(envelope["id"])
+        return envelope, self.forward(envelope, list(targets))
+
+    def receive(self, envelope):
+        """Accepts an incoming tree message.
+
+        :return: None for a duplicate, otherwise the (user, ip, port) list
+            this peer must relay to with :meth:`forward`.
+        """
+        if not self.seen.add(envelope["id"]):
+            return None
+        return [tuple(t) for t in envelope.get("relay", [])]
+
+    def forward(self, envelope, targets):
+        """Sends ``envelope`` down the tree rooted at this peer.
+
+        :return: list of (user, error) for the unreachable recipients.
+        """
+        failed = []
+        for head, rest in split_tree(targets, self.fanout):
+            message = dict(envelope, relay=[list(t) for t in rest])
+            try:
+                self.deliver(head[1], head[2], message)
+            except Exception as e:
+                failed.append((head[0], e))
+                # Take over the unreachable head's subtree; whatever is
+                # still unreachable there is reported along with the head.
+                failed.extend(self.forward(envelope, rest))
+        return failed
@@ -1,3 +1,4 @@
+import os
 import socket
 import threading
 import requests
@@ -6,16 +7,35 @@ import sys
 import time
 from queue import Queue
 
+from p2p_fanout import FanOut, PEER_TIMEOUT
+from p2p_batcher import OutboundBatcher
+from p2p_gossip import TreeBroadcaster, TREE_THRESHOLD
+from p2p_store import Outbox
+from p2p_transport import ConnectionManager, read_frame, RECV_IDLE_TIMEOUT
+from p2p_transport import KIND_TREE, KIND_ENVELOPE
+import p2p_codec
+
 HEARTBEAT_INTERVAL = 5
+# Longest the tracker holds a /channels/watch request.
+WATCH_TIMEOUT = 25
+OUTBOX_DIR = "p2p_outbox"
 
 
 class P2PHandler:
-    def __init__(self, message_queue, api_url="http://localhost:8080"):
+    def __init__(
+        self, message_queue, api_url="http://localhost:8080", codec=p2p_codec.BINARY
+    ):
         self.message_queue = message_queue
         self.API_URL = api_url
+        # Wire codec for outgoing messages; incoming ones name their own.
+        self.codec = codec
 
         self.session = requests.Session()
         self.peer_list_cache = {}
+        # Membership revision the cache reflects, for delta refreshes.
+        self.peer_rev = None
+        self.peer_epoch = None
+        self._peer_lock = threading.Lock()
         self.my_username = ""
         self.my_port = 0
         self.current_channel = "global"
@@ -25,6 +45,13 @@ class P2PHandler:
         self.heartbeat_thread = None
         self.heartbeat_stop_event = threading.Event()
 
+        self.fanout = FanOut()
+        self.batcher = OutboundBatcher(self._flush_batch)
+        self.tree = TreeBroadcaster(self._deliver)
+        # Created at login, once the per-user outbox directory is known.
+        self.outbox = None
+        self.connections = ConnectionManager()
+
     def _put_message(self, msg):
         self.message_queue.put(msg)
 
@@ -40,6 +67,11 @@ class P2PHandler:
             self._put_message("[System] Login successful.")
             self.my_username = username
             self.my_port = port
+            self.outbox = Outbox(
+                os.path.join(OUTBOX_DIR, username),
+                self._deliver_queued,
+                self._on_queued_delivered,
+            )
             time.sleep(0.5)
 
             self._put_message("[System] Registering P2P listener...")
@@ -60,23 +92,77 @@ class P2PHandler:
     def get_channel_peers(self):
         self._put_message("[System] Fetching peer list from server...")
         try:
-            resp = self.session.post(
-                f"{self.API_URL}/channels/peers",
-                json={"channel_name": self.current_channel},
-            )
-            if resp.status_code != 200:
-                self._put_message(f"[Error] {resp.json().get('reason')}")
-                return
-
-            self.peer_list_cache = resp.json()
-            self._put_message(
-                f"""[System] Peer list updated. Found {
-                    len(self.peer_list_cache)
-                } peer(s)."""
-            )
+            with self._peer_lock:
+                request = {"channel_name": self.current_channel, "since": 0}
+                if self.peer_rev is not None:
+                    request.update(since=self.peer_rev, epoch=self.peer_epoch)
+                resp = self.session.post(f"{self.API_URL}/channels/peers", json=request)
+                data = resp.json()
+                if resp.status_code != 200 or data.get("status") == "failed":
+                    self._put_message(f"[Error] {data.get('reason')}")
+                    return
+                self._apply_peer_update(data)
         except Exception as e:
             self._put_message(f"[Error] Could not get peer list: {e}")
 
+    def _apply_peer_update(self, data):
+        if "rev" not in data:
+            # Tracker without revisions: the reply is the whole peer map.
+            self.peer_list_cache = data
+        elif data["full"]:
+            self.peer_list_cache = data["peers"]
+        else:
+            peers = dict(self.peer_list_cache)
+            peers.update(data["joined"])
+            for user in data["left"]:
+                peers.pop(user, None)
+            # Swapped in whole so concurrent broadcasts see a consistent map.
+            self.peer_list_cache = peers
+        self.peer_rev = data.get("rev")
+        self.peer_epoch = data.get("epoch")
+        if self.outbox is not None:
+            # Peers that are back online get their queued messages now.
+            self.outbox.wake(
+                list(self.peer_list_cache)
+                + [f"{i['ip']}:{i['port']}" for i in self.peer_list_cache.values()]
+            )
+        self._put_message(
+            f"[System] Peer list updated. Found {len(self.peer_list_cache)} peer(s)."
+        )
+
+    def _watch_loop(self):
+        # Long-polls the tracker so membership changes arrive as they happen.
+        while not self.heartbeat_stop_event.is_set():
+            if self.peer_rev is None:
+                self.get_channel_peers()
+            channel, rev = self.current_channel, self.peer_rev
+            if rev is None:
+                self.heartbeat_stop_event.wait(HEARTBEAT_INTERVAL)
+                continue
+            request = {"channel_name": channel, "since": rev, "epoch": self.peer_epoch}
+            try:
+                resp = self.session.post(
+                    f"{self.API_URL}/channels/watch",
+                    json=request,
+                    timeout=WATCH_TIMEOUT + 5,
+                )
+                data = resp.json()
+            except Exception as e:
+                self._put_message(f"[Watch error] {e}")
+                self.heartbeat_stop_event.wait(HEARTBEAT_INTERVAL)
+                continue
+            if resp.status_code != 200 or data.get("status") == "failed":
+                self.heartbeat_stop_event.wait(HEARTBEAT_INTERVAL)
+                continue
+            with self._peer_lock:
+                # Drop replies for a channel we have since left.
+                if (channel, rev) != (self.current_channel, self.peer_rev):
+                    continue
+                if data["full"] or data["joined"] or data["left"]:
+                    self._apply_peer_update(data)
+                else:
+                    self.peer_rev = data["rev"]
+
     def join_channel(self, new_channel):
         try:
             resp = self.session.post(
@@ -84,6 +170,7 @@ class P2PHandler:
             )
             if resp.status_code == 200:
                 self.current_channel = new_channel
+                self.peer_rev = None
                 self._put_message(f"[System] Joined channel '{new_channel}'.")
                 self.get_channel_peers()
             else:
@@ -107,7 +194,7 @@ class P2PHandler:
             self.heartbeat_thread.start()
             self._put_message("[System] Heartbeat thread started.")
 
-            threading.Thread(target=self.get_channel_peers, daemon=True).start()
+            threading.Thread(target=self._watch_loop, daemon=True).start()
 
         except Exception as e:
             self._put_message(
@@ -117,12 +204,15 @@ class P2PHandler:
             )
 
     def _heartbeat_loop(self):
+        interval = HEARTBEAT_INTERVAL
         while not self.heartbeat_stop_event.is_set():
             try:
-                self.session.get(f"{self.API_URL}/heartbeat")
+                resp = self.session.get(f"{self.API_URL}/heartbeat")
+                # The tracker stretches the interval as the peer count grows.
+                interval = resp.json().get("interval", HEARTBEAT_INTERVAL)
             except Exception as e:
                 self._put_message(f"[Heartbeat error] {e}")
-            self.heartbeat_stop_event.wait(HEARTBEAT_INTERVAL)
+            self.heartbeat_stop_event.wait(interval)
         self._put_message("[System] Heartbeat thread stopped.")
 
     def _listen_for_messages(self):
@@ -138,34 +228,98 @@ class P2PHandler:
 
     def _handle_peer_connection(self, conn, addr):
         try:
-            data = conn.recv(4096)
-            if data:
+            conn.settimeout(RECV_IDLE_TIMEOUT)
+            while True:
+                frame = read_frame(conn)
+                if frame is None:
+                    break
+                kind, data = frame
+                if kind == KIND_TREE:
+                    self._on_tree_message(json.loads(data))
+                    continue
+                if kind == KIND_ENVELOPE:
+                    text = p2p_codec.decode(data).text
+                else:
+                    text = data.decode("utf-8")
                 message = (
                     f"--- New Message from {addr[0]}:{addr[1]} ---\n"
-                    f"{data.decode('utf-8')}\n"
+                    f"{text}\n"
                     f"----------------------------------------"
                 )
                 self._put_message(message)
+        except socket.timeout:
+            pass
         except Exception as e:
             self._put_message(f"\r[Peer Error] {e}")
         finally:
             conn.close()
 
+    def _flush_batch(self, target_ip, target_port, messages):
+        # A burst of messages to one peer is written with a single sendall.
+        frames = [
+            (KIND_TREE, json.dumps(m).encode("utf-8"))
+            if isinstance(m, dict)
+            else (KIND_ENVELOPE, self._encode(m))
+            for m in messages
+        ]
+        self.connections.send_frames(target_ip, target_port, frames)
+
+    def _encode(self, text):
+        envelope = p2p_codec.Envelope(self.my_username, self.current_channel, text)
+        return p2p_codec.encode(envelope, self.codec)
+
+    def _deliver(self, target_ip, target_port, message, timeout=PEER_TIMEOUT):
+        pending = self.batcher.enqueue(target_ip, target_port, message, timeout)
+        pending.wait(timeout)
+
+    def _resolve_peer(self, recipient):
+        info = self.peer_list_cache.get(recipient)
+        if info:
+            return info["ip"], info["port"]
+        ip, sep, port = recipient.rpartition(":")
+        if sep and port.isdigit():
+            return ip, int(port)
+        return None
+
+    def _deliver_queued(self, recipient, message):
+        addr = self._resolve_peer(recipient)
+        if addr is None:
+            raise ConnectionError(f"{recipient} is offline")
+        self._deliver(addr[0], addr[1], message)
+
+    def _on_queued_delivered(self, recipient, count):
+        self._put_message(
+            f"[System] Delivered {count} queued message(s) to {recipient}."
+        )
+
+    def _queue_for_retry(self, recipient, message, error):
+        if self.outbox is None:
+            self._put_message(f"[Error] Could not send to {recipient}: {error}")
+            return
+        self.outbox.put(recipient, message)
+        self._put_message(
+            f"[System] {recipient} unreachable ({error}); message queued for retry."
+        )
+
     def send_p2p_message(self, target_ip, target_port, message):
         try:
-            with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
-                s.settimeout(3)
-                s.connect((target_ip, int(target_port)))
-                s.sendall(message.encode("utf-8"))
+            self._deliver(target_ip, target_port, message)
             self._put_message(f"[System] Message sent to {target_ip}:{target_port}")
-        except socket.timeout:
-            self._put_message(
-                f"[Error] Connection to {target_ip}:{target_port} timed out."
-            )
         except Exception as e:
-            self._put_message(
-                f"[Error] Could not send to {target_ip}:{target_port}: {e}"
-            )
+            self._queue_for_retry(f"{target_ip}:{target_port}", message, e)
+
+    def _on_tree_message(self, envelope):
+        relay = self.tree.receive(envelope)
+        if relay is None:
+            return
+        self._put_message(
+            f"--- New Message ---\n{envelope['text']}\n---------------------"
+        )
+        if relay:
+            # Relay off the receiving thread so a slow child cannot stall it.
+            threading.Thread(
+                target=self.tree.forward, args=(envelope, relay), daemon=True
+            ).start()
 
     def broadcast_message(self, message, refresh):
         if refresh:
@@ -183,18 +337,40 @@ class P2PHandler:
 
         self._put_message(f"[Broadcasting...] {message}")
 
-        for user, info in self.peer_list_cache.items():
-            if user == self.my_username:
-                continue
+        targets = {
+            user: (info["ip"], info["port"])
+            for user, info in self.peer_list_cache.items()
+            if user != self.my_username
+        }
+        if len(targets) >= TREE_THRESHOLD:
+            # Large channel: send to a few relay heads instead of everyone.
+            _, failed = self.tree.start(
+                self.my_username,
+                self.current_channel,
+                formatted_message,
+                [(user, ip, port) for user, (ip, port) in targets.items()],
+            )
+            for user, error in failed:
+                self._queue_for_retry(user, formatted_message, error)
+            self._put_message(
+                f"[System] Relayed to {len(targets)} peer(s) via tree, "
+                f"{len(failed)} unreachable."
+            )
+            return
 
-            threading.Thread(
-                target=self.send_p2p_message,
-                args=(info["ip"], info["port"], formatted_message),
-                daemon=True,
-            ).start()
-            time.sleep(0.01)
+        report = self.fanout.broadcast_queued(
+            targets, formatted_message, self.batcher.enqueue
+        )
+        for result in report.failed:
+            self._queue_for_retry(result.peer, formatted_message, result.error)
+        self._put_message(report.summary())
 
     def shutdown(self):
+        if self.outbox is not None:
+            self.outbox.stop()
+        self.fanout.shutdown()
+        self.batcher.shutdown()
+        self.connections.close_all()
         if self.listen_socket:
             self.listen_socket.close()
         if self.heartbeat_stop_event:
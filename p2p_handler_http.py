@@ -1,3 +1,4 @@
+import os
 import socket
 import threading
 import requests
@@ -6,10 +7,19 @@ import sys
 import time
 from queue import Queue
 
+from p2p_fanout import FanOut, PEER_TIMEOUT
+from p2p_batcher import OutboundBatcher
+from p2p_gossip import TreeBroadcaster, TREE_THRESHOLD
+from p2p_store import Outbox
+import p2p_codec
+
 from daemon.weaprous import WeApRous
 from daemon.backend import create_backend
 
 HEARTBEAT_INTERVAL = 5
+# Longest the tracker holds a /channels/watch request.
+WATCH_TIMEOUT = 25
+OUTBOX_DIR = "p2p_outbox"
 
 
 class P2PHandler:
@@ -19,15 +29,26 @@ class P2PHandler:
 
         self.session = requests.Session()
         self.peer_list_cache = {}
+        # Membership revision the cache reflects, for delta refreshes.
+        self.peer_rev = None
+        self.peer_epoch = None
+        self._peer_lock = threading.Lock()
         self.my_username = ""
         self.my_port = 0
         self.current_channel = "global"
 
         self.p2p_app = WeApRous()
+        self._peer_sessions = threading.local()
 
         self.heartbeat_thread = None
         self.heartbeat_stop_event = threading.Event()
 
+        self.fanout = FanOut()
+        self.batcher = OutboundBatcher(self._flush_batch)
+        self.tree = TreeBroadcaster(self._deliver)
+        # Created at login, once the per-user outbox directory is known.
+        self.outbox = None
+
     def _put_message(self, msg):
         self.message_queue.put(msg)
 
@@ -43,6 +64,11 @@ class P2PHandler:
             self._put_message("[System] Login successful.")
             self.my_username = username
             self.my_port = port
+            self.outbox = Outbox(
+                os.path.join(OUTBOX_DIR, username),
+                self._deliver_queued,
+                self._on_queued_delivered,
+            )
             time.sleep(0.5)
 
             self.start_p2p_server()
@@ -65,23 +91,77 @@ class P2PHandler:
     def get_channel_peers(self):
         self._put_message("[System] Fetching peer list from server...")
         try:
-            resp = self.session.post(
-                f"{self.API_URL}/channels/peers",
-                json={"channel_name": self.current_channel},
-            )
-            if resp.status_code != 200:
-                self._put_message(f"[Error] {resp.json().get('reason')}")
-                return
-
-            self.peer_list_cache = resp.json()
-            self._put_message(
-                f"""[System] Peer list updated. Found {
-                    len(self.peer_list_cache)
-                } peer(s)."""
-            )
+            with self._peer_lock:
+                request = {"channel_name": self.current_channel, "since": 0}
+                if self.peer_rev is not None:
+                    request.update(since=self.peer_rev, epoch=self.peer_epoch)
+                resp = self.session.post(f"{self.API_URL}/channels/peers", json=request)
+                data = resp.json()
+                if resp.status_code != 200 or data.get("status") == "failed":
+                    self._put_message(f"[Error] {data.get('reason')}")
+                    return
+                self._apply_peer_update(data)
         except Exception as e:
             self._put_message(f"[Error] Could not get peer list: {e}")
 
+    def _apply_peer_update(self, data):
+        if "rev" not in data:
+            # Tracker without revisions: the reply is the whole peer map.
+            self.peer_list_cache = data
+        elif data["full"]:
+            self.peer_list_cache = data["peers"]
+        else:
+            peers = dict(self.peer_list_cache)
+            peers.update(data["joined"])
+            for user in data["left"]:
+                peers.pop(user, None)
+            # Swapped in whole so concurrent broadcasts see a consistent map.
+            self.peer_list_cache = peers
+        self.peer_rev = data.get("rev")
+        self.peer_epoch = data.get("epoch")
+        if self.outbox is not None:
+            # Peers that are back online get their queued messages now.
+            self.outbox.wake(
+                list(self.peer_list_cache)
+                + [f"{i['ip']}:{i['port']}" for i in self.peer_list_cache.values()]
+            )
+        self._put_message(
+            f"[System] Peer list updated. Found {len(self.peer_list_cache)} peer(s)."
+        )
+
+    def _watch_loop(self):
+        # Long-polls the tracker so membership changes arrive as they happen.
+        while not self.heartbeat_stop_event.is_set():
+            if self.peer_rev is None:
+                self.get_channel_peers()
+            channel, rev = self.current_channel, self.peer_rev
+            if rev is None:
+                self.heartbeat_stop_event.wait(HEARTBEAT_INTERVAL)
+                continue
+            request = {"channel_name": channel, "since": rev, "epoch": self.peer_epoch}
+            try:
+                resp = self.session.post(
+                    f"{self.API_URL}/channels/watch",
+                    json=request,
+                    timeout=WATCH_TIMEOUT + 5,
+                )
+                data = resp.json()
+            except Exception as e:
+                self._put_message(f"[Watch error] {e}")
+                self.heartbeat_stop_event.wait(HEARTBEAT_INTERVAL)
+                continue
+            if resp.status_code != 200 or data.get("status") == "failed":
+                self.heartbeat_stop_event.wait(HEARTBEAT_INTERVAL)
+                continue
+            with self._peer_lock:
+                # Drop replies for a channel we have since left.
+                if (channel, rev) != (self.current_channel, self.peer_rev):
+                    continue
+                if data["full"] or data["joined"] or data["left"]:
+                    self._apply_peer_update(data)
+                else:
+                    self.peer_rev = data["rev"]
+
     def join_channel(self, new_channel):
         try:
             resp = self.session.post(
@@ -89,6 +169,7 @@ class P2PHandler:
             )
             if resp.status_code == 200:
                 self.current_channel = new_channel
+                self.peer_rev = None
                 self._put_message(f"[System] Joined channel '{new_channel}'.")
 
             else:
@@ -97,12 +178,15 @@ class P2PHandler:
             self._put_message(f"[Error] {e}")
 
     def _heartbeat_loop(self):
+        interval = HEARTBEAT_INTERVAL
         while not self.heartbeat_stop_event.is_set():
             try:
-                self.session.get(f"{self.API_URL}/heartbeat")
+                resp = self.session.get(f"{self.API_URL}/heartbeat")
+                # The tracker stretches the interval as the peer count grows.
+                interval = resp.json().get("interval", HEARTBEAT_INTERVAL)
             except Exception as e:
                 self._put_message(f"[Heartbeat error] {e}")
-            self.heartbeat_stop_event.wait(HEARTBEAT_INTERVAL)
+            self.heartbeat_stop_event.wait(interval)
         self._put_message("[System] Heartbeat thread stopped.")
 
     def start_p2p_server(self):
@@ -110,9 +194,23 @@ class P2PHandler:
         def receive_peer_message(headers, body):
             try:
                 data = json.loads(body)
-                message = data.get("message", "Empty Message")
-                display_msg = f"--- New Message ---\n{message}\n---------------------"
-                self._put_message(display_msg)
+                envelopes = data.get("envelopes", [])
+                for item in envelopes:
+                    envelope = p2p_codec.JSON.from_dict(item)
+                    self._put_message(
+                        f"--- New Message ---\n{envelope.text}\n---------------------"
+                    )
+                messages = data.get("messages") or []
+                if not messages and not envelopes:
+                    messages = [data.get("message", "Empty Message")]
+                for message in messages:
+                    if isinstance(message, dict):
+                        self._on_tree_message(message)
+                        continue
+                    display_msg = (
+                        f"--- New Message ---\n{message}\n---------------------"
+                    )
+                    self._put_message(display_msg)
 
                 return {"status": "ok", "delivered": True}
             except Exception as e:
@@ -138,7 +236,7 @@ class P2PHandler:
             self.heartbeat_thread.start()
             self._put_message("[System] Heartbeat thread started.")
 
-            threading.Thread(target=self.get_channel_peers, daemon=True).start()
+            threading.Thread(target=self._watch_loop, daemon=True).start()
 
         except Exception as e:
             self._put_message(
@@ -148,17 +246,86 @@ class P2PHandler:
             )
             raise e
 
+    def _peer_session(self):
+        # One pooled session per batch flush worker, reused across batches.
+        session = getattr(self._peer_sessions, "session", None)
+        if session is None:
+            session = self._peer_sessions.session = requests.Session()
+        return session
+
+    def _flush_batch(self, target_ip, target_port, messages):
+        # A burst of messages to one peer travels as a single request. Chat
+        # text goes as JSON-codec envelopes, tree messages as they are.
+        payload = {
+            "envelopes": [
+                p2p_codec.JSON.to_dict(
+                    p2p_codec.Envelope(self.my_username, self.current_channel, m)
+                )
+                for m in messages
+                if isinstance(m, str)
+            ],
+            "messages": [m for m in messages if isinstance(m, dict)],
+            "sender": self.my_username,
+        }
+        resp = self._peer_session().post(
+            f"http://{target_ip}:{target_port}/send-peer",
+            json=payload,
+            timeout=PEER_TIMEOUT,
+        )
+        resp.raise_for_status()
+
+    def _deliver(self, target_ip, target_port, message, timeout=PEER_TIMEOUT):
+        pending = self.batcher.enqueue(target_ip, target_port, message, timeout)
+        pending.wait(timeout)
+
+    def _resolve_peer(self, recipient):
+        info = self.peer_list_cache.get(recipient)
+        if info:
+            return info["ip"], info["port"]
+        ip, sep, port = recipient.rpartition(":")
+        if sep and port.isdigit():
+            return ip, int(port)
+        return None
+
+    def _deliver_queued(self, recipient, message):
+        addr = self._resolve_peer(recipient)
+        if addr is None:
+            raise ConnectionError(f"{recipient} is offline")
+        self._deliver(addr[0], addr[1], message)
+
+    def _on_queued_delivered(self, recipient, count):
+        self._put_message(
+            f"[System] Delivered {count} queued message(s) to {recipient}."
+        )
+
+    def _queue_for_retry(self, recipient, message, error):
+        if self.outbox is None:
+            self._put_message(f"[Error] Could not send to {recipient}: {error}")
+            return
+        self.outbox.put(recipient, message)
+        self._put_message(
+            f"[System] {recipient} unreachable ({error}); message queued for retry."
+        )
+
     def send_p2p_message(self, target_ip, target_port, message):
         try:
-            payload = {"message": message, "sender": self.my_username}
-            requests.post(
-                f"http://{target_ip}:{target_port}/send-peer", json=payload, timeout=3
-            )
+            self._deliver(target_ip, target_port, message)
             self._put_message(f"[System] Message sent to {target_ip}:{target_port}")
         except Exception as e:
-            self._put_message(
-                f"[Error] Could not send to {target_ip}:{target_port}: {e}"
-            )
+            self._queue_for_retry(f"{target_ip}:{target_port}", message, e)
+
+    def _on_tree_message(self, envelope):
+        relay = self.tree.receive(envelope)
+        if relay is None:
+            return
+        self._put_message(
+            f"--- New Message ---\n{envelope['text']}\n---------------------"
+        )
+        if relay:
+            # Relay off the receiving thread so a slow child cannot stall it.
+            threading.Thread(
+                target=self.tree.forward, args=(envelope, relay), daemon=True
+            ).start()
 
     def broadcast_message(self, message, refresh):
         if refresh:
@@ -174,16 +341,38 @@ class P2PHandler:
         formatted_message = f"[{self.my_username} @ {self.current_channel}]: {message}"
         self._put_message(f"[Broadcasting...] {message}")
 
-        for user, info in self.peer_list_cache.items():
-            if user == self.my_username:
-                continue
-            threading.Thread(
-                target=self.send_p2p_message,
-                args=(info["ip"], info["port"], formatted_message),
-                daemon=True,
-            ).start()
-            time.sleep(0.01)
+        targets = {
+            user: (info["ip"], info["port"])
+            for user, info in self.peer_list_cache.items()
+            if user != self.my_username
+        }
+        if len(targets) >= TREE_THRESHOLD:
+            # Large channel: send to a few relay heads instead of everyone.
+            _, failed = self.tree.start(
+                self.my_username,
+                self.current_channel,
+                formatted_message,
+                [(user, ip, port) for user, (ip, port) in targets.items()],
+            )
+            for user, error in failed:
+                self._queue_for_retry(user, formatted_message, error)
+            self._put_message(
+                f"[System] Relayed to {len(targets)} peer(s) via tree, "
+                f"{len(failed)} unreachable."
+            )
+            return
+
+        report = self.fanout.broadcast_queued(
+            targets, formatted_message, self.batcher.enqueue
+        )
+        for result in report.failed:
+            self._queue_for_retry(result.peer, formatted_message, result.error)
+        self._put_message(report.summary())
 
     def shutdown(self):
+        if self.outbox is not None:
+            self.outbox.stop()
+        self.fanout.shutdown()
+        self.batcher.shutdown()
         if self.heartbeat_stop_event:
             self.heartbeat_stop_event.set()
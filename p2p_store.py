@@ -0,0 +1,211 @@
+import os
+import struct
+import threading
+import time
+import urllib.parse
+
+RECORD_HEADER = struct.Struct("!I")
+SEGMENT_SIZE = 1024 * 1024
+FLUSH_BATCH = 64
+BASE_RETRY = 1
+MAX_RETRY = 60
+CURSOR_FILE = "cursor"
+
+
+class SegmentQueue:
+    """Append-only on-disk FIFO of one recipient's undelivered messages.
+
+    Records are length-prefixed and appended to numbered segment files of
+    about ``segment_size`` bytes. A cursor file holds the (segment, offset)
+    of the first undelivered record; segments behind it are deleted. Only
+    the cursor and the write position live in memory, whatever the backlog.
+    """
+
+    def __init__(self, path, segment_size=SEGMENT_SIZE):
+        self.path = path
+        self.segment_size = segment_size
+        os.makedirs(path, exist_ok=True)
+
+        segments = self._segments()
+        self.tail = segments[-1] if segments else 1
+        self.tail_size = self._size(self.tail)
+        self.cursor = self._load_cursor(segments[0] if segments else 1)
+
+    def _segments(self):
+        names = os.listdir(self.path)
+        return sorted(int(name[:-4]) for name in names if name.endswith(".seg"))
+
+    def _segment_path(self, segment):
+        return os.path.join(self.path, f"{segment:08d}.seg")
+
+    def _size(self, segment):
+        try:
+            return os.path.getsize(self._segment_path(segment))
+        except OSError:
+            return 0
+
+    def _load_cursor(self, first_segment):
+        try:
+            with open(os.path.join(self.path, CURSOR_FILE)) as f:
+                segment, offset = f.read().split()
+            return max(int(segment), first_segment), int(offset)
+        except (OSError, ValueError):
+            return first_segment, 0
+
+    def pending(self):
+        return self.cursor < (self.tail, self.tail_size)
+
+    def append(self, payload):
+        if self.tail_size and self.tail_size + len(payload) > self.segment_size:
+            self.tail += 1
+            self.tail_size = 0
+        with open(self._segment_path(self.tail), "ab") as f:
+            f.write(RECORD_HEADER.pack(len(payload)) + payload)
+            f.flush()
+            os.fsync(f.fileno())
+        self.tail_size += RECORD_HEADER.size + len(payload)
+
+    def peek(self, limit=FLUSH_BATCH):
+        """Reads up to ``limit`` records from the cursor on.
+
+        :return: list of (payload, position after the record).
+        """
+        records = []
+        segment, offset = self.cursor
+        end = (self.tail, self.tail_size)
+        while len(records) < limit and (segment, offset) < end:
+            try:
+                f = open(self._segment_path(segment), "rb")
+            except FileNotFoundError:
+                segment, offset = segment + 1, 0
+                continue
+            with f:
+                f.seek(offset)
+                while len(records) < limit:
+                    header = f.read(RECORD_HEADER.size)
+                    if len(header) < RECORD_HEADER.size:
+                        break
+                    (length,) = RECORD_HEADER.unpack(header)
+                    payload = f.read(length)
+                    if len(payload) < length:
+                        # Torn write at the tail; stop before it.
+                        return records
+                    offset += RECORD_HEADER.size + length
+                    records.append((payload, (segment, offset)))
+            if len(records) < limit and segment < self.tail:
+                segment, offset = segment + 1, 0
+            else:
+                break
+        return records
+
+    def commit(self, position):
+        """Marks everything before ``position`` as delivered."""
+        self.cursor = position
+        tmp = os.path.join(self.path, CURSOR_FILE + ".tmp")
+        with open(tmp, "w") as f:
+            f.write(f"{position[0]} {position[1]}")
+        os.replace(tmp, os.path.join(self.path, CURSOR_FILE))
+        for segment in self._segments():
+            if segment >= position[0]:
+                break
+            os.remove(self._segment_path(segment))
+
+
+class Outbox:
+    """Durable per-recipient store-and-forward queue.
+
+    Messages that could not be delivered are appended to the recipient's
+    :class:`SegmentQueue`. A background thread retries each recipient with
+    exponential backoff, and :meth:`wake` retries at once, e.g. when the
+    peer shows up in the peer list again. Delivery is in order and stops
+    at the first failure, so nothing is skipped.
+    """
+
+    def __init__(self, root, deliver, on_delivered=None):
+        # deliver(recipient, message) raises on failure.
+        self.root = root
+        self.deliver = deliver
+        self.on_delivered = on_delivered
+
+        self._queues = {}
+        self._retry = {}
+        self._lock = threading.Lock()
+        self._wake_event = threading.Event()
+        self._stop_event = threading.Event()
+
+        os.makedirs(root, exist_ok=True)
+        for name in os.listdir(root):
+            recipient = urllib.parse.unquote(name)
+            queue = self._queues[recipient] = SegmentQueue(os.path.join(root, name))
+            if queue.pending():
+                # Left over from an earlier run; retry on the first pass.
+                self._retry[recipient] = (0, 0)
+
+        threading.Thread(target=self._retry_loop, daemon=True).start()
+
+    def _queue(self, recipient):
+        queue = self._queues.get(recipient)
+        if queue is None:
+            path = os.path.join(self.root, urllib.parse.quote(recipient, safe=""))
+            queue = self._queues[recipient] = SegmentQueue(path)
+        return queue
+
+    def put(self, recipient, message):
+        with self._lock:
+            self._queue(recipient).append(message.encode("utf-8"))
+            self._retry.setdefault(recipient, (0, time.monotonic() + BASE_RETRY))
+
+    def waiting(self):
+        """Returns the recipients that still have queued messages."""
+        with self._lock:
+            return [r for r, q in self._queues.items() if q.pending()]
+
+    def wake(self, recipients):
+        """Retries the given recipients on the next pass."""
+        with self._lock:
+            for recipient in recipients:
+                if recipient in self._retry:
+                    self._retry[recipient] = (0, 0)
+        self._wake_event.set()
+
+    def _flush(self, recipient):
+        queue = self._queues[recipient]
+        delivered = 0
+        try:
+            while True:
+                with self._lock:
+                    records = queue.peek()
+                if not records:
+                    return True
+                for payload, position in records:
+                    self.deliver(recipient, payload.decode("utf-8"))
+                    delivered += 1
+                    with self._lock:
+                        queue.commit(position)
+        except Exception:
+            return False
+        finally:
+            if delivered and self.on_delivered:
+                self.on_delivered(recipient, delivered)
+
+    def _retry_loop(self):
+        while not self._stop_event.is_set():
+            self._wake_event.wait(BASE_RETRY)
+            self._wake_event.clear()
+            now = time.monotonic()
+            with self._lock:
+                due = [r for r, (_, at) in self._retry.items() if at <= now]
+            for recipient in due:
+                if self._flush(recipient):
+                    with self._lock:
+                        if not self._queues[recipient].pending():
+                            self._retry.pop(recipient, None)
+                    continue
+                with self._lock:
+                    failures = self._retry.get(recipient, (0, 0))[0] + 1
+                    delay = min(MAX_RETRY, BASE_RETRY * 2 ** (failures - 1))
+                    self._retry[recipient] = (failures, time.monotonic() + delay)
+
+    def stop(self):
+        self._stop_event.set()
+        self._wake_event.set()
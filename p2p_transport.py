@@ -0,0 +1,198 @@
+import select
+import socket
+import struct
+import threading
+import time
+
+# Frame header: payload length and frame kind.
+FRAME_HEADER = struct.Struct("!IB")
+MAX_FRAME_SIZE = 16 * 1024 * 1024
+
+KIND_TEXT = 0
+KIND_TREE = 1
+# Payload is a p2p_codec envelope.
+KIND_ENVELOPE = 2
+
+CONNECT_TIMEOUT = 3
+IDLE_TIMEOUT = 60
+# Inbound connections outlive the sender's idle timeout, so the sender
+# always closes first.
+RECV_IDLE_TIMEOUT = 2 * IDLE_TIMEOUT
+BASE_BACKOFF = 0.5
+MAX_BACKOFF = 30
+
+
+def encode_frame(payload, kind=KIND_TEXT):
+    return FRAME_HEADER.pack(len(payload), kind) + payload
+
+
+def _recv_exact(sock, size):
+    buf = bytearray()
+    while len(buf) < size:
+        chunk = sock.recv(size - len(buf))
+        if not chunk:
+            return None
+        buf += chunk
+    return bytes(buf)
+
+
+def read_frame(sock):
+    """Reads one frame, returning (kind, payload) or None once the peer closes."""
+    header = _recv_exact(sock, FRAME_HEADER.size)
+    if header is None:
+        return None
+    length, kind = FRAME_HEADER.unpack(header)
+    if length > MAX_FRAME_SIZE:
+        raise ValueError(f"frame of {length} bytes exceeds limit")
+    payload = _recv_exact(sock, length)
+    if payload is None:
+        return None
+    return kind, payload
+
+
+class PeerConnection:
+    __slots__ = ("sock", "lock", "last_used")
+
+    def __init__(self, sock):
+        self.sock = sock
+        self.lock = threading.Lock()
+        self.last_used = time.monotonic()
+
+    def close(self):
+        try:
+            self.sock.close()
+        except OSError:
+            pass
+
+
+class ConnectionManager:
+    """Keeps one long-lived framed connection per peer.
+
+    Many messages share a connection as consecutive length-prefixed frames.
+    Connections unused for ``idle_timeout`` seconds are reaped, and a peer
+    that refuses connections is retried with exponential backoff instead
+    of on every message.
+    """
+
+    def __init__(
+        self,
+        connect_timeout=CONNECT_TIMEOUT,
+        idle_timeout=IDLE_TIMEOUT,
+        max_backoff=MAX_BACKOFF,
+    ):
+        self.connect_timeout = connect_timeout
+        self.idle_timeout = idle_timeout
+        self.max_backoff = max_backoff
+
+        self._conns = {}
+        self._backoff = {}
+        self._lock = threading.Lock()
+        self._stop_event = threading.Event()
+
+        threading.Thread(target=self._reap_loop, daemon=True).start()
+
+    def _check_backoff(self, addr):
+        state = self._backoff.get(addr)
+        if state and time.monotonic() < state[1]:
+            raise ConnectionError(
+                f"{addr[0]}:{addr[1]} unreachable, retrying in "
+                f"{state[1] - time.monotonic():.1f}s"
+            )
+
+    def _record_failure(self, addr):
+        failures = self._backoff.get(addr, (0, 0))[0] + 1
+        delay = min(self.max_backoff, BASE_BACKOFF * 2 ** (failures - 1))
+        self._backoff[addr] = (failures, time.monotonic() + delay)
+
+    def _connect(self, addr, timeout):
+        self._check_backoff(addr)
+        try:
+            sock = socket.create_connection(addr, timeout=timeout)
+        except OSError:
+            with self._lock:
+                self._record_failure(addr)
+            raise
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        with self._lock:
+            self._backoff.pop(addr, None)
+            conn = self._conns.get(addr)
+            if conn is None:
+                conn = self._conns[addr] = PeerConnection(sock)
+            else:
+                # Another sender connected first; keep its connection.
+                sock.close()
+        return conn
+
+    def _get(self, addr, timeout):
+        with self._lock:
+            conn = self._conns.get(addr)
+        if conn is not None and not self._is_alive(conn):
+            self._drop(addr, conn)
+            conn = None
+        if conn is None:
+            conn = self._connect(addr, timeout)
+        return conn
+
+    def _is_alive(self, conn):
+        # Receivers never write back, so a readable socket means the peer
+        # closed it (or reset it) while it sat idle in the pool.
+        try:
+            readable, _, _ = select.select([conn.sock], [], [], 0)
+        except (OSError, ValueError):
+            return False
+        return not readable
+
+    def _drop(self, addr, conn):
+        with self._lock:
+            if self._conns.get(addr) is conn:
+                del self._conns[addr]
+        conn.close()
+
+    def send(self, ip, port, payloads, kind=KIND_TEXT, timeout=None):
+        """Sends one payload, or a list of payloads, as frames of one kind."""
+        if isinstance(payloads, (bytes, bytearray)):
+            payloads = [payloads]
+        self.send_frames(ip, port, [(kind, p) for p in payloads], timeout)
+
+    def send_frames(self, ip, port, frames, timeout=None):
+        """Sends a list of (kind, payload) frames to a peer.
+
+        The frames are written with a single sendall. A send that fails on
+        a reused connection is retried once on a fresh connection.
+        """
+        addr = (ip, int(port))
+        timeout = timeout or self.connect_timeout
+        data = b"".join(encode_frame(p, kind) for kind, p in frames)
+
+        for attempt in range(2):
+            conn = self._get(addr, timeout)
+            try:
+                with conn.lock:
+                    conn.sock.settimeout(timeout)
+                    conn.sock.sendall(data)
+                    conn.last_used = time.monotonic()
+                return
+            except OSError:
+                self._drop(addr, conn)
+                if attempt:
+                    raise
+
+    def _reap_loop(self):
+        while not self._stop_event.wait(self.idle_timeout / 2):
+            now = time.monotonic()
+            with self._lock:
+                idle = [
+                    (addr, conn)
+                    for addr, conn in self._conns.items()
+                    if now - conn.last_used > self.idle_timeout
+                ]
+            for addr, conn in idle:
+                self._drop(addr, conn)
+
+    def close_all(self):
+        self._stop_event.set()
+        with self._lock:
+            conns = list(self._conns.values())
+            self._conns.clear()
+        for conn in conns:
+            conn.close()
@@ -27,7 +27,7 @@ Requirements:
 - socket: provide socket networking interface.
 - threading: enables concurrent client handling via threads.
 - argparse: parses command-line arguments for server configuration.
-- re: used for regular expression matching in configuration parsing
+- proxyconf: tokenizing parser for the configuration file.
 - response: response utilities.
 - httpadapter: the class for handling HTTP requests.
 - urlparse: parses URLs to extract host and port information.
@@ -38,64 +38,30 @@ Requirements:
 import socket
 import threading
 import argparse
-import re
 from urllib.parse import urlparse
-from collections import defaultdict
 
 from daemon import create_proxy
+from daemon.proxyconf import load_config
 
 PROXY_PORT = 8080
+CONFIG_FILE = "config/proxy.conf"
 
 
 def parse_virtual_hosts(config_file):
     """
     Parses virtual host blocks from a config file.
 
+    The file is tokenized and parsed by :mod:`daemon.proxyconf`, so nested
+    ``location`` blocks, ``proxy_set_header`` and directives with or without
+    a trailing semicolon are all accepted.
+
     :config_file (str): Path to the NGINX config file.
-    :rtype list of dict: Each dict contains 'listen'and 'server_name'.
+    :rtype dict: host name mapped to :class:`HostConfig <HostConfig>`.
+
+    :raises ConfigError: If the file is malformed.
     """
 
-    with open(config_file, "r") as f:
-        config_text = f.read()
-
-    # Match each host block
-    host_blocks = re.findall(r'host\s+"([^"]+)"\s*\{(.*?)\}', config_text, re.DOTALL)
-
-    dist_policy_map = ""
-
-    routes = {}
-    for host, block in host_blocks:
-        proxy_map = {}
-
-        # Find all proxy_pass entries
-        proxy_passes = re.findall(r"proxy_pass\s+http://([^\s;]+);", block)
-        map = proxy_map.get(host, [])
-        map = map + proxy_passes
-        proxy_map[host] = map
-
-        # Find dist_policy if present
-        policy_match = re.search(r"dist_policy\s+([\w-]+)", block)
-        if policy_match:
-            dist_policy_map = policy_match.group(1)
-        else:  # default policy is round_robin
-            dist_policy_map = "round-robin"
-
-        #
-        # @bksysnet: Build the mapping and policy
-        # TODO: this policy varies among scenarios
-        #       the default policy is provided with one proxy_pass
-        #       In the multi alternatives of proxy_pass then
-        #       the policy is applied to identify the highes matching
-        #       proxy_pass
-        #
-        num_proxies = len(proxy_passes)
-        if num_proxies == 1:
-            routes[host] = (proxy_passes[0], dist_policy_map)
-        # esle if:
-        #         TODO:  apply further policy matching here
-        #
-        else:
-            routes[host] = (proxy_passes, dist_policy_map)
+    routes = load_config(config_file)
 
     for key, value in routes.items():
         print(key, value)
@@ -119,11 +85,37 @@ if __name__ == "__main__":
     )
     parser.add_argument("--server-ip", default="0.0.0.0")
     parser.add_argument("--server-port", type=int, default=PROXY_PORT)
+    parser.add_argument(
+        "--reload-interval",
+        type=float,
+        default=2.0,
+        help="Seconds between config file checks, 0 to reload on SIGHUP only.",
+    )
+    parser.add_argument(
+        "--cache-size",
+        type=int,
+        default=64,
+        help="Megabytes of in-memory response cache, 0 to disable caching.",
+    )
+    parser.add_argument(
+        "--cache-dir",
+        default=None,
+        help="Directory for the optional on-disk response cache tier.",
+    )
 
     args = parser.parse_args()
     ip = args.server_ip
     port = args.server_port
 
-    routes = parse_virtual_hosts("config/proxy.conf")
-
-    create_proxy(ip, port, routes)
+    routes = parse_virtual_hosts(CONFIG_FILE)
+
+    create_proxy(
+        ip,
+        port,
+        routes,
+        config_file=CONFIG_FILE,
+        loader=parse_virtual_hosts,
+        reload_interval=args.reload_interval,
+        cache_size=args.cache_size * 1024 * 1024,
+        cache_dir=args.cache_dir,
+    )
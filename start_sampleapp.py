@@ -25,20 +25,39 @@ and can be configured via command-line arguments.
 """
 
 import argparse
-import json
 import random
 import string
-import urllib.parse
 import time
+import threading
 
-from daemon.utils import extract_cookies
+from daemon.eventloop import run_blocking
+from daemon.middleware import cors, login_cookies, require_login, resolve_session
+from daemon.response import Response
+from daemon.static import StaticFiles
 from daemon.weaprous import WeApRous
 from db import database
+from db.heartbeat import HeartbeatBuffer
+from db.membership import MembershipLog
 
 PORT = 8080
 HEARTBEAT_TIMEOUT = 10
+# Stale peers are pruned in the background this often.
+PRUNE_INTERVAL = HEARTBEAT_TIMEOUT / 2
+# Longest a /channels/watch request is held open.
+WATCH_TIMEOUT = 25
+# Idle event streams get a keep-alive comment this often.
+SSE_KEEPALIVE_INTERVAL = 15
+
+# Pages served only to logged-in browsers.
+PROTECTED_PATHS = ["/index.html", "/"]
 
 app = WeApRous()
+app.use(cors)
+app.use(require_login(PROTECTED_PATHS, login_page="/login.html"))
+# Resolves the session cookie once per request for the routes that need it.
+session = resolve_session(database.get_username_by_session)
+membership = MembershipLog()
+heartbeats = HeartbeatBuffer(database.update_heartbeats)
 
 
 def check_registered_status(username):
@@ -47,30 +66,49 @@ def check_registered_status(username):
     return False
 
 
-def get_user_from_session(headers):
-    cookies = extract_cookies(headers)
-    if not cookies or not cookies.get("session_id"):
-        return None
+def enter_channel(username, channel_name):
+    database.join_channel(username, channel_name)
+    peer = database.get_peers().get(username)
+    if peer:
+        membership.join(channel_name, username, peer["ip"], peer["port"])
+
+
+def leave_channels(username):
+    database.quit_channel(username)
+    membership.leave_all(username)
+
+
+def authorize_peer(username):
+    """Returns (username, None) for a registered peer, else (None, reason)."""
+    if not username:
+        return None, "unauthorized"
+    if not check_registered_status(username):
+        return None, "haven't register to the system"
+    return username, None
+
+
+def get_current_channel(username):
+    for channel_name, users in database.get_channels().items():
+        if {"username": username} in users:
+            return channel_name
+    return None
 
-    username = database.get_username_by_session(cookies.get("session_id"))
-    return username
 
+def has_changes(changes):
+    return changes["full"] or changes["joined"] or changes["left"]
 
-@app.route("/login", methods=["POST"])
-def login(headers, body):
+
+@app.route("/login", methods=["POST"], middleware=[login_cookies])
+def login(headers, body, ctx):
     print(f"[SampleApp] Raw login body: {body}")
 
-    credentials = {}
     try:
-        parsed_body = urllib.parse.parse_qs(body)
-        credentials["username"] = parsed_body.get("username", [""])[0]
-        credentials["password"] = parsed_body.get("password", [""])[0]
+        username = ctx.form.get("username", "")
+        password = ctx.form.get("password", "")
     except Exception as e:
         print(f"Error parsing body: {e}")
         return {"login": "failed", "reason": "Bad request"}
 
-    username = credentials.get("username")
-    password = credentials.get("password")
     user_password = database.get_user_database(username)
 
     if user_password and user_password == password:
@@ -84,14 +122,14 @@ def login(headers, body):
         return {"login": "failed", "reason": "Invalid credentials"}
 
 
-@app.route("/register", methods=["POST"])
-def register_peer(headers, body):
+@app.route("/register", methods=["POST"], middleware=[session])
+def register_peer(headers, body, ctx):
     try:
-        username = get_user_from_session(headers)
+        username = ctx.session
         if not username:
             return {"status": "failed", "reason": "unauthorized"}
 
-        data = json.loads(body)
+        data = ctx.json
         conn_addr = headers.get("x-forwarded-for", "127.0.0.1")
         ip = conn_addr
         print(ip)
@@ -101,7 +139,7 @@ def register_peer(headers, body):
             return {"status": "failed", "reason": "unauthorized"}
 
         database.register_peer(username, ip, port)
-        database.join_channel(username, "global")
+        enter_channel(username, "global")
         print(f"[SampleApp] Registered peer: {username} at {ip}:{port}")
         return {"status": "registered", "peer": username}
     except Exception as e:
@@ -109,9 +147,9 @@ def register_peer(headers, body):
         return {"status": "failed", "reason": str(e)}
 
 
-@app.route("/heartbeat", methods=["GET"])
-def heartbeat(headers, body):
-    username = get_user_from_session(headers)
+@app.route("/heartbeat", methods=["GET"], middleware=[session])
+def heartbeat(headers, body, user=None):
+    username = user
     if not username:
         return {"status": "failed", "reason": "unauthorized"}
 
@@ -119,8 +157,8 @@ def heartbeat(headers, body):
         return {"status": "failed", "reason": "not registered as peer"}
 
     try:
-        database.update_heartbeat(username)
-        return {"status": "ok"}
+        interval = heartbeats.touch(username)
+        return {"status": "ok", "interval": interval}
     except Exception as e:
         print(f"[SampleApp] Heartbeat failed for {username}: {e}")
         return {"status": "failed", "reason": str(e)}
@@ -132,98 +170,125 @@ def get_active_peers():
     current_time = int(time.time())
 
     for username, data in all_peers.items():
-        last_seen = data.get("last_seen", 0)
-        if data and (current_time - last_seen) < HEARTBEAT_TIMEOUT:
-            active_peers[username] = data
+        last_seen = heartbeats.last_seen(username, data.get("last_seen", 0))
+        if data and heartbeats.is_alive(
+            username, last_seen, current_time, HEARTBEAT_TIMEOUT
+        ):
+            active_peers[username] = dict(data, last_seen=last_seen)
         else:
             print(username)
-            database.quit_channel(username)
+            leave_channels(username)
             print(f"[SampleApp] Pruning stale peer: {username}")
+    heartbeats.set_active_count(len(active_peers))
     return active_peers
 
 
+def prune_loop():
+    """Prunes stale peers periodically, so watchers see them leave."""
+    while True:
+        time.sleep(PRUNE_INTERVAL)
+        try:
+            get_active_peers()
+        except Exception as e:
+            print(f"[SampleApp] Pruning failed: {e}")
+
+
 @app.route("/get-peers", methods=["GET"])
 def get_peers(headers, body):
     print("[SampleApp] Request for peer list")
     return get_active_peers()
 
 
-@app.route("/channels/create", methods=["POST"])
-def create_channel(headers, body):
-    username = get_user_from_session(headers)
+@app.route("/channels/create", methods=["POST"], middleware=[session])
+def create_channel(headers, body, ctx):
+    username = ctx.session
     if not username:
         return {"status": "failed", "reason": "unauthorized"}
     if not check_registered_status(username):
         return {"status": "failed", "reason": "haven't register to the system"}
     try:
-        data = json.loads(body)
+        data = ctx.json
         channel_name = data.get("channel_name")
         if not channel_name:
             return {"status": "failed", "reason": "channel_name required"}
         if channel_name in database.get_channels():
             return {"status": "failed", "reason": "Channel already exists"}
-        database.quit_channel(username)
+        leave_channels(username)
         database.register_channel(username, channel_name)
-        database.join_channel(username, channel_name)
+        enter_channel(username, channel_name)
         print(f"[SampleApp] User {username} created channel: {channel_name}")
         return {"status": "created", "channel": channel_name}
     except Exception as e:
         return {"status": "failed", "reason": str(e)}
 
 
-@app.route("/channels/join", methods=["POST"])
-def join_channel(headers, body):
-    username = get_user_from_session(headers)
+@app.route("/channels/join", methods=["POST"], middleware=[session])
+def join_channel(headers, body, ctx):
+    username = ctx.session
     if not username:
         return {"status": "failed", "reason": "unauthorized"}
     if not check_registered_status(username):
         return {"status": "failed", "reason": "haven't register to the system"}
     try:
-        data = json.loads(body)
+        data = ctx.json
         channel_name = data.get("channel_name")
         if not channel_name:
             return {"status": "failed", "reason": "channel_name required"}
         if channel_name not in database.get_channels():
             return {"status": "failed", "reason": "Channel does not exist"}
 
-        database.quit_channel(username)
-        database.join_channel(username, channel_name)
+        leave_channels(username)
+        enter_channel(username, channel_name)
         print(f"[SampleApp] User {username} joined channel: {channel_name}")
         return {"status": "joined", "channel": channel_name}
     except Exception as e:
         return {"status": "failed", "reason": str(e)}
 
 
-@app.route("/channels/quit", methods=["GET"])
-def quit_channel(headers, body):
-    username = get_user_from_session(headers)
+@app.route("/channels/quit", methods=["GET"], middleware=[session])
+def quit_channel(headers, body, user=None):
+    username = user
     if not username:
         return {"status": "failed", "reason": "unauthorized"}
     if not check_registered_status(username):
         return {"status": "failed", "reason": "haven't register to the system"}
 
     try:
-        database.quit_channel(username)
+        leave_channels(username)
         print(f"[SampleApp] User {username} left, joined global")
-        database.join_channel(username, "global")
+        enter_channel(username, "global")
         return {"status": "quited", "channel": "global"}
     except Exception as e:
         return {"status": "failed", "reason": str(e)}
 
 
-@app.route("/channels/peers", methods=["POST"])
-def get_channel_peers(headers, body):
-    username = get_user_from_session(headers)
+@app.route("/channels/peers", methods=["POST"], middleware=[session])
+def get_channel_peers(headers, body, ctx):
+    """
+    Return the active peers of a channel.
+
+    A body with ``since`` (the ``rev`` of an earlier reply) and ``epoch``
+    gets only the joins and leaves after that revision, or a full snapshot
+    when the tracker can no longer produce the delta. Without ``since`` the
+    whole peer map is returned as before.
+    """
+    username = ctx.session
     if not username:
         return {"status": "failed", "reason": "unauthorized"}
     if not check_registered_status(username):
         return {"status": "failed", "reason": "haven't register to the system"}
     try:
-        data = json.loads(body)
+        data = ctx.json
         channel_name = data.get("channel_name")
         peers_in_channel = {}
         if channel_name not in database.get_channels():
             return {"status": "failed", "reason": "channel not found"}
+        if data.get("since") is not None:
+            changes = membership.changes(
+                channel_name, int(data["since"]), data.get("epoch")
+            )
+            return dict(changes, status="ok")
+
         username_in_channel = database.get_channel(channel_name)
         peers = get_active_peers()
         for user in username_in_channel:
@@ -235,9 +300,67 @@ def get_channel_peers(headers, body):
         return {"status": "failed", "reason": str(e)}
 
 
-@app.route("/me", methods=["GET"])
-def get_my_status(headers, body):
-    username = get_user_from_session(headers)
+@app.route("/channels/watch", methods=["POST"], middleware=[session])
+async def watch_channel_peers(headers, body, ctx):
+    """
+    Long-poll variant of the delta form of ``/channels/peers``.
+
+    Takes the same body plus an optional ``timeout`` and holds the request,
+    without a thread, until the channel changes after ``since``. An empty
+    delta is returned when the timeout expires first.
+    """
+    username, reason = await run_blocking(authorize_peer, ctx.session)
+    if reason:
+        return {"status": "failed", "reason": reason}
+    try:
+        data = ctx.json
+        channel_name = data.get("channel_name")
+        since = int(data.get("since", 0))
+        timeout = min(float(data.get("timeout", WATCH_TIMEOUT)), WATCH_TIMEOUT)
+        if channel_name not in await run_blocking(database.get_channels):
+            return {"status": "failed", "reason": "channel not found"}
+
+        changes = membership.changes(channel_name, since, data.get("epoch"))
+        if not has_changes(changes):
+            await membership.wait(channel_name, since, timeout)
+            changes = membership.changes(channel_name, since, data.get("epoch"))
+        return dict(changes, status="ok")
+    except Exception as e:
+        return {"status": "failed", "reason": str(e)}
+
+
+@app.route("/channels/events", methods=["GET"], middleware=[session])
+async def channel_events(headers, body, user=None):
+    """
+    Server-Sent Events stream of membership changes in the caller's channel.
+
+    The first event is a snapshot and each later one a delta, both shaped
+    like the delta form of ``/channels/peers``. Event ids are
+    ``<epoch>:<rev>``, so a reconnecting client that sends ``Last-Event-ID``
+    only receives what it missed.
+    """
+    username, reason = await run_blocking(authorize_peer, user)
+    if reason:
+        yield Response.format_event({"status": "failed", "reason": reason}, "error")
+        return
+    channel_name = await run_blocking(get_current_channel, username)
+
+    epoch, _, rev = headers.get("last-event-id", "").partition(":")
+    since = int(rev) if rev.isdigit() else 0
+    while True:
+        changes = membership.changes(channel_name, since, epoch)
+        if has_changes(changes):
+            since, epoch = changes["rev"], changes["epoch"]
+            yield Response.format_event(
+                changes, event="membership", event_id=f"{epoch}:{since}"
+            )
+        elif not await membership.wait(channel_name, since, SSE_KEEPALIVE_INTERVAL):
+            yield None
+
+
+@app.route("/me", methods=["GET"], middleware=[session])
+def get_my_status(headers, body, user=None):
+    username = user
     if not username:
         return {"status": "unauthorized"}
 
@@ -245,14 +368,7 @@ def get_my_status(headers, body):
     current_channel = None
 
     if is_registered:
-        all_channels = database.get_channels()
-        for channel_name, users in all_channels.items():
-            for user in users:
-                if user["username"] == username:
-                    current_channel = channel_name
-                    break
-            if current_channel:
-                break
+        current_channel = get_current_channel(username)
 
     return {
         "status": "ok",
@@ -262,9 +378,9 @@ def get_my_status(headers, body):
     }
 
 
-@app.route("/channels/list", methods=["GET"])
-def get_channel_list(headers, body):
-    username = get_user_from_session(headers)
+@app.route("/channels/list", methods=["GET"], middleware=[session])
+def get_channel_list(headers, body, user=None):
+    username = user
     if not username:
         return {"status": "failed", "reason": "unauthorized"}
     try:
@@ -295,11 +411,28 @@ if __name__ == "__main__":
     )
     parser.add_argument("--server-ip", default="0.0.0.0")
     parser.add_argument("--server-port", type=int, default=PORT)
+    parser.add_argument(
+        "--mmap-static",
+        action="store_true",
+        help="Serve www/ and static/ files from shared memory maps.",
+    )
+    parser.add_argument(
+        "--prewarm",
+        action="store_true",
+        help="Scan static assets at startup and serve the asset manifest.",
+    )
 
     args = parser.parse_args()
     ip = args.server_ip
     port = args.server_port
 
+    membership.seed(database.get_channels(), database.get_peers())
+    threading.Thread(target=prune_loop, daemon=True).start()
+    heartbeats.start()
+
     # Prepare and launch the RESTful application
     app.prepare_address(ip, port)
+    if args.mmap_static:
+        app.static = StaticFiles()
+    app.prewarm = args.prewarm
     app.run()